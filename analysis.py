@@ -0,0 +1,198 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+# Run every analysis (bit-wise error, fidelity, values in base 2 and base 10) on the whole cross product
+# of devices, oracles, qubit counts and shots/queries, sharding the independent cells over a process pool.
+# Cells without data in the count store are skipped; results are written by this process only,
+# in the same txt files the single analysis scripts produce.
+
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import myLogger
+from count_store import CountStore, ENVARIANCE, PARITY, STORE_DIR, import_envariance, import_parity
+from devices import *
+import bit_wise_error
+import fidelity
+import envariance_values_base2
+import envariance_values_base10
+
+logger = logging.getLogger('analysis')
+logger.addHandler(myLogger.MyHandler())
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+# devices are the devices the experiments were run on
+# workers is the number of processes to use, None to use all the cores
+# seed is the seed of the random generators used to break ties in bit-wise error,
+# every cell gets its own generator so results do not depend on scheduling, None for a different choice every run
+
+devices = [
+    qx2,
+    qx3,
+    qx4,
+    qx5,
+]
+
+envariance_qubits = [
+    2,
+    3,
+    5,
+    7,
+    9,
+    12,
+    14,
+    16
+]
+
+shots = [
+    1024,
+    2048,
+    8192
+]
+
+envariance_executions = 10
+
+parity_qubits = [
+    3,
+    9,
+    16
+]
+
+oracles = [
+    '00',
+    '10',
+    '11'
+]
+
+queries = [
+    5,
+    10,
+    15,
+    20,
+    25,
+    30,
+    35,
+    40,
+    45,
+    50,
+    75,
+    100,
+    200,
+    500
+]
+
+parity_executions = 200
+
+workers = None
+
+seed = 2017
+
+envariance_directory = 'Data_Envariance/'
+
+parity_directory = 'Data_Parity/'
+
+# count store opened once by every worker process
+_store = None
+
+
+def _open_store(directory):
+    global _store
+    _store = CountStore(directory)
+
+
+def _bit_wise_error_cell(device, oracle, n_qubits, cell_queries, executions, cell_seed):
+    return bit_wise_error.bit_wise_error(_store, device, [oracle], n_qubits, cell_queries, executions,
+                                         seed=cell_seed)[0]
+
+
+def _fidelity_cell(device, n_qubits, n_shots, executions):
+    return fidelity.fidelity(_store, device, n_qubits, n_shots, executions)
+
+
+def _values_base2_cell(device, n_qubits, n_shots, executions):
+    return envariance_values_base2.values_base2(_store, device, n_qubits, n_shots, executions)
+
+
+# True if the store holds every execution of the given cell
+def complete(store, experiment, device, oracle, n_qubits, n_shots, executions):
+    return all((experiment, device, oracle, n_qubits, n_shots, execution) in store
+               for execution in range(1, executions + 1, 1))
+
+
+# expand the cross product of parameters into the cells that have data in the store
+def expand(store):
+    envariance_cells = []
+    parity_cells = []
+    for device in devices:
+        for n_qubits in envariance_qubits:
+            for n_shots in shots:
+                if complete(store, ENVARIANCE, device, None, n_qubits, n_shots, envariance_executions):
+                    envariance_cells.append((device, n_qubits, n_shots))
+        for o, oracle in enumerate(oracles):
+            for n_qubits in parity_qubits:
+                if all(complete(store, PARITY, device, oracle, n_qubits, n_queries, parity_executions)
+                       for n_queries in queries):
+                    parity_cells.append((device, oracle, n_qubits, [devices.index(device), o, n_qubits]))
+    return envariance_cells, parity_cells
+
+
+def run(store_directory=STORE_DIR, max_workers=workers):
+    store = CountStore(store_directory)
+    if not store.keys(experiment=ENVARIANCE):
+        import_envariance(store, envariance_directory)
+    if not store.keys(experiment=PARITY):
+        import_parity(store, parity_directory)
+    envariance_cells, parity_cells = expand(store)
+    store.close()
+    logger.info('%d envariance cells - %d parity cells', len(envariance_cells), len(parity_cells))
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_open_store,
+                             initargs=(store_directory,)) as pool:
+        futures = dict()
+        for device, oracle, n_qubits, cell_seed in parity_cells:
+            future = pool.submit(_bit_wise_error_cell, device, oracle, n_qubits, queries, parity_executions,
+                                 None if seed is None else [seed] + cell_seed)
+            futures[future] = ('bit_wise_error', device, oracle, n_qubits)
+        for device, n_qubits, n_shots in envariance_cells:
+            future = pool.submit(_fidelity_cell, device, n_qubits, n_shots, envariance_executions)
+            futures[future] = ('fidelity', device, n_qubits, n_shots)
+            future = pool.submit(_values_base2_cell, device, n_qubits, n_shots, envariance_executions)
+            futures[future] = ('values_base2', device, n_qubits, n_shots)
+
+        for future in as_completed(futures):
+            cell = futures[future]
+            result = future.result()
+            logger.debug('%s done', str(cell))
+            if cell[0] == 'bit_wise_error':
+                bit_wise_error.write_bit_wise_error(parity_directory, cell[1], cell[2], cell[3], queries, result)
+            elif cell[0] == 'fidelity':
+                fidelity.write_fidelity(envariance_directory, cell[1], cell[2], cell[3], result)
+            else:
+                envariance_values_base2.write_values_base2(envariance_directory, cell[1], cell[2], cell[3], result)
+                envariance_values_base10.write_values_base10(envariance_directory, cell[1], cell[2], cell[3],
+                                                             envariance_values_base10.values_base10(result))
+
+
+if __name__ == '__main__':
+    logger.info('Started')
+    run()
+    logger.info('All done.')
@@ -0,0 +1,243 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+# asyncio experiment engine
+#
+# AsyncExecutor keeps up to max_in_flight jobs running on every backend: each job is submitted
+# without waiting for it, then backend status, credits and results are polled with asyncio.sleep()
+# in between, so that waiting jobs do not block the others. Blocking API calls and the result cache run in a thread
+# pool, circuits are taken from the circuit cache and results are written by the event loop thread, as soon as each
+# job is done.
+
+import asyncio
+import functools
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import myLogger
+import retry
+import utility
+
+logger = logging.getLogger('async_exec')
+logger.addHandler(myLogger.MyHandler())
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+ENVARIANCE = 'envariance'
+
+PARITY = 'parity'
+
+# one circuit to run, oracle is None for envariance experiments
+Job = namedtuple('Job', ['experiment', 'execution', 'device', 'n_qubits', 'num_shots', 'oracle'])
+
+
+class AsyncExecutor(object):
+
+    def __init__(self, utilities, max_in_flight=3, poll_interval=30, retry_interval=None, threads=8,
+                 envariance_directory='Data_Envariance/', parity_directory='Data_Parity/', store=None):
+        # utilities maps every device to the Utility object built on its coupling map
+        self.__utilities = utilities
+        self.__max_in_flight = max_in_flight
+        self.__poll_interval = poll_interval
+        # fixed seconds to wait before retrying after an error, None to back off as utility.retrier says
+        self.__retry_interval = retry_interval
+        self.__threads = threads
+        self.__directories = {ENVARIANCE: envariance_directory, PARITY: parity_directory}
+        self.__store = store
+        self.__pool = None
+        self.__slots = dict()
+        self.__connecting = None
+        self.__programs = dict()
+        # jobs of the last run that failed
+        self.failed = []
+
+    # run a blocking call in the thread pool
+    async def blocking(self, function, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.__pool, functools.partial(function, *args))
+
+    # seconds to wait before retrying after an error of the given kind (see retry.Retrier.delay())
+    def retry_delay(self, kind, attempts, device, error, description):
+        delay = utility.retrier.delay(kind, attempts, device, error, description)
+        return delay if self.__retry_interval is None else self.__retry_interval
+
+    # authenticated QuantumProgram for registers of the given size, created once
+    async def program(self, size):
+        async with self.__connecting:
+            if size not in self.__programs:
+                Q_program = utility.QuantumProgram()
+                attempts = utility.retrier.attempts()
+                while True:
+                    try:
+                        await self.blocking(Q_program.set_api, utility.Qconfig.APItoken,
+                                            utility.Qconfig.config["url"])
+                        break
+                    except ConnectionError as e:
+                        await asyncio.sleep(self.retry_delay(retry.CONNECTION, attempts, None, e, 'Connection'))
+                self.__programs[size] = Q_program
+        return self.__programs[size]
+
+    async def wait_backend(self, Q_program, device):
+        if utility.monitors is not None:
+            await self.wait_monitor(utility.monitors.get(device))
+            return
+        while True:
+            try:
+                backend_status = await self.blocking(Q_program.get_backend_status, device)
+                if backend_status.get('available', True) is not False:
+                    return
+                logger.debug('%s currently offline, waiting...', device)
+            except (ConnectionError, ValueError):
+                logger.critical('Error getting backend status, retrying...')
+            await asyncio.sleep(self.__poll_interval)
+
+    # wait on a shared backend_monitor.BackendMonitor, woken up by its polls
+    async def wait_monitor(self, monitor):
+        if await self.blocking(monitor.available):
+            return
+        loop = asyncio.get_running_loop()
+        polled = asyncio.Event()
+        token = monitor.subscribe(lambda status: loop.call_soon_threadsafe(polled.set))
+        try:
+            while not await self.blocking(monitor.available):
+                await polled.wait()
+                polled.clear()
+        finally:
+            monitor.unsubscribe(token)
+
+    # wait for credits, return the ticket of the job when admitted by utility.credit_manager
+    async def wait_credits(self, Q_program, job):
+        manager = utility.credit_manager
+        if manager is not None:
+            ticket = manager.request(job.device, job.execution)
+            try:
+                while True:
+                    if manager.needs_sync():
+                        try:
+                            await self.blocking(manager.sync, Q_program)
+                        except ConnectionError:
+                            logger.critical('Error getting credits, retrying...')
+                    if manager.try_admit(ticket):
+                        return ticket
+                    await asyncio.sleep(min(manager.delay(ticket), self.__poll_interval))
+            except BaseException:
+                # e.g. the job was cancelled: do not hold up the jobs queued after it
+                manager.cancel(ticket)
+                raise
+        while True:
+            try:
+                credits = await self.blocking(Q_program.get_api().get_my_credits)
+                if credits['remaining'] >= 3:
+                    return
+                logger.debug('Waiting for credits to replenish...')
+            except ConnectionError:
+                logger.critical('Error getting credits, retrying...')
+            await asyncio.sleep(self.__poll_interval)
+
+    # get the circuit of a job from the circuit cache, return the QuantumProgram to submit it with and the circuit
+    async def build(self, job):
+        size = utility.device_size(job.device, job.n_qubits)
+        Q_program = await self.program(size)
+        cached = self.__utilities[job.device].circuit(job.n_qubits, experiment=job.experiment, oracle=job.oracle,
+                                                      size=size)
+        return Q_program, cached
+
+    # submit a job and poll it until its counts are available
+    async def execute(self, Q_program, qasm, job):
+        counts = await self.blocking(utility.cached_counts, Q_program, [qasm], job.device, job.num_shots,
+                                     job.execution)
+        if counts is not None:
+            return counts[0]
+        attempts = utility.retrier.attempts()
+        while True:
+            await asyncio.sleep(utility.retrier.blocked(job.device))
+            await self.wait_backend(Q_program, job.device)
+            ticket = await self.wait_credits(Q_program, job)
+            job_id = None
+            try:
+                try:
+                    job_id = await self.blocking(utility.submit_job, Q_program, [], job.device, job.num_shots, 5,
+                                                 [qasm])
+                except (ConnectionError, utility.JobError) as e:
+                    utility.job_failed(job.device, ticket)
+                    ticket = None
+                    kind = retry.CONNECTION if isinstance(e, ConnectionError) else retry.UNAVAILABLE
+                    await asyncio.sleep(self.retry_delay(kind, attempts, job.device, e, str(job)))
+                    continue
+                while True:
+                    await asyncio.sleep(self.__poll_interval)
+                    try:
+                        counts = await self.blocking(utility.fetch_job, Q_program, job_id)
+                    except ConnectionError as e:
+                        await asyncio.sleep(self.retry_delay(retry.FETCH, attempts, job.device, e,
+                                                             'Job %s' % job_id))
+                        continue
+                    except utility.JobError as e:
+                        utility.job_failed(job.device, ticket)
+                        ticket = None
+                        await asyncio.sleep(self.retry_delay(retry.JOB, attempts, job.device, e, str(job)))
+                        break
+                    if counts is not None:
+                        utility.retrier.success(job.device)
+                        utility.release_credits(ticket)
+                        ticket = None
+                        await self.blocking(utility.cache_counts, Q_program, [qasm], job.device, job.num_shots,
+                                            job.execution, counts, job_id)
+                        return counts[0]
+            finally:
+                # the job gave up (retries exhausted) or was cancelled: do not hold up the jobs queued after it
+                if ticket is not None:
+                    if job_id is not None:
+                        logger.critical('Stopped waiting for job %s of %s', job_id, str(job))
+                    utility.release_credits(ticket, submitted=job_id is not None)
+
+    # run a job and write its counts as soon as they are available; a job that fails is logged and recorded in
+    # failed, without stopping the others
+    async def run_job(self, job):
+        try:
+            async with self.__slots[job.device]:
+                Q_program, cached = await self.build(job)
+                counts = await self.execute(Q_program, cached.qasm, job)
+            connected = cached.connected
+            if job.experiment == ENVARIANCE:
+                utility.store_envariance(counts, job.execution, job.device, job.n_qubits, job.num_shots, connected,
+                                         self.__directories[ENVARIANCE], self.__store)
+            else:
+                utility.store_parity(counts, job.execution, job.device, job.n_qubits, job.oracle, job.num_shots,
+                                     connected, self.__directories[PARITY], self.__store)
+        except Exception as e:
+            logger.critical('Failed: %s - %s', str(job), str(e))
+            self.failed.append(job)
+            return
+        logger.info('Done: %s', str(job))
+
+    async def run_async(self, jobs):
+        self.__slots = {job.device: asyncio.Semaphore(self.__max_in_flight) for job in jobs}
+        self.__connecting = asyncio.Lock()
+        self.failed = []
+        with ThreadPoolExecutor(max_workers=self.__threads) as self.__pool:
+            await asyncio.gather(*[self.run_job(job) for job in jobs])
+        return self.failed
+
+    # run every job, keeping at most max_in_flight of them on each backend, return the jobs that failed
+    def run(self, jobs):
+        return asyncio.run(self.run_async(list(jobs)))
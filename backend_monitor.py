@@ -0,0 +1,189 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+# Shared backend status monitors
+#
+# BackendMonitor caches the status of one backend for ttl seconds, so that every job asking for it within that time
+# shares a single get_backend_status() call. While someone waits for the backend (wait(), or a subscribed callback)
+# a background thread polls it every poll_interval seconds and wakes the waiters after every poll, so jobs resume
+# within poll_interval seconds from the backend coming back; with nobody waiting, the thread stops.
+# MonitorPool keeps one monitor for every backend, shared by all the executors. Since QuantumProgram is not thread
+# safe, every monitor asks the status with a program of its own, made by connect() (and made again after a
+# ConnectionError), which only one thread at a time uses.
+
+import logging
+import threading
+import time
+
+import myLogger
+
+logger = logging.getLogger('backend_monitor')
+logger.addHandler(myLogger.MyHandler())
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+
+# True if a status says the backend accepts jobs
+def is_available(status):
+    return status is not None and status.get('available', True) is not False
+
+
+class BackendMonitor(object):
+
+    # connect() returns a new authenticated QuantumProgram
+    def __init__(self, connect, device, ttl=60., poll_interval=30., clock=time.monotonic):
+        self.device = device
+        self.__connect = connect
+        self.__Q_program = None
+        self.__ttl = ttl
+        self.__poll_interval = poll_interval
+        self.__clock = clock
+        self.__status = None
+        self.__fetched = None
+        self.__condition = threading.Condition()
+        self.__refreshing = threading.Lock()
+        self.__stop = threading.Event()
+        self.__thread = None
+        self.__waiters = 0
+        self.__subscribers = dict()
+        self.__next_token = 0
+        self.calls = 0
+
+    # ask the API for the status and wake whoever is waiting for it, called holding the refreshing lock
+    def refresh(self):
+        try:
+            if self.__Q_program is None:
+                self.__Q_program = self.__connect()
+            status = self.__Q_program.get_backend_status(self.device)
+        except ConnectionError:
+            logger.critical('Error getting backend status, retrying...')
+            self.__Q_program = None
+            return self.__status
+        except ValueError:
+            status = {'available': False}
+        with self.__condition:
+            self.calls += 1
+            if is_available(status) != is_available(self.__status) and self.__status is not None:
+                logger.critical('%s is %s', self.device, 'back online' if is_available(status) else 'offline')
+            self.__status = status
+            self.__fetched = self.__clock()
+            self.__condition.notify_all()
+            subscribers = list(self.__subscribers.values())
+        for callback in subscribers:
+            callback(status)
+        return status
+
+    # status of the backend, asking the API only if the cached one is older than ttl
+    def status(self):
+        with self.__refreshing:
+            with self.__condition:
+                if self.__fetched is not None and self.__clock() - self.__fetched < self.__ttl:
+                    return self.__status
+            return self.refresh()
+
+    def available(self):
+        return is_available(self.status())
+
+    # make the next status() ask the API, e.g. after a job was refused
+    def invalidate(self):
+        with self.__condition:
+            self.__fetched = None
+
+    # block until the backend is available
+    def wait(self):
+        if self.available():
+            return
+        logger.critical('%s currently offline, waiting...', self.device)
+        with self.__condition:
+            self.__waiters += 1
+            self.__start()
+            try:
+                while not is_available(self.__status):
+                    self.__condition.wait()
+            finally:
+                self.__waiters -= 1
+
+    # call callback(status) after every poll until unsubscribed, return the token to unsubscribe with
+    def subscribe(self, callback):
+        with self.__condition:
+            self.__next_token += 1
+            self.__subscribers[self.__next_token] = callback
+            self.__start()
+            return self.__next_token
+
+    def unsubscribe(self, token):
+        with self.__condition:
+            self.__subscribers.pop(token, None)
+
+    def stop(self):
+        self.__stop.set()
+        with self.__condition:
+            thread = self.__thread
+        if thread is not None:
+            thread.join()
+
+    # start the polling thread if it is not running, called holding the condition
+    def __start(self):
+        if self.__thread is None:
+            self.__stop.clear()
+            self.__thread = threading.Thread(target=self.__poll, name='monitor-' + self.device, daemon=True)
+            self.__thread.start()
+
+    def __poll(self):
+        while not self.__stop.wait(self.__poll_interval):
+            with self.__condition:
+                if self.__waiters == 0 and not self.__subscribers:
+                    self.__thread = None
+                    return
+            with self.__refreshing:
+                self.refresh()
+        with self.__condition:
+            self.__thread = None
+
+
+class MonitorPool(object):
+
+    def __init__(self, connect, ttl=60., poll_interval=30.):
+        self.__connect = connect
+        self.__ttl = ttl
+        self.__poll_interval = poll_interval
+        self.__monitors = dict()
+        self.__lock = threading.Lock()
+
+    # monitor of a backend, created the first time
+    def get(self, device):
+        with self.__lock:
+            if device not in self.__monitors:
+                self.__monitors[device] = BackendMonitor(self.__connect, device, ttl=self.__ttl,
+                                                         poll_interval=self.__poll_interval)
+            return self.__monitors[device]
+
+    def invalidate(self, device):
+        with self.__lock:
+            monitor = self.__monitors.get(device)
+        if monitor is not None:
+            monitor.invalidate()
+
+    def stop(self):
+        with self.__lock:
+            monitors = list(self.__monitors.values())
+        for monitor in monitors:
+            monitor.stop()
@@ -23,7 +23,9 @@ import logging
 
 import myLogger
 import os
-import random
+from count_store import CountStore, PARITY, import_parity
+from incremental import Aggregator, open_atomic
+from parity_analysis import load_sweep, success_rates, tally_rates
 
 logger = logging.getLogger('bit_wise_error')
 logger.addHandler(myLogger.MyHandler())
@@ -35,6 +37,8 @@ logger.propagate = False
 # n_shots is the maximum number of n_shots
 # n_qubits the number of qubits of the experiments
 # oracles are the strings you want to learn: '10' for '10...10', '11' for '11...11', '00' for '00...00'
+# seed is the seed of the random generator used to break ties, set it to None for a different choice every run
+# incremental reads only the execution files that are new or changed since the last run (see incremental.py)
 
 device = 'ibmqx5'
 
@@ -65,75 +69,53 @@ queries = [
 
 executions = 200
 
-directory = 'Data_Parity/' + device + '/'
-
-logger.info('Started')
-
-# for n_queries in range(5, 55, 5):
-#     queries.append(n_queries)
-#     if n_queries == 50:
-#         queries.append(75)
-#         queries.append(100)
-#         queries.append(200)
-#         queries.append(500)
-
-for oracle in oracles:
-    a = ''
-    for n in range(n_qubits-1):
-        if oracle == '00':
-            a += '0'
-        elif oracle == '11':
-            a += '1'
-        elif oracle == '10':
-            if n % 2 == 0:
-                a += '1'
-            else:
-                a += '0'
-    writef = filename = directory + oracle + '/' + device + '_' + oracle + '_' + str(n_qubits) + '_qubits_parity_bit-wise_error.txt'
-    os.makedirs(os.path.dirname(writef), exist_ok=True)
-    write_f = open(writef, 'a')
-    write_f.write('N\t\tError\n\n')
-    for n_queries in queries:
-        correct = 0
-        success_rate = 0
-        for execution in range(1, executions+1, 1):
-            x = ''
-            total = 0
-            readf = directory + oracle + '/' + 'execution' + str(execution) + '/' + device + '_' + str(
-                n_queries) + 'queries_' + str(oracle) + '_' + str(n_qubits) + '_qubits_parity.txt'
-            os.makedirs(os.path.dirname(readf), exist_ok=True)
-            read_f = open(readf, 'r')
-            lines = read_f.read().splitlines()
-            zeroes = [0 for i in range(n_qubits-1)]
-            ones = [0 for i in range(n_qubits-1)]
-            for line in range(2, len(lines), 1):
-                result = lines[line].split('\t')
-                k = result[0]
-                counts = int(result[1])
-
-                if k[0] != '0':
-                    total += counts
-                    for n in range(n_qubits-1):
-                        if k[n+1] == '0':
-                            zeroes[n] += counts
-                        else:
-                            ones[n] += counts
-            for n in range(len(zeroes)):
-                if zeroes[n] > ones[n]:
-                    x += '0'
-                elif ones[n] > zeroes[n]:
-                    x += '1'
-                elif zeroes[n] == ones[n]:
-                    x += str(random.randint(0, 1))
-                    # if a[n] == '1':
-                    #     x += '1'
-                    # else:
-                    #     x += '0'
-            if x == a:
-                correct += 1
-            logger.log(logging.VERBOSE, x)
-            read_f.close()
-        logger.debug(correct)
-        success_rate += correct/executions
-        write_f.write('%4d %1.20f\n' % (n_queries, 1 - success_rate))
-    write_f.close()
+seed = 2017
+
+directory = 'Data_Parity/'
+
+incremental = False
+
+
+# error rate of every (oracle, queries) pair for the given device and number of qubits
+def bit_wise_error(store, device, oracles, n_qubits, queries, executions, seed=None):
+    values, counts, cells = load_sweep(store, device, oracles, n_qubits, queries, executions)
+    rates = success_rates(values, counts, cells, oracles, n_qubits, queries, executions, seed=seed)
+    return 1 - rates
+
+
+# same as bit_wise_error(), from the partial sums cached by an incremental.Aggregator
+def aggregated_bit_wise_error(aggregator, device, oracles, n_qubits, queries, executions, seed=None):
+    zeroes, ones = aggregator.tallies(device, oracles, n_qubits, queries, executions)
+    return 1 - tally_rates(zeroes, ones, oracles, n_qubits, queries, executions, seed=seed)
+
+
+# write the error rates of one oracle to its txt file
+def write_bit_wise_error(directory, device, oracle, n_qubits, queries, errors):
+    writef = directory + device + '/' + oracle + '/' + device + '_' + oracle + '_' + str(
+        n_qubits) + '_qubits_parity_bit-wise_error.txt'
+    with open_atomic(writef) as write_f:
+        write_f.write('N\t\tError\n\n')
+        for q, n_queries in enumerate(queries):
+            logger.debug(errors[q])
+            write_f.write('%4d %1.20f\n' % (n_queries, errors[q]))
+
+
+if __name__ == '__main__':
+    logger.info('Started')
+
+    # counts are read from the binary count store, the txt data tree is imported on first use
+    store = CountStore()
+    if incremental:
+        aggregator = Aggregator()
+        aggregator.update(PARITY, directory, store)
+        errors = aggregated_bit_wise_error(aggregator, device, oracles, n_qubits, queries, executions, seed=seed)
+        aggregator.save()
+    else:
+        if not store.keys(experiment=PARITY, device=device):
+            import_parity(store)
+        errors = bit_wise_error(store, device, oracles, n_qubits, queries, executions, seed=seed)
+
+    for o, oracle in enumerate(oracles):
+        write_bit_wise_error(directory, device, oracle, n_qubits, queries, errors[o])
+
+    store.close()
@@ -0,0 +1,271 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+# Module for recorded circuits
+#
+# Register and Circuit expose the subset of the QISKit circuit interface used by Utility
+# (h, x, cx, iden, measure, ...), but they only record the gates as a list of (gate, args) tuples,
+# args being qubit indexes (and the classical bit index for measure), and can write it back as QASM.
+# The circuit is meant to hold a single quantum and a single classical register.
+#
+# optimize() is a peephole pass over recorded gates: runs of single-qubit gates on the same qubit are replaced
+# by the shortest equivalent sequence (dropping identities, H-H, X-X, ...) and adjacent pairs of equal CNOTs
+# are cancelled, until nothing changes. Single-qubit gates are all Clifford, so runs are compared through
+# the way they conjugate the Pauli operators, which identifies them up to a global phase.
+
+import logging
+import re
+from collections import namedtuple
+
+import myLogger
+
+logger = logging.getLogger('circuits')
+logger.addHandler(myLogger.MyHandler())
+logger.setLevel(logging.CRITICAL)
+logger.propagate = False
+
+# gates acting on a single qubit
+SINGLE_QUBIT_GATES = ['h', 'x', 'y', 'z', 's', 'sdg', 'id']
+
+# gate count (measures excluded) and depth (measures included) of a list of recorded gates
+Stats = namedtuple('Stats', ['gates', 'depth'])
+
+# image of the Pauli operators X, Y, Z under conjugation by every single-qubit gate, as (sign, pauli)
+_conjugation = {
+    'h': {'X': (1, 'Z'), 'Y': (-1, 'Y'), 'Z': (1, 'X')},
+    'x': {'X': (1, 'X'), 'Y': (-1, 'Y'), 'Z': (-1, 'Z')},
+    'y': {'X': (-1, 'X'), 'Y': (1, 'Y'), 'Z': (-1, 'Z')},
+    'z': {'X': (-1, 'X'), 'Y': (-1, 'Y'), 'Z': (1, 'Z')},
+    's': {'X': (1, 'Y'), 'Y': (-1, 'X'), 'Z': (1, 'Z')},
+    'sdg': {'X': (-1, 'Y'), 'Y': (1, 'X'), 'Z': (1, 'Z')},
+    'id': {'X': (1, 'X'), 'Y': (1, 'Y'), 'Z': (1, 'Z')},
+}
+
+_identity = ((1, 'X'), (1, 'Z'))
+
+_qasm_register = re.compile(r'^(?P<kind>qreg|creg)\s+(?P<name>\w+)\[(?P<size>\d+)\];$')
+
+_qasm_gate = re.compile(r'^(?P<gate>\w+)\s+(?P<args>[^;]*);$')
+
+_qasm_bit = re.compile(r'^\w+\[(?P<index>\d+)\]$')
+
+
+class Register(object):
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.size:
+            raise IndexError('%s[%d] out of range' % (self.name, index))
+        return self, index
+
+    def __len__(self):
+        return self.size
+
+
+class Circuit(object):
+
+    def __init__(self, name, quantum_r, classical_r):
+        self.name = name
+        self.quantum_r = quantum_r
+        self.classical_r = classical_r
+        self.ops = []
+
+    @property
+    def size(self):
+        return self.quantum_r.size
+
+    def __add_gate(self, gate, *bits):
+        self.ops.append((gate, tuple(bit[1] for bit in bits)))
+
+    def h(self, qubit):
+        self.__add_gate('h', qubit)
+
+    def x(self, qubit):
+        self.__add_gate('x', qubit)
+
+    def y(self, qubit):
+        self.__add_gate('y', qubit)
+
+    def z(self, qubit):
+        self.__add_gate('z', qubit)
+
+    def s(self, qubit):
+        self.__add_gate('s', qubit)
+
+    def sdg(self, qubit):
+        self.__add_gate('sdg', qubit)
+
+    def iden(self, qubit):
+        self.__add_gate('id', qubit)
+
+    def cx(self, control_qubit, target_qubit):
+        self.__add_gate('cx', control_qubit, target_qubit)
+
+    def measure(self, qubit, clbit):
+        self.__add_gate('measure', qubit, clbit)
+
+    # QASM source of the circuit
+    def qasm(self):
+        q = self.quantum_r.name
+        c = self.classical_r.name
+        lines = ['OPENQASM 2.0;', 'include "qelib1.inc";',
+                 'qreg %s[%d];' % (q, self.quantum_r.size), 'creg %s[%d];' % (c, self.classical_r.size)]
+        for gate, args in self.ops:
+            if gate == 'measure':
+                lines.append('measure %s[%d] -> %s[%d];' % (q, args[0], c, args[1]))
+            else:
+                lines.append('%s %s;' % (gate, ','.join('%s[%d]' % (q, arg) for arg in args)))
+        return '\n'.join(lines) + '\n'
+
+
+# apply recorded gates to a circuit exposing the QISKit interface (a QISKit circuit or a Circuit)
+def replay(ops, circuit, quantum_r, classical_r):
+    for gate, args in ops:
+        if gate == 'measure':
+            circuit.measure(quantum_r[args[0]], classical_r[args[1]])
+        elif gate == 'id':
+            circuit.iden(quantum_r[args[0]])
+        else:
+            getattr(circuit, gate)(*[quantum_r[arg] for arg in args])
+
+
+# single-qubit Clifford obtained applying gate after clifford, as the images of X and Z
+def _apply(clifford, gate):
+    images = []
+    for sign, pauli in clifford:
+        new_sign, new_pauli = _conjugation[gate][pauli]
+        images.append((sign * new_sign, new_pauli))
+    return tuple(images)
+
+
+# shortest gate sequence for each of the 24 single-qubit Cliffords, found breadth-first
+def _shortest_sequences():
+    sequences = {_identity: []}
+    frontier = [_identity]
+    while frontier:
+        next_frontier = []
+        for clifford in frontier:
+            for gate in SINGLE_QUBIT_GATES:
+                if gate == 'id':
+                    continue
+                image = _apply(clifford, gate)
+                if image not in sequences:
+                    sequences[image] = sequences[clifford] + [gate]
+                    next_frontier.append(image)
+        frontier = next_frontier
+    return sequences
+
+
+_shortest = _shortest_sequences()
+
+
+# one peephole pass, see optimize()
+def _peephole(ops):
+    out = []
+    # indexes in out of the gates acting on every qubit, and single-qubit gates not placed yet
+    placed = dict()
+    runs = dict()
+
+    def place(gate, args, qubits):
+        for qubit in qubits:
+            placed.setdefault(qubit, []).append(len(out))
+        out.append((gate, args))
+
+    def flush(qubit):
+        clifford = _identity
+        for gate in runs.pop(qubit, []):
+            clifford = _apply(clifford, gate)
+        for gate in _shortest[clifford]:
+            place(gate, (qubit,), (qubit,))
+
+    for gate, args in ops:
+        if gate in SINGLE_QUBIT_GATES:
+            runs.setdefault(args[0], []).append(gate)
+            continue
+        qubits = args[:1] if gate == 'measure' else args
+        for qubit in qubits:
+            flush(qubit)
+        if gate == 'cx':
+            control = placed.get(args[0], [])
+            target = placed.get(args[1], [])
+            if control and target and control[-1] == target[-1] and out[control[-1]] == (gate, args):
+                out[control.pop()] = None
+                target.pop()
+                continue
+        place(gate, args, qubits)
+    for qubit in list(runs):
+        flush(qubit)
+    return [op for op in out if op is not None]
+
+
+# peephole optimization of recorded gates, repeated until no gate is removed
+def optimize(ops):
+    ops = _peephole(ops)
+    while True:
+        optimized = _peephole(ops)
+        if len(optimized) == len(ops):
+            return optimized
+        ops = optimized
+
+
+# gate count and depth of recorded gates, every gate taking one time step
+def stats(ops):
+    levels = dict()
+    gates = 0
+    for gate, args in ops:
+        qubits = args[:1] if gate == 'measure' else args
+        level = max(levels.get(qubit, 0) for qubit in qubits) + 1
+        for qubit in qubits:
+            levels[qubit] = level
+        if gate != 'measure':
+            gates += 1
+    return Stats(gates, max(levels.values(), default=0))
+
+
+# rebuild a recorded circuit from QASM written by Circuit.qasm()
+def from_qasm(qasm, name='circuit'):
+    quantum_r = None
+    classical_r = None
+    ops = []
+    for line in qasm.splitlines():
+        line = line.strip()
+        if not line or line.startswith('OPENQASM') or line.startswith('include') or line.startswith('//'):
+            continue
+        register = _qasm_register.match(line)
+        if register is not None:
+            if register.group('kind') == 'qreg':
+                quantum_r = Register(register.group('name'), int(register.group('size')))
+            else:
+                classical_r = Register(register.group('name'), int(register.group('size')))
+            continue
+        found = _qasm_gate.match(line)
+        if found is None:
+            raise ValueError('Cannot parse QASM line: %s' % line)
+        gate = found.group('gate')
+        args = re.split(r'\s*(?:,|->)\s*', found.group('args').strip())
+        ops.append((gate, tuple(int(_qasm_bit.match(arg).group('index')) for arg in args)))
+    circuit = Circuit(name, quantum_r, classical_r)
+    circuit.ops = ops
+    logger.debug('from_qasm() - ops:\n%s', str(ops))
+    return circuit
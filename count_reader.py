@@ -0,0 +1,133 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+# Streaming reader for the txt files written by the experiments and the analysis scripts
+#
+# Count tables ('VALUES\t\tCOUNTS' header, then one 'bitstring\tcount' line per outcome) are read line by line
+# as (int value, count) pairs, bitstrings being packed as in the count store, or whole into NumPy arrays.
+# load_counts() reads many files at once into arrays preallocated from the file sizes, and scan_tree()
+# walks an execution data tree (e.g. Data_Parity/) with os.scandir(), matching file names against a regex.
+# Files are closed before returning, and by generators as soon as they are exhausted or dropped.
+
+import logging
+import os
+import re
+from collections import namedtuple
+
+import numpy as np
+
+import myLogger
+
+logger = logging.getLogger('count_reader')
+logger.addHandler(myLogger.MyHandler())
+logger.setLevel(logging.CRITICAL)
+logger.propagate = False
+
+# header lines of every txt file
+HEADER_LINES = 2
+
+# one count table found by scan_tree(): execution number, regex match of the file name and path
+Table = namedtuple('Table', ['execution', 'match', 'path'])
+
+_execution_dir = re.compile(r'^execution(?P<execution>\d+)$')
+
+
+# yield the (int value, count) pairs of a count table
+def iter_counts(filename):
+    with open(filename, 'rb') as read_f:
+        for _ in range(HEADER_LINES):
+            read_f.readline()
+        for line in read_f:
+            value, _, count = line.partition(b'\t')
+            if value:
+                yield int(value, 2), int(count)
+
+
+# parse the content of a count table, return its values and counts as two lists
+def parse_counts(data):
+    fields = [line.split(b'\t', 1) for line in data.split(b'\n')[HEADER_LINES:] if line]
+    return [int(value, 2) for value, count in fields], [int(count) for value, count in fields]
+
+
+# parse a whole count table, return its values and counts as two lists
+def read_counts(filename):
+    with open(filename, 'rb') as read_f:
+        return parse_counts(read_f.read())
+
+
+# read a count table into values and counts starting at position start, return the position after the last entry
+def fill_counts(filename, values, counts, start=0):
+    table_values, table_counts = read_counts(filename)
+    end = start + len(table_values)
+    values[start:end] = table_values
+    counts[start:end] = table_counts
+    return end
+
+
+# read many count tables at once, return values (uint64), counts (uint32) and the index of the file
+# every entry comes from; arrays are preallocated from the file sizes, every line taking at least 4 bytes
+def load_counts(filenames):
+    capacity = sum(os.path.getsize(filename) for filename in filenames) // 4
+    values = np.empty(capacity, dtype=np.uint64)
+    counts = np.empty(capacity, dtype=np.uint32)
+    files = np.empty(capacity, dtype=np.int64)
+    position = 0
+    for index, filename in enumerate(filenames):
+        end = fill_counts(filename, values, counts, position)
+        files[position:end] = index
+        position = end
+    logger.debug('load_counts() - %d entries from %d files', position, len(filenames))
+    return values[:position].copy(), counts[:position].copy(), files[:position].copy()
+
+
+# yield the (int value, average probability, probability of every execution) triples of a values_base2 file
+def iter_values_base2(filename):
+    with open(filename, 'r') as read_f:
+        for _ in range(HEADER_LINES):
+            read_f.readline()
+        for line in read_f:
+            fields = line.split()
+            if fields:
+                yield int(fields[0], 2), float(fields[1]), [float(field) for field in fields[2:]]
+
+
+# yield every file of the execution directories (executionN/) under directory whose name matches pattern,
+# in sorted order
+def scan_tree(directory, pattern):
+    if not os.path.isdir(directory):
+        return
+    entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+    for entry in entries:
+        if not entry.is_dir():
+            continue
+        match = _execution_dir.match(entry.name)
+        if match is None:
+            yield from scan_tree(entry.path, pattern)
+            continue
+        execution = int(match.group('execution'))
+        for file_entry in sorted(os.scandir(entry.path), key=lambda file_entry: file_entry.name):
+            if not file_entry.is_file():
+                continue
+            found = pattern.match(file_entry.name)
+            if found is None:
+                logger.debug('scan_tree() - skipping %s', file_entry.path)
+                continue
+            yield Table(execution, found, file_entry.path)
@@ -0,0 +1,241 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+# Module for the binary count store
+#
+# Every device gets two files inside the store directory:
+# - <device>.counts, an append-only binary file holding one record per count table,
+#   the record is the array of outcomes (bitstrings packed as little-endian uint64)
+#   followed by the array of counts (little-endian uint32)
+# - <device>.index, an append-only text file with one line per record:
+#   experiment, oracle, n_qubits, shots, execution, offset and number of entries
+# Writing the same key twice appends a new record, the last one in the index wins.
+
+import logging
+import os
+import re
+import sys
+from array import array
+from collections import namedtuple
+
+import numpy as np
+
+import count_reader
+import myLogger
+from histogram import Histogram
+
+logger = logging.getLogger('count_store')
+logger.addHandler(myLogger.MyHandler())
+logger.setLevel(logging.CRITICAL)
+logger.propagate = False
+
+ENVARIANCE = 'envariance'
+
+PARITY = 'parity'
+
+STORE_DIR = 'Data_Store/'
+
+# oracle placeholder used in the index for experiments without an oracle
+NO_ORACLE = '-'
+
+# max number of qubits that fits a packed outcome
+MAX_QUBITS = 64
+
+Key = namedtuple('Key', ['experiment', 'device', 'oracle', 'n_qubits', 'shots', 'execution'])
+
+Record = namedtuple('Record', ['offset', 'entries'])
+
+_envariance_file = re.compile(r'^(?P<device>.+)_(?P<shots>\d+)_(?P<n_qubits>\d+)_qubits_envariance\.txt$')
+
+_parity_file = re.compile(
+    r'^(?P<device>.+)_(?P<shots>\d+)queries_(?P<oracle>\d+)_(?P<n_qubits>\d+)_qubits_parity\.txt$')
+
+# regexes of the execution file names of every experiment
+FILE_PATTERNS = {ENVARIANCE: _envariance_file, PARITY: _parity_file}
+
+# number of files read at once by the import functions
+IMPORT_CHUNK = 1024
+
+
+def _to_disk(values):
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_disk(values, data):
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+class CountStore(object):
+
+    def __init__(self, directory=STORE_DIR):
+        self.__directory = directory
+        self.__index = dict()
+        self.__writers = dict()
+        self.__readers = dict()
+        os.makedirs(directory, exist_ok=True)
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.index'):
+                self.load_index(name[:-len('.index')])
+
+    def __len__(self):
+        return len(self.__index)
+
+    def __contains__(self, key):
+        return Key(*key) in self.__index
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        for data_f, index_f in self.__writers.values():
+            data_f.close()
+            index_f.close()
+        for f in self.__readers.values():
+            f.close()
+        self.__writers.clear()
+        self.__readers.clear()
+
+    def path(self, device, extension):
+        return os.path.join(self.__directory, device + '.' + extension)
+
+    # read the index of the given device, later lines override earlier ones
+    def load_index(self, device):
+        with open(self.path(device, 'index'), 'r') as index_f:
+            for line in index_f:
+                experiment, oracle, n_qubits, shots, execution, offset, entries = line.rstrip('\n').split('\t')
+                if oracle == NO_ORACLE:
+                    oracle = None
+                key = Key(experiment, device, oracle, int(n_qubits), int(shots), int(execution))
+                self.__index[key] = Record(int(offset), int(entries))
+        logger.debug('load_index() - %s: %d records', device, len(self.__index))
+
+    # return the stored keys, filtered on the given fields
+    def keys(self, experiment=None, device=None, oracle=None, n_qubits=None, shots=None, execution=None):
+        fields = Key(experiment, device, oracle, n_qubits, shots, execution)
+        keys = []
+        for key in self.__index:
+            if all(field is None or field == value for field, value in zip(fields, key)):
+                keys.append(key)
+        return keys
+
+    # store a count table, counts is a Histogram, a dict or an iterable of (value, count) pairs,
+    # values being either bitstrings or already packed integers
+    def put(self, experiment, device, oracle, n_qubits, shots, execution, counts):
+        if n_qubits > MAX_QUBITS:
+            raise ValueError('Cannot pack %d qubits, store is limited to %d' % (n_qubits, MAX_QUBITS))
+        values = array('Q')
+        hits = array('I')
+        if isinstance(counts, Histogram):
+            values.frombytes(counts.values().astype(np.uint64).tobytes())
+            hits.frombytes(counts.counts().astype(np.uint32).tobytes())
+        else:
+            if isinstance(counts, dict):
+                counts = counts.items()
+            for value, count in counts:
+                values.append(int(value, 2) if isinstance(value, str) else value)
+                hits.append(count)
+
+        if device not in self.__writers:
+            self.__writers[device] = (open(self.path(device, 'counts'), 'ab'), open(self.path(device, 'index'), 'a'))
+        data_f, index_f = self.__writers[device]
+        offset = data_f.seek(0, os.SEEK_END)
+        data_f.write(_to_disk(values))
+        data_f.write(_to_disk(hits))
+        data_f.flush()
+        index_f.write('%s\t%s\t%d\t%d\t%d\t%d\t%d\n' % (experiment, NO_ORACLE if oracle is None else oracle, n_qubits,
+                                                        shots, execution, offset, len(values)))
+        index_f.flush()
+
+        self.__index[Key(experiment, device, oracle, n_qubits, shots, execution)] = Record(offset, len(values))
+
+    # return the packed outcomes and counts of a stored count table as two arrays
+    def get(self, experiment, device, oracle, n_qubits, shots, execution):
+        record = self.__index[Key(experiment, device, oracle, n_qubits, shots, execution)]
+        if device in self.__writers:
+            self.__writers[device][0].flush()
+        if device not in self.__readers:
+            self.__readers[device] = open(self.path(device, 'counts'), 'rb')
+        data_f = self.__readers[device]
+        data_f.seek(record.offset)
+        data = data_f.read(record.entries * 12)
+        values = _from_disk(array('Q'), data[:record.entries * 8])
+        hits = _from_disk(array('I'), data[record.entries * 8:])
+        return values, hits
+
+    # return a stored count table as a Histogram
+    def get_histogram(self, experiment, device, oracle, n_qubits, shots, execution):
+        values, hits = self.get(experiment, device, oracle, n_qubits, shots, execution)
+        return Histogram(np.frombuffer(values, dtype=np.uint64), np.frombuffer(hits, dtype=np.uint32), n_qubits)
+
+    # return a stored count table as (bitstring, count) pairs, in the order of the stored record
+    # (increasing packed outcome for tables written as a Histogram)
+    def get_strings(self, experiment, device, oracle, n_qubits, shots, execution):
+        values, hits = self.get(experiment, device, oracle, n_qubits, shots, execution)
+        form = '0%db' % n_qubits
+        return [(format(value, form), count) for value, count in zip(values, hits)]
+
+
+# import the count tables of a data tree whose file names match pattern, chunk files at a time; tables already in the
+# store are skipped, so that importing a tree twice does not append them again
+def _import_tree(store, experiment, directory, pattern):
+    tables = []
+    for table in count_reader.scan_tree(directory, pattern):
+        oracle = table.match.group('oracle') if experiment == PARITY else None
+        key = Key(experiment, table.match.group('device'), oracle, int(table.match.group('n_qubits')),
+                  int(table.match.group('shots')), table.execution)
+        if key not in store:
+            tables.append((key, table))
+    for first in range(0, len(tables), IMPORT_CHUNK):
+        chunk = tables[first:first + IMPORT_CHUNK]
+        values, counts, files = count_reader.load_counts([table.path for key, table in chunk])
+        bounds = np.searchsorted(files, np.arange(len(chunk) + 1))
+        for index, (key, table) in enumerate(chunk):
+            start, end = bounds[index], bounds[index + 1]
+            store.put(*key, Histogram(values[start:end], counts[start:end], key.n_qubits))
+    logger.info('import_%s() - %d count tables imported from %s', experiment, len(tables), directory)
+    return len(tables)
+
+
+# import every execution file of an envariance data tree (e.g. Data_Envariance/) into the store
+def import_envariance(store, directory='Data_Envariance/'):
+    return _import_tree(store, ENVARIANCE, directory, _envariance_file)
+
+
+# import every execution file of a parity data tree (e.g. Data_Parity/) into the store
+def import_parity(store, directory='Data_Parity/'):
+    return _import_tree(store, PARITY, directory, _parity_file)
+
+
+if __name__ == '__main__':
+    logger.setLevel(logging.INFO)
+    with CountStore() as count_store:
+        if os.path.isdir('Data_Envariance/'):
+            import_envariance(count_store)
+        if os.path.isdir('Data_Parity/'):
+            import_parity(count_store)
@@ -15,6 +15,8 @@
 
 # Module for coupling-maps
 
+import devices
+
 qx2 = {
     0: [1, 2],
     1: [2],
@@ -68,3 +70,11 @@ qx5 = {
     14: [],
     15: [0, 2, 14],
 }
+
+# coupling map of every device, by its name in devices.py
+by_device = {
+    devices.qx2: qx2,
+    devices.qx3: qx3,
+    devices.qx4: qx4,
+    devices.qx5: qx5,
+}
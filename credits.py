@@ -0,0 +1,202 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+# Credit-budget admission of jobs
+#
+# CreditManager keeps a local model of the credit balance instead of asking the API before every job: the balance
+# is a token bucket refilled at capacity / replenish_interval credits per second, every admitted job takes its
+# estimated cost out of it, and, if the API refunds finished jobs, gives it back when released. Jobs wait in a queue
+# ordered by priority (lower first) and cost (cheaper first) and are admitted in that order as soon as the modelled
+# balance covers them. The model is synced with get_my_credits() only every sync_interval seconds, when a job
+# is refused for lack of credits (invalidate()), or when waiting and at least min_sync_interval seconds passed.
+# A job that stops waiting (e.g. its sync failed) is cancelled, so that it does not hold up the queue. The queue
+# and the balance are shared by the threads of the executors and only used holding the lock of the manager.
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+import myLogger
+
+logger = logging.getLogger('credits')
+logger.addHandler(myLogger.MyHandler())
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+# credits spent by a job on a real device, simulators are free
+DEVICE_COST = 3
+
+
+class Ticket(object):
+
+    def __init__(self, priority, cost, order, device):
+        self.priority = priority
+        self.cost = cost
+        self.order = order
+        self.device = device
+        self.admitted = False
+        self.released = False
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return (self.priority, self.cost, self.order) < (other.priority, other.cost, other.order)
+
+
+class CreditManager(object):
+
+    def __init__(self, capacity=15, replenish_interval=24 * 3600., refund=True, sync_interval=3600.,
+                 min_sync_interval=900., costs=None, clock=time.monotonic, sleep=time.sleep):
+        self.capacity = capacity
+        self.refund = refund
+        self.__rate = capacity / replenish_interval
+        self.__sync_interval = sync_interval
+        self.__min_sync_interval = min_sync_interval
+        # cost of a job on every device, DEVICE_COST (or 0 for simulators) if not given
+        self.__costs = dict() if costs is None else dict(costs)
+        self.__clock = clock
+        self.__sleep = sleep
+        self.__balance = None
+        self.__updated = clock()
+        self.__synced = None
+        self.__queue = []
+        self.__order = itertools.count()
+        self.__lock = threading.RLock()
+        self.syncs = 0
+
+    def cost(self, device):
+        if device in self.__costs:
+            return self.__costs[device]
+        return 0 if device is None or 'simulator' in device else DEVICE_COST
+
+    # modelled balance, None before the first sync
+    def balance(self):
+        with self.__lock:
+            now = self.__clock()
+            if self.__balance is not None:
+                self.__balance = min(self.capacity, self.__balance + self.__rate * (now - self.__updated))
+            self.__updated = now
+            return self.__balance
+
+    def needs_sync(self):
+        with self.__lock:
+            return self.__synced is None or self.__clock() - self.__synced >= self.__sync_interval
+
+    # replace the modelled balance with the one of the API, which is asked without holding the lock
+    def sync(self, Q_program):
+        credits = Q_program.get_api().get_my_credits()
+        with self.__lock:
+            self.__balance = credits['remaining']
+            self.capacity = credits.get('maxUserType', self.capacity) or self.capacity
+            self.__updated = self.__synced = self.__clock()
+            self.syncs += 1
+        logger.debug('sync() - %s credits remaining', str(credits['remaining']))
+
+    # force a sync before the next admission, e.g. after a job was refused for lack of credits
+    def invalidate(self):
+        with self.__lock:
+            self.__synced = None
+
+    # queue a job on device, return its ticket
+    def request(self, device, priority=0):
+        with self.__lock:
+            ticket = Ticket(priority, self.cost(device), next(self.__order), device)
+            heapq.heappush(self.__queue, ticket)
+        return ticket
+
+    # take a job that is no longer waiting out of the queue, or give its credits back if it was already admitted
+    def cancel(self, ticket):
+        with self.__lock:
+            if ticket.admitted:
+                self.release(ticket, submitted=False)
+            elif not ticket.cancelled:
+                ticket.cancelled = True
+                self.__queue.remove(ticket)
+                heapq.heapify(self.__queue)
+                logger.debug('cancel() - job on %s cancelled, %d still queued', ticket.device, len(self.__queue))
+
+    # admit a queued job if it is the first of the queue and the modelled balance covers it, or if it is free
+    def try_admit(self, ticket):
+        with self.__lock:
+            if ticket.admitted:
+                return True
+            if ticket.cancelled:
+                raise ValueError('Cannot admit a cancelled job on %s' % ticket.device)
+            while self.__queue and self.__queue[0].admitted:
+                heapq.heappop(self.__queue)
+            balance = self.balance()
+            if ticket.cost > 0 and (balance is None or self.__queue[0] is not ticket or balance < ticket.cost):
+                return False
+            ticket.admitted = True
+            if ticket.cost > 0:
+                self.__balance -= ticket.cost
+            logger.debug('try_admit() - %d credits on %s, %s left', ticket.cost, ticket.device, str(self.__balance))
+            return True
+
+    # seconds before a queued job could be admitted, according to the model
+    def delay(self, ticket):
+        with self.__lock:
+            balance = self.balance()
+            if ticket.admitted or balance is None:
+                return 0.0
+            needed = sum(queued.cost for queued in self.__queue
+                         if not queued.admitted and queued < ticket) + ticket.cost
+            return max(0.0, (needed - balance) / self.__rate)
+
+    # give the credits of a finished (or never submitted) job back, if the API refunds them;
+    # a job still waiting is cancelled
+    def release(self, ticket, submitted=True):
+        if ticket is None:
+            return
+        with self.__lock:
+            if not ticket.admitted:
+                self.cancel(ticket)
+                return
+            if ticket.released:
+                return
+            ticket.released = True
+            if (self.refund or not submitted) and ticket.cost > 0 and self.__balance is not None:
+                self.__balance = min(self.capacity, self.balance() + ticket.cost)
+
+    # block until a job on device is admitted, syncing with the API only when the model asks for it;
+    # the job is cancelled if anything (e.g. a ConnectionError while syncing) stops the wait
+    def acquire(self, Q_program, device, priority=0, description=''):
+        ticket = self.request(device, priority)
+        waiting = False
+        try:
+            while True:
+                if self.needs_sync():
+                    self.sync(Q_program)
+                if self.try_admit(ticket):
+                    if waiting:
+                        logger.critical('Credits replenished, resuming execution')
+                    return ticket
+                if not waiting:
+                    logger.critical('%s ---- Waiting for credits to replenish...', description)
+                    waiting = True
+                self.__sleep(max(1.0, min(self.delay(ticket), self.__min_sync_interval)))
+                with self.__lock:
+                    if self.__synced is not None and self.__clock() - self.__synced >= self.__min_sync_interval:
+                        self.__synced = None
+        except BaseException:
+            self.cancel(ticket)
+            raise
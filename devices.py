@@ -32,3 +32,5 @@ qx5 = 'ibmqx5'
 online_sim = 'ibmqx_qasm_simulator'
 
 local_sim = 'local_qasm_simulator'
+
+noisy_sim = 'noisy_qasm_simulator'
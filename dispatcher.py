@@ -0,0 +1,168 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+# Queue-aware routing of jobs across backends
+#
+# Every Task lists the devices it may run on. When a worker thread picks a task, Dispatcher routes it to the
+# candidate that is online, fits its number of qubits and is expected to finish it first: a new job on a device
+# waits for the jobs in its queue (pending_jobs of its status, at least the jobs this dispatcher has in flight on it)
+# and then runs, each job taking an estimated job_time seconds, smoothed with the duration of the jobs done there.
+# Counts are stored under the device the job ran on, in the usual per-device layout.
+
+import logging
+import threading
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+
+import myLogger
+import stabilizer
+import utility
+from async_exec import ENVARIANCE, PARITY
+from backend_monitor import is_available
+from devices import local_sim
+
+logger = logging.getLogger('dispatcher')
+logger.addHandler(myLogger.MyHandler())
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+# one circuit to run on any of devices, oracle is None for envariance experiments
+Task = namedtuple('Task', ['experiment', 'execution', 'devices', 'n_qubits', 'num_shots', 'oracle'])
+
+
+class Dispatcher(object):
+
+    def __init__(self, utilities, job_time=300., smoothing=0.3, threads=4, envariance_directory='Data_Envariance/',
+                 parity_directory='Data_Parity/', store=None):
+        # utilities maps every device to the Utility object built on its coupling map
+        self.__utilities = utilities
+        # estimated seconds taken by a job on every device, once it leaves the queue
+        self.__job_times = {device: job_time for device in utilities}
+        self.__smoothing = smoothing
+        self.__threads = threads
+        self.__directories = {ENVARIANCE: envariance_directory, PARITY: parity_directory}
+        self.__store = store
+        self.__in_flight = Counter()
+        self.__lock = threading.Lock()
+        # QuantumProgram of every worker thread
+        self.__local = threading.local()
+        self.routes = Counter()
+
+    # authenticated QuantumProgram of the calling thread, created once (or taken from utility.sessions every time,
+    # if there is a pool)
+    def program(self):
+        if utility.sessions is not None or getattr(self.__local, 'program', None) is None:
+            self.__local.program = utility.retrier.call(utility.connect, 0, description='Dispatcher')
+        return self.__local.program
+
+    # devices of a task that have a Utility and enough qubits, raises ValueError if there are none
+    def candidates(self, task):
+        devices = [device for device in task.devices if device in self.__utilities and (
+            utility.device_capacity(device) is None or task.n_qubits <= utility.device_capacity(device))]
+        if not devices:
+            raise ValueError('No device among %s can run %s' % (str(task.devices), str(task)))
+        return devices
+
+    # number of jobs queued on device, None if it does not accept jobs
+    @staticmethod
+    def queue(Q_program, device):
+        if device == local_sim:
+            return 0
+        if utility.monitors is not None:
+            status = utility.monitors.get(device).status()
+        else:
+            try:
+                status = utility.retrier.call(Q_program.get_backend_status, device, device=device,
+                                              description='Backend status')
+            except ValueError:
+                status = None
+        if not is_available(status):
+            return None
+        return status.get('pending_jobs', 0)
+
+    # expected seconds before a new job on device is done, behind ahead jobs, called holding the lock
+    def expected_time(self, device, ahead):
+        return (ahead + 1) * self.__job_times[device]
+
+    # choose the device of a task and count it in flight there, return it with the number of jobs it waits for:
+    # its queue, which holds at least the jobs this dispatcher has in flight on it
+    def route(self, task):
+        devices = self.candidates(task)
+        Q_program = self.program()
+        queues = {device: self.queue(Q_program, device) for device in devices}
+        online = [device for device in devices if queues[device] is not None]
+        with self.__lock:
+            if online:
+                ahead = {device: max(queues[device], self.__in_flight[device]) for device in online}
+                device = min(online, key=lambda candidate: self.expected_time(candidate, ahead[candidate]))
+            else:
+                # every candidate is offline: the executor waits for the first one to come back
+                logger.critical('%s - %s currently offline, waiting on %s', str(task), str(devices), devices[0])
+                device = devices[0]
+                ahead = {device: self.__in_flight[device]}
+            self.__in_flight[device] += 1
+            self.routes[device] += 1
+        logger.debug('route() - %s to %s, queues %s', str(task), device, str(queues))
+        return device, ahead[device]
+
+    # fold the duration of a job that waited for ahead jobs into the estimate of device
+    def observe(self, device, elapsed, ahead):
+        with self.__lock:
+            self.__job_times[device] += self.__smoothing * (elapsed / (ahead + 1) - self.__job_times[device])
+
+    # run a task on the given device, return its counts and the qubit ordering of its circuit
+    def execute(self, task, device):
+        if device == local_sim:
+            with self.__lock:
+                cached = self.__utilities[device].circuit(task.n_qubits, experiment=task.experiment,
+                                                          oracle=task.oracle)
+            return stabilizer.run_qasm(cached.qasm, task.num_shots), cached.connected
+        size = utility.device_size(device, task.n_qubits)
+        with self.__lock:
+            cached = self.__utilities[device].circuit(task.n_qubits, experiment=task.experiment, oracle=task.oracle,
+                                                      size=size)
+        data = utility.run_circuits(device, size, [cached.qasm], task.num_shots, task.execution, str(task))
+        return data[0]['counts'], cached.connected
+
+    def run_task(self, task):
+        device, ahead = self.route(task)
+        start = time()
+        try:
+            counts, connected = self.execute(task, device)
+        finally:
+            with self.__lock:
+                self.__in_flight[device] -= 1
+        self.observe(device, time() - start, ahead)
+        with self.__lock:
+            if task.experiment == ENVARIANCE:
+                utility.store_envariance(counts, task.execution, device, task.n_qubits, task.num_shots, connected,
+                                         self.__directories[ENVARIANCE], self.__store)
+            else:
+                utility.store_parity(counts, task.execution, device, task.n_qubits, task.oracle, task.num_shots,
+                                     connected, self.__directories[PARITY], self.__store)
+        logger.info('Done: %s on %s', str(task), device)
+        return device
+
+    # run every task on up to threads devices at a time, return the device each one ran on
+    def run(self, tasks):
+        with ThreadPoolExecutor(max_workers=self.__threads) as pool:
+            return list(pool.map(self.run_task, tasks))
@@ -25,6 +25,14 @@ import myLogger
 from utility import *
 from devices import *
 import coupling_maps
+from count_store import CountStore
+from async_exec import AsyncExecutor, Job, ENVARIANCE
+from ledger import JobLedger, SweepRunner
+from result_cache import ResultCache
+from credits import CreditManager
+from backend_monitor import MonitorPool
+from session import SessionPool
+import utility
 
 logger = logging.getLogger('envariance')
 logger.addHandler(myLogger.MyHandler())
@@ -39,43 +47,134 @@ shots = [
     8192
 ]
 
+qubits_qx4 = [
+    2,
+    3,
+    5
+]
+
+qubits_qx5 = [
+    2,
+    3,
+    5,
+    7,
+    9,
+    12,
+    14,
+    16
+]
+
+# if True, all the circuits of one execution with the same number of shots are submitted as a single job
+batch = False
+
+# if greater than 0, experiments run through the asyncio executor with up to in_flight jobs on each device
+in_flight = 0
+
+# if True, every job is recorded in the job ledger (Data_Store/ledger.db), so that running again after a crash
+# resumes the sweep where it stopped, collecting the jobs already submitted instead of submitting them again
+resumable = False
+
+# if True, the counts of every job are kept in the result cache (Data_Store/results.db), so that running
+# the same execution again is answered from it instead of spending credits
+cache_results = False
+
+# if True, jobs are admitted against a local model of the credit balance (see credits.py),
+# synced with the API only now and then instead of asking the credits before every job
+manage_credits = False
+
+# if True, the status of every device is shared among all jobs through a background monitor
+# (see backend_monitor.py), resuming within seconds when it comes back online
+monitor_backends = False
+
+# if True, the API is authenticated once and the same QuantumProgram is reused for every job (see session.py)
+reuse_sessions = False
+
+# GHZ layout: PATH for the breadth-first path from the most connected qubit, TREE for the depth-minimizing tree
+layout = PATH
+
 # launch_exp takes the argument device from devices module
 logger.info('Started')
 
-utility_qx4 = Utility(coupling_maps.qx4)
-for execution in range(1, executions+1, 1):
-    for n_shots in shots:
-        # Comment the experiments you don't want to run
-        logger.info('Qubits %d - Execution %d - Shots %d', 2, execution, n_shots)
-        envariance_exec(execution, qx4, utility_qx4, n_qubits=2, num_shots=8192)
-        logger.info('Qubits %d - Execution %d - Shots %d', 3, execution, n_shots)
-        envariance_exec(execution, qx4, utility_qx4, n_qubits=3, num_shots=n_shots)
-        logger.info('Qubits %d - Execution %d - Shots %d', 5, execution, n_shots)
-        envariance_exec(execution, qx4, utility_qx4, n_qubits=5, num_shots=n_shots)
-
-utility_qx4.close()
-
-utility_qx5 = Utility(coupling_maps.qx5)
-for execution in range(1, executions+1, 1):
-    for n_shots in shots:
-        # Comment the experiments you don't want to run
-        logger.info('Qubits %d - Execution %d - Shots %d', 2, execution, n_shots)
-        envariance_exec(execution, qx5, utility_qx5, n_qubits=2, num_shots=n_shots)
-        logger.info('Qubits %d - Execution %d - Shots %d', 3, execution, n_shots)
-        envariance_exec(execution, qx5, utility_qx5, n_qubits=3, num_shots=n_shots)
-        logger.info('Qubits %d - Execution %d - Shots %d', 5, execution, n_shots)
-        envariance_exec(execution, qx5, utility_qx5, n_qubits=5, num_shots=n_shots)
-        logger.info('Qubits %d - Execution %d - Shots %d', 7, execution, n_shots)
-        envariance_exec(execution, qx5, utility_qx5, n_qubits=7, num_shots=n_shots)
-        logger.info('Qubits %d - Execution %d - Shots %d', 9, execution, n_shots)
-        envariance_exec(execution, qx5, utility_qx5, n_qubits=9, num_shots=n_shots)
-        logger.info('Qubits %d - Execution %d - Shots %d', 12, execution, n_shots)
-        envariance_exec(execution, qx5, utility_qx5, n_qubits=12, num_shots=n_shots)
-        logger.info('Qubits %d - Execution %d - Shots %d', 14, execution, n_shots)
-        envariance_exec(execution, qx5, utility_qx5, n_qubits=14, num_shots=n_shots)
-        logger.info('Qubits %d - Execution %d - Shots %d', 16, execution, n_shots)
-        envariance_exec(execution, qx5, utility_qx5, n_qubits=16, num_shots=n_shots)
-
-utility_qx5.close()
+store = CountStore()
+
+if cache_results:
+    utility.result_cache = ResultCache()
+
+if manage_credits:
+    utility.credit_manager = CreditManager()
+
+if monitor_backends:
+    utility.monitors = MonitorPool(utility.authenticate)
+
+if reuse_sessions:
+    utility.sessions = SessionPool(QuantumProgram, Qconfig.APItoken, Qconfig.config["url"])
+
+if resumable or in_flight > 0:
+    utility_qx4 = Utility(coupling_maps.qx4, layout=layout)
+    utility_qx5 = Utility(coupling_maps.qx5, layout=layout)
+    jobs = [Job(ENVARIANCE, execution, qx4, n_qubits, n_shots, None) for execution in range(1, executions + 1, 1)
+            for n_shots in shots for n_qubits in qubits_qx4]
+    jobs += [Job(ENVARIANCE, execution, qx5, n_qubits, n_shots, None) for execution in range(1, executions + 1, 1)
+             for n_shots in shots for n_qubits in qubits_qx5]
+    if resumable:
+        job_ledger = JobLedger()
+        SweepRunner(job_ledger, {qx4: utility_qx4, qx5: utility_qx5}, batch=batch, store=store).run(jobs)
+        job_ledger.close()
+    else:
+        AsyncExecutor({qx4: utility_qx4, qx5: utility_qx5}, max_in_flight=in_flight, store=store).run(jobs)
+    utility_qx4.close()
+    utility_qx5.close()
+else:
+    utility_qx4 = Utility(coupling_maps.qx4, layout=layout)
+    for execution in range(1, executions+1, 1):
+        for n_shots in shots:
+            if batch:
+                logger.info('Qubits %s - Execution %d - Shots %d', str(qubits_qx4), execution, n_shots)
+                envariance_batch_exec(execution, qx4, utility_qx4, qubits=qubits_qx4, num_shots=n_shots, store=store)
+                continue
+            # Comment the experiments you don't want to run
+            logger.info('Qubits %d - Execution %d - Shots %d', 2, execution, n_shots)
+            envariance_exec(execution, qx4, utility_qx4, n_qubits=2, num_shots=8192, store=store)
+            logger.info('Qubits %d - Execution %d - Shots %d', 3, execution, n_shots)
+            envariance_exec(execution, qx4, utility_qx4, n_qubits=3, num_shots=n_shots, store=store)
+            logger.info('Qubits %d - Execution %d - Shots %d', 5, execution, n_shots)
+            envariance_exec(execution, qx4, utility_qx4, n_qubits=5, num_shots=n_shots, store=store)
+
+    utility_qx4.close()
+
+    utility_qx5 = Utility(coupling_maps.qx5, layout=layout)
+    for execution in range(1, executions+1, 1):
+        for n_shots in shots:
+            if batch:
+                logger.info('Qubits %s - Execution %d - Shots %d', str(qubits_qx5), execution, n_shots)
+                envariance_batch_exec(execution, qx5, utility_qx5, qubits=qubits_qx5, num_shots=n_shots, store=store)
+                continue
+            # Comment the experiments you don't want to run
+            logger.info('Qubits %d - Execution %d - Shots %d', 2, execution, n_shots)
+            envariance_exec(execution, qx5, utility_qx5, n_qubits=2, num_shots=n_shots, store=store)
+            logger.info('Qubits %d - Execution %d - Shots %d', 3, execution, n_shots)
+            envariance_exec(execution, qx5, utility_qx5, n_qubits=3, num_shots=n_shots, store=store)
+            logger.info('Qubits %d - Execution %d - Shots %d', 5, execution, n_shots)
+            envariance_exec(execution, qx5, utility_qx5, n_qubits=5, num_shots=n_shots, store=store)
+            logger.info('Qubits %d - Execution %d - Shots %d', 7, execution, n_shots)
+            envariance_exec(execution, qx5, utility_qx5, n_qubits=7, num_shots=n_shots, store=store)
+            logger.info('Qubits %d - Execution %d - Shots %d', 9, execution, n_shots)
+            envariance_exec(execution, qx5, utility_qx5, n_qubits=9, num_shots=n_shots, store=store)
+            logger.info('Qubits %d - Execution %d - Shots %d', 12, execution, n_shots)
+            envariance_exec(execution, qx5, utility_qx5, n_qubits=12, num_shots=n_shots, store=store)
+            logger.info('Qubits %d - Execution %d - Shots %d', 14, execution, n_shots)
+            envariance_exec(execution, qx5, utility_qx5, n_qubits=14, num_shots=n_shots, store=store)
+            logger.info('Qubits %d - Execution %d - Shots %d', 16, execution, n_shots)
+            envariance_exec(execution, qx5, utility_qx5, n_qubits=16, num_shots=n_shots, store=store)
+
+    utility_qx5.close()
+
+store.close()
+
+if cache_results:
+    utility.result_cache.close()
+
+if monitor_backends:
+    utility.monitors.stop()
 
 logger.info('All done.')
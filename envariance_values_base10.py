@@ -25,8 +25,10 @@ import operator
 import myLogger
 import os
 import math
+from count_reader import iter_values_base2
+from incremental import open_atomic
 
-logger = logging.getLogger('fidelity')
+logger = logging.getLogger('envariance_values_base10')
 logger.addHandler(myLogger.MyHandler())
 logger.setLevel(logging.INFO)
 logger.propagate = False
@@ -48,24 +50,34 @@ n_shots = 8192
 
 executions = 10
 
-directory = 'Data_Envariance/' + device + '/'
+directory = 'Data_Envariance/'
 
-logger.info('Started')
 
-for n_qubits in qubits:
-    writef = filename = directory + device + '_' + str(n_shots) + '_' + str(n_qubits) + '_qubits_envariance_hits_base10.txt'
-    os.makedirs(os.path.dirname(writef), exist_ok=True)
-    write_f = open(writef, 'a')
-    write_f.write('Value\t\tProbability\n\n')
-    readf = directory + device + '_' + str(
+# read the (base 10 value, probability) pairs from a values_base2 txt file
+def read_values_base2(directory, device, n_qubits, n_shots):
+    readf = directory + device + '/' + device + '_' + str(
         n_shots) + '_' + str(n_qubits) + '_qubits_envariance_values_base2.txt'
-    os.makedirs(os.path.dirname(readf), exist_ok=True)
-    read_f = open(readf, 'r')
-    lines = read_f.read().splitlines()
-    for line in range(2, len(lines), 1):
-        result = lines[line].split('\t')
-        logger.log(logging.VERBOSE, result)
-        value = int(result[0][1:], 2)
-        count = result[3]
-        write_f.write('%5d\t\t\t%5s\n' % (value, count))
-    write_f.close()
+    return [(value, '%1.4f' % probability) for value, probability, executions in iter_values_base2(readf)]
+
+
+# convert the values computed by envariance_values_base2.values_base2() to (base 10 value, probability) pairs
+def values_base10(values_base2):
+    return [(int(value, 2), '%1.4f' % probabilities[0]) for value, probabilities in values_base2]
+
+
+# write the values to their txt file
+def write_values_base10(directory, device, n_qubits, n_shots, values):
+    writef = directory + device + '/' + device + '_' + str(n_shots) + '_' + str(
+        n_qubits) + '_qubits_envariance_hits_base10.txt'
+    with open_atomic(writef) as write_f:
+        write_f.write('Value\t\tProbability\n\n')
+        for value, count in values:
+            write_f.write('%5d\t\t\t%5s\n' % (value, count))
+
+
+if __name__ == '__main__':
+    logger.info('Started')
+
+    for n_qubits in qubits:
+        write_values_base10(directory, device, n_qubits, n_shots,
+                            read_values_base2(directory, device, n_qubits, n_shots))
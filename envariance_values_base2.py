@@ -25,8 +25,10 @@ import operator
 import myLogger
 import os
 import math
+from count_store import CountStore, ENVARIANCE, import_envariance
+from incremental import Aggregator, open_atomic
 
-logger = logging.getLogger('fidelity')
+logger = logging.getLogger('envariance_values_base2')
 logger.addHandler(myLogger.MyHandler())
 logger.setLevel(logging.INFO)
 logger.propagate = False
@@ -48,42 +50,62 @@ n_shots = 8192
 
 executions = 10
 
-directory = 'Data_Envariance/' + device + '/'
+directory = 'Data_Envariance/'
 
-logger.info('Started')
+# incremental reads only the execution files that are new or changed since the last run (see incremental.py)
+incremental = False
 
-for n_qubits in qubits:
-    writef = filename = directory + device + '_' + str(n_shots) + '_' + str(n_qubits) + '_qubits_envariance_values_base2.txt'
-    os.makedirs(os.path.dirname(writef), exist_ok=True)
-    write_f = open(writef, 'a')
-    write_f.write('Value\t\t\t\t\t\tProbability\t\tEx1\t\tEx2\t\tEx3\t\tEx4\t\tEx5\t\tEx6\t\tEx7\t\tEx8\t\tEx9\t\tEx10\n\n')
+
+# probability of every measured value, averaged over executions and for every single execution,
+# sorted by decreasing probability; store may also be an incremental.Aggregator
+def values_base2(store, device, n_qubits, n_shots, executions):
     values = dict()
     for execution in range(1, executions + 1, 1):
-        readf = directory + '/' + 'execution' + str(execution) + '/' + device + '_' + str(
-            n_shots) + '_' + str(n_qubits) + '_qubits_envariance.txt'
-        os.makedirs(os.path.dirname(readf), exist_ok=True)
-        read_f = open(readf, 'r')
-        lines = read_f.read().splitlines()
-        for line in range(2, len(lines), 1):
-            result = lines[line].split('\t')
-            value = result[0]
-            counts = int(result[1])
+        for value, counts in store.get_histogram(ENVARIANCE, device, None, n_qubits, n_shots, execution).strings():
             if value not in values:
                 values.update({value: [0]})
             values[value][0] += (counts/n_shots)
             logger.debug('Values[%s]: %s' % (str(value), str(values[value])))
             values[value].append(counts/n_shots)
             logger.debug('Values[%s]: %s' % (str(value), str(values[value])))
-        read_f.close()
     for value in values:
         values[value][0] /= executions
-    # logger.info('Values: %s' % str(values))
-    values = sorted(values.items(), key=operator.itemgetter(1), reverse=True)
-    for value in values:
-        write_f.write('%16s\t\t' % str(value[0]))
-        for counts in range(len(value[1])):
-            write_f.write('\t%1.4f' % value[1][counts])
-            if counts == 0:
-               write_f.write('\t\t')
-        write_f.write('\n')
-    write_f.close()
+    return sorted(values.items(), key=operator.itemgetter(1), reverse=True)
+
+
+# write the values to their txt file
+def write_values_base2(directory, device, n_qubits, n_shots, values):
+    writef = directory + device + '/' + device + '_' + str(n_shots) + '_' + str(
+        n_qubits) + '_qubits_envariance_values_base2.txt'
+    with open_atomic(writef) as write_f:
+        write_f.write('Value\t\t\t\t\t\tProbability\t\tEx1\t\tEx2\t\tEx3\t\tEx4\t\tEx5\t\tEx6\t\tEx7\t\tEx8\t\tEx9\t\tEx10\n\n')
+        for value in values:
+            write_f.write('%16s\t\t' % str(value[0]))
+            for counts in range(len(value[1])):
+                write_f.write('\t%1.4f' % value[1][counts])
+                if counts == 0:
+                   write_f.write('\t\t')
+            write_f.write('\n')
+
+
+if __name__ == '__main__':
+    logger.info('Started')
+
+    # counts are read from the binary count store, the txt data tree is imported on first use
+    store = CountStore()
+    if incremental:
+        aggregator = Aggregator()
+        aggregator.update(ENVARIANCE, directory, store)
+        source = aggregator
+    else:
+        if not store.keys(experiment=ENVARIANCE, device=device):
+            import_envariance(store)
+        source = store
+
+    for n_qubits in qubits:
+        write_values_base2(directory, device, n_qubits, n_shots,
+                           values_base2(source, device, n_qubits, n_shots, executions))
+
+    if incremental:
+        aggregator.save()
+    store.close()
@@ -0,0 +1,406 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+# In-process stand-in for the IBM QX API, to run and load-test the executors offline
+#
+# FakeServer models the backends (job queue, latency, available/busy flags and outages),
+# the credits (spent on submission, refunded when the job is done and replenished periodically)
+# and injected ConnectionErrors; counts (and the per-shot memory, when the job asks for it) are sampled locally
+# from the submitted QASM.
+# FakeQuantumProgram and FakeAPI expose the subset of QuantumProgram and of the API client
+# used by utility.py, install() makes utility.py use them instead of QISKit.
+
+import logging
+import threading
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+import myLogger
+from circuits import Register, Circuit, from_qasm
+from devices import *
+
+logger = logging.getLogger('fake_ibmqx')
+logger.addHandler(myLogger.MyHandler())
+logger.setLevel(logging.CRITICAL)
+logger.propagate = False
+
+_gates = {
+    'h': np.array([[1, 1], [1, -1]], dtype=complex) / np.sqrt(2),
+    'x': np.array([[0, 1], [1, 0]], dtype=complex),
+    'y': np.array([[0, -1j], [1j, 0]], dtype=complex),
+    'z': np.array([[1, 0], [0, -1]], dtype=complex),
+    's': np.array([[1, 0], [0, 1j]], dtype=complex),
+    'sdg': np.array([[1, 0], [0, -1j]], dtype=complex),
+    'id': np.eye(2, dtype=complex),
+}
+
+
+# sample counts from a recorded circuit by simulating its state vector,
+# keys follow the QISKit convention (classical bit 0 is the rightmost character);
+# if memory is True, return the counts and the per-shot memory ('0x..' hex strings, in the order of the shots)
+def statevector_sampler(circuit, shots, rng, memory=False):
+    n = circuit.size
+    state = np.zeros(2 ** n, dtype=complex)
+    state[0] = 1
+    # qubit q is axis n-1-q, so that bit q of the flat index is the state of qubit q
+    state = state.reshape([2] * n)
+    measured = []
+    for gate, args in circuit.ops:
+        if gate == 'measure':
+            measured.append(args)
+        elif gate == 'cx':
+            control = n - 1 - args[0]
+            target = n - 1 - args[1]
+            index = [slice(None)] * n
+            index[control] = 1
+            if target > control:
+                target -= 1
+            state[tuple(index)] = np.flip(state[tuple(index)], axis=target)
+        else:
+            axis = n - 1 - args[0]
+            state = np.moveaxis(np.tensordot(_gates[gate], state, axes=([1], [axis])), 0, axis)
+    probabilities = np.abs(state.reshape(-1)) ** 2
+    probabilities /= probabilities.sum()
+    outcomes, inverse, hits = np.unique(rng.choice(2 ** n, size=shots, p=probabilities), return_inverse=True,
+                                        return_counts=True)
+    form = '0%db' % circuit.classical_r.size
+    counts = dict()
+    values = []
+    for outcome, count in zip(outcomes, hits):
+        clbits = 0
+        for qubit, clbit in measured:
+            if (outcome >> qubit) & 1:
+                clbits |= 1 << clbit
+        key = format(clbits, form)
+        counts[key] = counts.get(key, 0) + int(count)
+        values.append(hex(clbits))
+    if memory:
+        return counts, [values[index] for index in inverse.reshape(-1)]
+    return counts
+
+
+class FakeBackend(object):
+
+    def __init__(self, name, n_qubits, latency=1.0, cost=3, simulator=False):
+        self.name = name
+        self.n_qubits = n_qubits
+        self.latency = latency
+        self.cost = cost
+        self.simulator = simulator
+        self.online = True
+        self.outages = []
+        # time at which the last queued job will be done
+        self.free_at = 0.0
+
+
+class FakeServer(object):
+
+    def __init__(self, backends=None, credits=15, replenish_interval=24 * 3600., refund=True,
+                 connection_error_rate=0.0, error_methods=None, seed=None, sampler=statevector_sampler,
+                 clock=time.monotonic, poll_interval=None):
+        if backends is None:
+            backends = [
+                FakeBackend(qx2, 5),
+                FakeBackend(qx3, 16),
+                FakeBackend(qx4, 5),
+                FakeBackend(qx5, 16),
+                FakeBackend(online_sim, 24, latency=0.1, simulator=True),
+            ]
+        self.backends = {backend.name: backend for backend in backends}
+        self.max_credits = credits
+        self.credits = credits
+        self.replenish_interval = replenish_interval
+        self.refund = refund
+        self.connection_error_rate = connection_error_rate
+        # methods that can fail with a ConnectionError, None for all of them
+        self.error_methods = error_methods
+        self.sampler = sampler
+        self.clock = clock
+        # seconds between two polls in FakeQuantumProgram.execute(), None to honour its wait argument
+        self.poll_interval = poll_interval
+        self.calls = Counter()
+        self.__rng = np.random.default_rng(seed)
+        self.__lock = threading.RLock()
+        self.__jobs = dict()
+        self.__pending = deque()
+        self.__next_id = 0
+        self.__fail_next = 0
+        self.__fail_jobs = 0
+        self.__replenished_at = clock()
+
+    # new QuantumProgram bound to this server
+    def program(self):
+        return FakeQuantumProgram(self)
+
+    # make the next n calls fail with a ConnectionError
+    def fail_next(self, n=1):
+        with self.__lock:
+            self.__fail_next += n
+
+    # make the next n jobs run and end with an error instead of counts
+    def fail_jobs(self, n=1):
+        with self.__lock:
+            self.__fail_jobs += n
+
+    def set_online(self, backend, online=True):
+        with self.__lock:
+            self.backends[backend].online = online
+
+    # make a backend unavailable for duration seconds, starting delay seconds from now
+    def schedule_outage(self, backend, duration, delay=0.0):
+        with self.__lock:
+            start = self.clock() + delay
+            self.backends[backend].outages.append((start, start + duration))
+
+    def is_available(self, backend, now=None):
+        now = self.clock() if now is None else now
+        backend = self.backends[backend]
+        return backend.online and not any(start <= now < end for start, end in backend.outages)
+
+    # count the call and raise a ConnectionError if one has to be injected
+    def call(self, method):
+        with self.__lock:
+            self.calls[method] += 1
+            self.advance()
+            if self.__fail_next > 0:
+                self.__fail_next -= 1
+                raise ConnectionError('Injected connection error in %s' % method)
+            if self.connection_error_rate > 0 and (self.error_methods is None or method in self.error_methods):
+                if self.__rng.random() < self.connection_error_rate:
+                    raise ConnectionError('Injected connection error in %s' % method)
+
+    # replenish credits and refund the jobs done so far
+    def advance(self):
+        with self.__lock:
+            now = self.clock()
+            if now - self.__replenished_at >= self.replenish_interval:
+                self.credits = max(self.credits, self.max_credits)
+                self.__replenished_at = now
+            while self.__pending and self.__jobs[self.__pending[0]]['end'] <= now:
+                job = self.__jobs[self.__pending.popleft()]
+                if self.refund:
+                    self.credits = min(self.max_credits, self.credits + job['cost'])
+
+    def backend_status(self, backend):
+        with self.__lock:
+            if backend not in self.backends:
+                raise ValueError('Unknown backend %s' % backend)
+            now = self.clock()
+            pending = sum(1 for job_id in self.__pending if self.__jobs[job_id]['backend'] == backend
+                          and self.__jobs[job_id]['end'] > now)
+            return {'name': backend, 'available': self.is_available(backend, now), 'busy': pending > 0,
+                    'pending_jobs': pending}
+
+    # submit a job, keeping the per-shot memory of its circuits if memory is True
+    def run_job(self, qasms, backend, shots, max_credits, memory=False):
+        with self.__lock:
+            if backend not in self.backends:
+                return {'error': {'status': 400, 'message': 'Unknown backend %s' % backend}}
+            if not self.is_available(backend):
+                return {'error': {'status': 400, 'message': 'Backend %s is offline' % backend}}
+            device = self.backends[backend]
+            circuits = [from_qasm(qasm['qasm']) for qasm in qasms]
+            if any(circuit.size > device.n_qubits for circuit in circuits):
+                return {'error': {'status': 400, 'message': 'Too many qubits for %s' % backend}}
+            cost = min(device.cost, max_credits)
+            if self.credits < cost:
+                return {'error': {'status': 400, 'message': 'Not enough credits'}}
+            self.credits -= cost
+            now = self.clock()
+            start = max(now, device.free_at)
+            device.free_at = start + device.latency
+            self.__next_id += 1
+            job_id = 'fake-%06d' % self.__next_id
+            self.__jobs[job_id] = {'id': job_id, 'backend': backend, 'shots': shots, 'cost': cost,
+                                   'qasms': [qasm['qasm'] for qasm in qasms], 'circuits': circuits,
+                                   'end': device.free_at, 'data': None, 'memory': memory,
+                                   'failed': self.__fail_jobs > 0}
+            self.__fail_jobs = max(0, self.__fail_jobs - 1)
+            self.__pending.append(job_id)
+            logger.debug('run_job() - %s on %s, done at %f', job_id, backend, device.free_at)
+            return {'id': job_id, 'status': 'RUNNING'}
+
+    def get_job(self, job_id):
+        with self.__lock:
+            if job_id not in self.__jobs:
+                return {'error': {'status': 404, 'message': 'Unknown job %s' % job_id}}
+            job = self.__jobs[job_id]
+            if self.clock() < job['end']:
+                return {'id': job_id, 'status': 'RUNNING', 'backend': {'name': job['backend']}}
+            if job['failed']:
+                return {'id': job_id, 'status': 'ERROR_RUNNING_JOB', 'backend': {'name': job['backend']}}
+            if job['data'] is None:
+                job['data'] = []
+                for circuit in job['circuits']:
+                    if job['memory']:
+                        counts, memory = self.sampler(circuit, job['shots'], self.__rng, memory=True)
+                        job['data'].append({'counts': counts, 'memory': memory})
+                    else:
+                        job['data'].append({'counts': self.sampler(circuit, job['shots'], self.__rng)})
+            return {'id': job_id, 'status': 'COMPLETED', 'backend': {'name': job['backend']}, 'shots': job['shots'],
+                    'qasms': [{'qasm': qasm, 'status': 'DONE', 'result': {'data': dict(data)}}
+                              for qasm, data in zip(job['qasms'], job['data'])]}
+
+
+# stand-in for the API client returned by QuantumProgram.get_api()
+class FakeAPI(object):
+
+    def __init__(self, server):
+        self.__server = server
+
+    def get_my_credits(self):
+        self.__server.call('get_my_credits')
+        return {'remaining': self.__server.credits, 'promotional': 0, 'maxUserType': self.__server.max_credits}
+
+    def backend_status(self, backend):
+        self.__server.call('backend_status')
+        return self.__server.backend_status(backend)
+
+    def available_backends(self):
+        self.__server.call('available_backends')
+        return [{'name': name, 'simulator': backend.simulator, 'n_qubits': backend.n_qubits}
+                for name, backend in self.__server.backends.items()]
+
+    def run_job(self, qasms, backend='simulator', shots=1, max_credits=3, seed=None, memory=False):
+        self.__server.call('run_job')
+        return self.__server.run_job(qasms, backend, shots, max_credits, memory)
+
+    def get_job(self, id_job):
+        self.__server.call('get_job')
+        return self.__server.get_job(id_job)
+
+
+class FakeResult(object):
+
+    def __init__(self, job, names):
+        self.__job = job
+        self.__names = names
+
+    def get_status(self):
+        return self.__job.get('status', 'ERROR')
+
+    def get_counts(self, name):
+        if self.get_status() != 'COMPLETED':
+            raise Exception('Job is not completed: %s' % str(self.__job))
+        return self.__job['qasms'][self.__names.index(name)]['result']['data']['counts']
+
+
+# stand-in for qiskit.QuantumProgram
+class FakeQuantumProgram(object):
+
+    def __init__(self, server):
+        self.__server = server
+        self.__api = None
+        self.__quantum_registers = dict()
+        self.__classical_registers = dict()
+        self.__circuits = dict()
+
+    def set_api(self, token, url):
+        self.__server.call('set_api')
+        self.__api = FakeAPI(self.__server)
+
+    def get_api(self):
+        return self.__api
+
+    def create_quantum_register(self, name, size):
+        if name not in self.__quantum_registers or self.__quantum_registers[name].size != size:
+            self.__quantum_registers[name] = Register(name, size)
+        return self.__quantum_registers[name]
+
+    def create_classical_register(self, name, size):
+        if name not in self.__classical_registers or self.__classical_registers[name].size != size:
+            self.__classical_registers[name] = Register(name, size)
+        return self.__classical_registers[name]
+
+    def create_circuit(self, name, qregisters, cregisters):
+        self.__circuits[name] = Circuit(name, qregisters[0], cregisters[0])
+        return self.__circuits[name]
+
+    def get_circuit(self, name):
+        return self.__circuits[name]
+
+    def get_qasm(self, name):
+        return self.__circuits[name].qasm()
+
+    def get_backend_status(self, backend):
+        return self.__api.backend_status(backend)
+
+    def execute(self, name_of_circuits, backend='local_qasm_simulator', wait=5, timeout=60, shots=1024,
+                max_credits=3, silent=True):
+        qasms = [{'qasm': self.get_qasm(name)} for name in name_of_circuits]
+        job = self.__api.run_job(qasms, backend, shots, max_credits)
+        if 'error' in job:
+            return FakeResult({'status': 'ERROR', 'result': job['error']}, name_of_circuits)
+        started = self.__server.clock()
+        while True:
+            result = self.__api.get_job(job['id'])
+            if result.get('status') == 'COMPLETED':
+                return FakeResult(result, name_of_circuits)
+            if self.__server.clock() - started > timeout:
+                return FakeResult({'status': 'ERROR', 'result': 'Time Out'}, name_of_circuits)
+            time.sleep(wait if self.__server.poll_interval is None else self.__server.poll_interval)
+
+
+class FakeConfig(object):
+    APItoken = 'fake-token'
+    config = {'url': 'http://localhost/fake_ibmqx/api'}
+
+
+# make utility.py talk to the given server instead of the IBM QX API
+def install(server):
+    import utility
+    utility.QuantumProgram = server.program
+    utility.Qconfig = FakeConfig
+
+
+if __name__ == '__main__':
+    import utility
+    import coupling_maps
+    import retry
+
+    logger.setLevel(logging.INFO)
+
+    # load test: a parity sweep on a fast fake qx5 with 5% of failing API calls
+    fake_server = FakeServer(backends=[FakeBackend(qx5, 16, latency=0.05)], credits=30,
+                             connection_error_rate=0.05,
+                             error_methods=['set_api', 'backend_status', 'run_job', 'get_job'], seed=1,
+                             poll_interval=0.01)
+    install(fake_server)
+    utility.retrier = retry.Retrier(policies={kind: retry.RetryPolicy(max_attempts=None, base=0.01, max_delay=0.1)
+                                              for kind in retry.DEFAULT_POLICIES}, cooldown=0.1)
+    utility.OFFLINE_WAIT = 0.01
+    utility.JOB_WAIT = 0.01
+    utility.CREDITS_WAIT = 0.01
+
+    utility_qx5 = utility.Utility(coupling_maps.qx5)
+    jobs = 0
+    begin = time.perf_counter()
+    for oracle in ['00', '10', '11']:
+        for n_qubits in [3, 9, 16]:
+            utility.parity_exec(1, qx5, utility_qx5, n_qubits=n_qubits, oracle=oracle, num_shots=100,
+                                directory='/tmp/fake_ibmqx/Data_Parity/')
+            jobs += 1
+    elapsed = time.perf_counter() - begin
+    utility_qx5.close()
+    logger.info('%d jobs in %.2f s (%.2f jobs/s)', jobs, elapsed, jobs / elapsed)
+    logger.info('API calls: %s', str(dict(fake_server.calls)))
@@ -19,62 +19,136 @@ __license__ = "Apache"
 __version__ = "2.0"
 __email__ = "davide.ferrari8@studenti.unipr.it"
 
+# Classical fidelity of the GHZ states of the envariance experiments
+#
+# The fidelity of an execution is sqrt(p(00..0) / 2) + sqrt(p(11..1) / 2). fidelity_table() loads every envariance
+# count table of the count store into concatenated arrays and computes, in one vectorized pass, the fidelity of every
+# device, number of qubits, shots and execution, together with the mean and standard deviation over the executions
+# of every (device, qubits, shots) cell and its trend, the change of the mean per added qubit since the previous
+# number of qubits of the same device and shots.
+
 import logging
+from collections import namedtuple
+
+import numpy as np
 
 import myLogger
-import os
-import math
+from count_store import CountStore, ENVARIANCE, Key, import_envariance
+from incremental import open_atomic
 
 logger = logging.getLogger('fidelity')
 logger.addHandler(myLogger.MyHandler())
 logger.setLevel(logging.INFO)
 logger.propagate = False
 
-device = 'ibmqx5'
-
-qubits = [
-    2,
-    3,
-    5,
-    7,
-    9,
-    12,
-    14,
-    16
-]
-
-n_shots = 8192
-
-executions = 10
-
-directory = 'Data_Envariance/' + device + '/'
-
-logger.info('Started')
-
-for n_qubits in qubits:
-    writef = filename = directory + device + '_' + str(n_shots) + '_' + str(n_qubits) + '_qubits_envariance_fidelity.txt'
-    os.makedirs(os.path.dirname(writef), exist_ok=True)
-    write_f = open(writef, 'a')
-    write_f.write('Exec\t\tFidelity\n\n')
-    for execution in range(1, executions + 1, 1):
-        fidelity = 0
-        readf = directory + '/' + 'execution' + str(execution) + '/' + device + '_' + str(
-            n_shots) + '_' + str(n_qubits) + '_qubits_envariance.txt'
-        os.makedirs(os.path.dirname(readf), exist_ok=True)
-        read_f = open(readf, 'r')
-        lines = read_f.read().splitlines()
-        zeroes = ''
-        ones = ''
-        for i in range(n_qubits):
-            zeroes += '0'
-            ones += '1'
-        for line in range(2, len(lines), 1):
-            result = lines[line].split('\t')
-            value = result[0]
-            counts = int(result[1])
-            if value == ones or value == zeroes:
-                fidelity += math.sqrt(counts/(2 * n_shots))
-        read_f.close()
-        logger.debug(fidelity)
-        write_f.write('%2d %1.20f\n' % (execution, fidelity))
-write_f.close()
+# devices are the devices whose fidelities are computed, None for every device in the count store
+devices = None
+
+directory = 'Data_Envariance/'
+
+# fidelities of every execution in the store, with the statistics of its (device, n_qubits, shots) cell
+FidelityTable = namedtuple('FidelityTable', ['keys', 'fidelities', 'mean', 'std', 'trend'])
+
+
+# every envariance count table of the store, as the sorted list of their keys and concatenated arrays of outcomes,
+# counts and the table every entry comes from
+def load_tables(store, devices=None):
+    keys = sorted((key for key in store.keys(experiment=ENVARIANCE) if devices is None or key.device in devices),
+                  key=lambda key: (key.device, key.n_qubits, key.shots, key.execution))
+    values = []
+    counts = []
+    for key in keys:
+        outcomes, hits = store.get(*key)
+        values.append(np.frombuffer(outcomes, dtype=np.uint64))
+        counts.append(np.frombuffer(hits, dtype=np.uint32))
+    sizes = [len(table_values) for table_values in values]
+    tables = np.repeat(np.arange(len(keys)), sizes)
+    if not keys:
+        return keys, np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.uint32), tables
+    return keys, np.concatenate(values), np.concatenate(counts), tables
+
+
+# classical fidelity of every table, from the arrays returned by load_tables()
+def fidelities(keys, values, counts, tables):
+    n_qubits = np.array([key.n_qubits for key in keys], dtype=np.uint64)
+    shots = np.array([key.shots for key in keys], dtype=np.float64)
+    ones = (np.uint64(1) << n_qubits) - np.uint64(1)
+    ghz = (values == 0) | (values == ones[tables])
+    terms = np.sqrt(counts[ghz] / (2 * shots[tables[ghz]]))
+    return np.bincount(tables[ghz], weights=terms, minlength=len(keys)).astype(np.float64)
+
+
+# fidelities of every execution of every device in the store, with mean, std and trend of their cells
+def fidelity_table(store, devices=None):
+    keys, values, counts, tables = load_tables(store, devices)
+    table_fidelities = fidelities(keys, values, counts, tables)
+    cell_ids = dict()
+    cells = np.array([cell_ids.setdefault((key.device, key.n_qubits, key.shots), len(cell_ids)) for key in keys],
+                     dtype=np.int64)
+    executions = np.bincount(cells, minlength=len(cell_ids))
+    mean = np.bincount(cells, weights=table_fidelities, minlength=len(cell_ids)) / np.maximum(executions, 1)
+    deviations = table_fidelities - mean[cells]
+    std = np.sqrt(np.bincount(cells, weights=deviations * deviations, minlength=len(cell_ids)) /
+                  np.maximum(executions, 1))
+    # cells are sorted by device, qubits and shots: reorder them by device, shots and qubits to compare every
+    # number of qubits with the previous one
+    cell_keys = list(cell_ids)
+    order = sorted(range(len(cell_keys)), key=lambda cell: (cell_keys[cell][0], cell_keys[cell][2],
+                                                             cell_keys[cell][1]))
+    order = np.array(order, dtype=np.int64)
+    qubits = np.array([cell_key[1] for cell_key in cell_keys], dtype=np.float64)
+    trend = np.full(len(cell_keys), np.nan)
+    if len(order) > 1:
+        previous, current = order[:-1], order[1:]
+        same = np.array([cell_keys[a][0] == cell_keys[b][0] and cell_keys[a][2] == cell_keys[b][2]
+                         for a, b in zip(previous.tolist(), current.tolist())], dtype=bool)
+        trend[current[same]] = (mean[current[same]] - mean[previous[same]]) / \
+            (qubits[current[same]] - qubits[previous[same]])
+    return FidelityTable(keys, table_fidelities, mean[cells], std[cells], trend[cells])
+
+
+# classical fidelity of every execution for the given device, number of qubits and shots
+def fidelity(store, device, n_qubits, n_shots, executions):
+    keys = [(ENVARIANCE, device, None, n_qubits, n_shots, execution) for execution in range(1, executions + 1, 1)]
+    values = []
+    counts = []
+    for key in keys:
+        histogram = store.get_histogram(*key)
+        values.append(histogram.values())
+        counts.append(histogram.counts())
+    tables = np.repeat(np.arange(len(keys)), [len(table_values) for table_values in values])
+    keys = [Key(*key) for key in keys]
+    return fidelities(keys, np.concatenate(values), np.concatenate(counts), tables).tolist()
+
+
+# write the fidelities of every execution to their txt file
+def write_fidelity(directory, device, n_qubits, n_shots, fidelities):
+    writef = directory + device + '/' + device + '_' + str(n_shots) + '_' + str(
+        n_qubits) + '_qubits_envariance_fidelity.txt'
+    with open_atomic(writef) as write_f:
+        write_f.write('Exec\t\tFidelity\n\n')
+        for execution, value_fidelity in enumerate(fidelities, 1):
+            write_f.write('%2d %1.20f\n' % (execution, value_fidelity))
+
+
+# write a fidelity table as one tab-separated row for every execution
+def write_table(filename, table):
+    with open_atomic(filename) as write_f:
+        write_f.write('Device\tQubits\tShots\tExec\tFidelity\tMean\tStd\tTrend\n\n')
+        for key, value_fidelity, mean, std, trend in zip(table.keys, table.fidelities.tolist(), table.mean.tolist(),
+                                                         table.std.tolist(), table.trend.tolist()):
+            write_f.write('%s\t%d\t%d\t%d\t%1.20f\t%1.20f\t%1.20f\t%1.20f\n' % (
+                key.device, key.n_qubits, key.shots, key.execution, value_fidelity, mean, std, trend))
+
+
+if __name__ == '__main__':
+    logger.info('Started')
+
+    # counts are read from the binary count store, the txt data tree is imported on first use
+    store = CountStore()
+    if not store.keys(experiment=ENVARIANCE):
+        import_envariance(store, directory)
+
+    write_table(directory + 'fidelity.txt', fidelity_table(store, devices))
+
+    store.close()
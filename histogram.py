@@ -0,0 +1,226 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+# Compact count tables
+#
+# Histogram holds the counts of the outcomes of n_bits measured bits with outcomes packed as integers, bit 0 being
+# the rightmost character of the bitstring (as in the count store). It is sparse, a sorted uint64 array of the
+# outcomes seen and a uint32 array of their counts (12 bytes per outcome), unless a dense uint32 array of all
+# the 2^n_bits counts takes less memory. Histograms are immutable: merge(), marginalize() and remap() return new ones.
+
+import logging
+from functools import lru_cache
+
+import numpy as np
+
+import myLogger
+
+logger = logging.getLogger('histogram')
+logger.addHandler(myLogger.MyHandler())
+logger.setLevel(logging.CRITICAL)
+logger.propagate = False
+
+# largest number of bits of a dense histogram
+MAX_DENSE_BITS = 24
+
+# max number of bits of a packed outcome
+MAX_BITS = 64
+
+
+# lookup tables of Histogram.remap(): for every byte of the old outcomes that holds a bit of order, the bits of
+# the new outcome set by each of its 256 values; compiled once for every order
+@lru_cache(maxsize=256)
+def _remap_tables(order):
+    byte_values = np.arange(256, dtype=np.uint64)
+    tables = dict()
+    for position, bit in enumerate(order):
+        table = tables.setdefault(bit // 8, np.zeros(256, dtype=np.uint64))
+        table |= ((byte_values >> np.uint64(bit % 8)) & np.uint64(1)) << np.uint64(len(order) - 1 - position)
+    for table in tables.values():
+        table.flags.writeable = False
+    return tuple(sorted(tables.items()))
+
+
+# pack bitstrings of the same length into uint64 outcomes
+def from_strings(keys):
+    if not keys:
+        return np.empty(0, dtype=np.uint64)
+    chars = np.frombuffer(''.join(keys).encode('ascii'), dtype=np.uint8).reshape(len(keys), -1)
+    weights = np.uint64(1) << np.arange(chars.shape[1] - 1, -1, -1, dtype=np.uint64)
+    return ((chars - ord('0')).astype(np.uint64) * weights).sum(axis=1, dtype=np.uint64)
+
+
+# bitstrings of n_bits characters of packed outcomes
+def to_strings(values, n_bits):
+    values = np.asarray(values, dtype=np.uint64)
+    if n_bits == 0:
+        return [''] * len(values)
+    shifts = np.arange(n_bits - 1, -1, -1, dtype=np.uint64)
+    chars = ((values[:, None] >> shifts) & np.uint64(1)).astype(np.uint8) + ord('0')
+    return chars.view('S%d' % n_bits).ravel().astype('U%d' % n_bits).tolist()
+
+
+class Histogram(object):
+
+    __slots__ = ('n_bits', '__values', '__counts')
+
+    # values and counts are the outcomes and their counts, outcomes may repeat
+    def __init__(self, values, counts, n_bits):
+        if n_bits > MAX_BITS:
+            raise ValueError('Cannot pack %d bits, histograms are limited to %d' % (n_bits, MAX_BITS))
+        self.n_bits = n_bits
+        values = np.asarray(values, dtype=np.uint64)
+        counts = np.asarray(counts, dtype=np.uint32)
+        if len(values) > 0 and n_bits < MAX_BITS and int(values.max()) >> n_bits:
+            raise ValueError('Outcome %d does not fit %d bits' % (int(values.max()), n_bits))
+        if len(values) > 1 and not np.all(values[1:] > values[:-1]):
+            values, inverse = np.unique(values, return_inverse=True)
+            counts = np.bincount(inverse, weights=counts, minlength=len(values)).astype(np.uint32)
+        nonzero = counts > 0
+        if not np.all(nonzero):
+            values, counts = values[nonzero], counts[nonzero]
+        if n_bits <= MAX_DENSE_BITS and len(values) * 3 > 1 << n_bits:
+            self.__values = None
+            self.__counts = np.zeros(1 << n_bits, dtype=np.uint32)
+            self.__counts[values.astype(np.intp)] = counts
+        else:
+            self.__values = values
+            self.__counts = counts
+
+    # histogram of a count table: a dict or an iterable of (value, count) pairs, values being either bitstrings
+    # or packed outcomes (n_bits is then required), or another Histogram, returned as is
+    @classmethod
+    def from_counts(cls, counts, n_bits=None):
+        if isinstance(counts, Histogram):
+            return counts
+        if isinstance(counts, dict):
+            counts = counts.items()
+        pairs = list(counts)
+        values = [value for value, count in pairs]
+        hits = [count for value, count in pairs]
+        if values and isinstance(values[0], str):
+            n_bits = len(values[0]) if n_bits is None else n_bits
+            values = from_strings(values)
+        elif n_bits is None:
+            raise ValueError('n_bits is needed for packed outcomes')
+        return cls(np.asarray(values, dtype=np.uint64), hits, n_bits)
+
+    @property
+    def dense(self):
+        return self.__values is None
+
+    # bytes taken by the arrays of the histogram
+    @property
+    def nbytes(self):
+        return self.__counts.nbytes + (0 if self.__values is None else self.__values.nbytes)
+
+    # outcomes with a nonzero count, in increasing order
+    def values(self):
+        if self.__values is None:
+            return np.flatnonzero(self.__counts).astype(np.uint64)
+        return self.__values
+
+    # counts of the outcomes returned by values()
+    def counts(self):
+        if self.__values is None:
+            return self.__counts[self.__counts > 0]
+        return self.__counts
+
+    def __len__(self):
+        if self.__values is None:
+            return int(np.count_nonzero(self.__counts))
+        return len(self.__values)
+
+    # count of an outcome, given as a bitstring or packed
+    def __getitem__(self, value):
+        if isinstance(value, str):
+            value = int(value, 2)
+        if value < 0 or (self.n_bits < MAX_BITS and value >> self.n_bits):
+            return 0
+        if self.__values is None:
+            return int(self.__counts[value])
+        position = int(np.searchsorted(self.__values, np.uint64(value)))
+        if position < len(self.__values) and int(self.__values[position]) == value:
+            return int(self.__counts[position])
+        return 0
+
+    def __eq__(self, other):
+        return isinstance(other, Histogram) and self.n_bits == other.n_bits and \
+            np.array_equal(self.values(), other.values()) and np.array_equal(self.counts(), other.counts())
+
+    def __repr__(self):
+        return 'Histogram(%d bits, %d outcomes, %d shots)' % (self.n_bits, len(self), self.total())
+
+    def total(self):
+        return int(self.__counts.sum(dtype=np.uint64))
+
+    # (packed outcome, count) pairs in increasing order of the outcome
+    def items(self):
+        return list(zip(self.values().tolist(), self.counts().tolist()))
+
+    # (bitstring, count) pairs in increasing order of the outcome
+    def strings(self):
+        return list(zip(to_strings(self.values(), self.n_bits), self.counts().tolist()))
+
+    def to_dict(self):
+        return dict(self.strings())
+
+    # outcomes and counts of the k most frequent outcomes (all of them if k is None), by decreasing count
+    # and then increasing outcome
+    def top(self, k=None):
+        values = self.values()
+        counts = self.counts()
+        order = np.lexsort((values, -counts.astype(np.int64)))
+        if k is not None:
+            order = order[:k]
+        return values[order], counts[order]
+
+    # histogram with the counts of this one and of others added up
+    def merge(self, *others):
+        for other in others:
+            if other.n_bits != self.n_bits:
+                raise ValueError('Cannot merge histograms of %d and %d bits' % (self.n_bits, other.n_bits))
+        if self.dense and all(other.dense for other in others):
+            counts = self.__counts.copy()
+            for other in others:
+                counts += other.__counts
+            return Histogram(np.flatnonzero(counts).astype(np.uint64), counts[counts > 0], self.n_bits)
+        histograms = (self,) + others
+        return Histogram(np.concatenate([histogram.values() for histogram in histograms]),
+                         np.concatenate([histogram.counts() for histogram in histograms]), self.n_bits)
+
+    # histogram of the outcomes rebuilt from the given bits: order lists, from the leftmost character of the new
+    # outcomes, the bit of the old ones each takes; outcomes becoming equal have their counts added up. Every byte
+    # of the outcomes is mapped at once with a gather from the lookup table compiled for order (_remap_tables())
+    def remap(self, order):
+        order = tuple(int(bit) for bit in order)
+        for bit in order:
+            if not 0 <= bit < self.n_bits:
+                raise ValueError('No bit %d in a histogram of %d bits' % (bit, self.n_bits))
+        values = self.values()
+        remapped = np.zeros(len(values), dtype=np.uint64)
+        for byte, table in _remap_tables(order):
+            remapped |= table[((values >> np.uint64(8 * byte)) & np.uint64(0xFF)).astype(np.intp)]
+        return Histogram(remapped, self.counts(), len(order))
+
+    # histogram of the given bits only, in their order in the outcomes
+    def marginalize(self, bits):
+        return self.remap(sorted(set(bits), reverse=True))
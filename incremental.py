@@ -0,0 +1,173 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+# Incremental aggregation of the execution files
+#
+# Aggregator keeps a manifest of the count tables of the data trees (path, size, mtime and SHA-1 of every file)
+# together with the partial sums of every table: per-bit tallies for parity, the (value, count) pairs for
+# envariance. update() only reads the files whose size or mtime changed, and refolds them only if their hash
+# changed too, so adding an execution reads just its files; analyses are then computed from the cached partial
+# sums. The manifest is saved as json, and every output is rewritten atomically through open_atomic().
+
+import hashlib
+import json
+import logging
+import os
+from array import array
+from contextlib import contextmanager
+
+import numpy as np
+
+import myLogger
+from count_reader import parse_counts, scan_tree
+from count_store import FILE_PATTERNS, PARITY, STORE_DIR, Key
+from histogram import Histogram
+from parity_analysis import tally
+
+logger = logging.getLogger('incremental')
+logger.addHandler(myLogger.MyHandler())
+logger.setLevel(logging.CRITICAL)
+logger.propagate = False
+
+STATE_FILE = STORE_DIR + 'aggregate.json'
+
+
+# open a txt file for writing, replacing filename only once the file has been written completely
+@contextmanager
+def open_atomic(filename):
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    temporary = filename + '.tmp'
+    try:
+        with open(temporary, 'w') as write_f:
+            yield write_f
+        os.replace(temporary, filename)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+class Aggregator(object):
+
+    def __init__(self, state_file=STATE_FILE):
+        self.__state_file = state_file
+        # manifest entries by path, and path of every count table
+        self.__files = dict()
+        self.__tables = dict()
+        if os.path.isfile(state_file):
+            with open(state_file, 'r') as state_f:
+                self.__files = json.load(state_f)
+            for path, entry in self.__files.items():
+                self.__tables[self.key(entry)] = path
+        logger.debug('init() - %d files in the manifest', len(self.__files))
+
+    def __len__(self):
+        return len(self.__tables)
+
+    def __contains__(self, key):
+        return Key(*key) in self.__tables
+
+    @staticmethod
+    def key(entry):
+        return Key(*entry['key'])
+
+    # fold new or changed files of a data tree into the manifest, dropping the files that disappeared,
+    # return the keys of the count tables that changed; changed tables are also put in store, if given, unless
+    # they are new to the manifest and already in the store
+    def update(self, experiment, directory, store=None):
+        changed = set()
+        seen = set()
+        read = 0
+        for table in scan_tree(directory, FILE_PATTERNS[experiment]):
+            seen.add(table.path)
+            stat = os.stat(table.path)
+            entry = self.__files.get(table.path)
+            if entry is not None and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+                continue
+            with open(table.path, 'rb') as read_f:
+                data = read_f.read()
+            read += 1
+            digest = hashlib.sha1(data).hexdigest()
+            if entry is not None and entry['hash'] == digest:
+                entry.update(size=stat.st_size, mtime=stat.st_mtime_ns)
+                continue
+            found = table.match
+            oracle = found.group('oracle') if experiment == PARITY else None
+            key = Key(experiment, found.group('device'), oracle, int(found.group('n_qubits')),
+                      int(found.group('shots')), table.execution)
+            values, counts = parse_counts(data)
+            self.__files[table.path] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': digest,
+                                        'key': list(key), 'partial': self.partial(key, values, counts)}
+            self.__tables[key] = table.path
+            changed.add(key)
+            # a file seen for the first time may already be in the store (e.g. written by import_*())
+            if store is not None and (entry is not None or key not in store):
+                store.put(*key, counts=Histogram(values, counts, key.n_qubits))
+        for path in [path for path, entry in self.__files.items()
+                     if entry['key'][0] == experiment and path not in seen]:
+            key = self.key(self.__files.pop(path))
+            if self.__tables.get(key) == path:
+                del self.__tables[key]
+            changed.add(key)
+        logger.info('update() - %s: %d files read, %d count tables changed', experiment, read, len(changed))
+        return changed
+
+    # partial sums of a count table: zeroes and ones of every learned bit for parity, the table itself otherwise
+    @staticmethod
+    def partial(key, values, counts):
+        if key.experiment == PARITY:
+            zeroes, ones = tally(np.array(values, dtype=np.uint64), np.array(counts, dtype=np.int64),
+                                 np.zeros(len(values), dtype=np.int64), 1, key.n_qubits)
+            return {'zeroes': zeroes[0].tolist(), 'ones': ones[0].tolist()}
+        return {'values': values, 'counts': counts}
+
+    def save(self):
+        with open_atomic(self.__state_file) as state_f:
+            json.dump(self.__files, state_f)
+
+    # cached tallies of every (oracle, queries, execution) cell of a parity sweep, in the order of
+    # parity_analysis.load_sweep(), as two (cells x n_qubits-1) arrays
+    def tallies(self, device, oracles, n_qubits, queries, executions):
+        zeroes = []
+        ones = []
+        for oracle in oracles:
+            for n_queries in queries:
+                for execution in range(1, executions + 1, 1):
+                    path = self.__tables[Key(PARITY, device, oracle, n_qubits, n_queries, execution)]
+                    partial = self.__files[path]['partial']
+                    zeroes.append(partial['zeroes'])
+                    ones.append(partial['ones'])
+        return np.array(zeroes, dtype=np.int64), np.array(ones, dtype=np.int64)
+
+    # cached outcomes and counts of an envariance table, with the interface of CountStore.get()
+    def get(self, experiment, device, oracle, n_qubits, shots, execution):
+        partial = self.__files[self.__tables[Key(experiment, device, oracle, n_qubits, shots, execution)]]['partial']
+        return array('Q', partial['values']), array('I', partial['counts'])
+
+    # cached envariance table as a Histogram, with the interface of CountStore.get_histogram()
+    def get_histogram(self, experiment, device, oracle, n_qubits, shots, execution):
+        values, hits = self.get(experiment, device, oracle, n_qubits, shots, execution)
+        return Histogram(np.frombuffer(values, dtype=np.uint64), np.frombuffer(hits, dtype=np.uint32), n_qubits)
+
+    # cached envariance table as (bitstring, count) pairs, with the interface of CountStore.get_strings()
+    def get_strings(self, experiment, device, oracle, n_qubits, shots, execution):
+        values, hits = self.get(experiment, device, oracle, n_qubits, shots, execution)
+        form = '0%db' % n_qubits
+        return [(format(value, form), count) for value, count in zip(values, hits)]
@@ -0,0 +1,342 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+# Resumable experiment sweeps
+#
+# JobLedger records every job of a sweep in an SQLite database, with its state (planned, submitted, completed
+# or failed), the id of the remote job it was submitted with, its position among the circuits of that job and the
+# register size they were built with. SweepRunner plans the jobs, then first collects the remote jobs that were
+# submitted by a previous run (polling their id instead of submitting them again, and storing the counts of every
+# circuit by its position, even if the job is no longer part of the sweep), then submits the planned ones, all the
+# circuits of one execution with the same number of shots as a single job if batch is True. The ledger is committed
+# before waiting for a remote job and after storing its counts, so an interrupted sweep restarts exactly where it
+# stopped.
+
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict, namedtuple
+from time import sleep
+
+import myLogger
+import retry
+import stabilizer
+import utility
+from async_exec import ENVARIANCE, PARITY, Job
+from count_store import STORE_DIR
+from devices import local_sim
+
+logger = logging.getLogger('ledger')
+logger.addHandler(myLogger.MyHandler())
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+LEDGER_FILE = STORE_DIR + 'ledger.db'
+
+PLANNED = 'planned'
+
+SUBMITTED = 'submitted'
+
+COMPLETED = 'completed'
+
+FAILED = 'failed'
+
+# one row of the ledger: the job, its state, remote job id, position in it and register size of its circuits,
+# submissions so far and last error
+Entry = namedtuple('Entry', ['job', 'state', 'job_id', 'position', 'size', 'attempts', 'error'])
+
+# envariance jobs have no oracle, stored as an empty string so that they are unique
+_NO_ORACLE = ''
+
+_schema = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    experiment TEXT NOT NULL,
+    execution INTEGER NOT NULL,
+    device TEXT NOT NULL,
+    n_qubits INTEGER NOT NULL,
+    num_shots INTEGER NOT NULL,
+    oracle TEXT NOT NULL,
+    state TEXT NOT NULL,
+    job_id TEXT,
+    position INTEGER,
+    size INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated REAL NOT NULL,
+    UNIQUE (experiment, execution, device, n_qubits, num_shots, oracle)
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+CREATE INDEX IF NOT EXISTS jobs_job_id ON jobs (job_id);
+'''
+
+_columns = ('experiment, execution, device, n_qubits, num_shots, oracle, state, job_id, position, size, attempts, '
+            'error')
+
+_where_job = 'experiment = ? AND execution = ? AND device = ? AND n_qubits = ? AND num_shots = ? AND oracle = ?'
+
+
+def _row(job):
+    return (job.experiment, job.execution, job.device, job.n_qubits, job.num_shots,
+            _NO_ORACLE if job.oracle is None else job.oracle)
+
+
+def _entry(row):
+    experiment, execution, device, n_qubits, num_shots, oracle, state, job_id, position, size, attempts, error = row
+    job = Job(experiment, execution, device, n_qubits, num_shots, None if oracle == _NO_ORACLE else oracle)
+    return Entry(job, state, job_id, position, size, attempts, error)
+
+
+class JobLedger(object):
+
+    def __init__(self, filename=LEDGER_FILE):
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        self.__connection = sqlite3.connect(filename)
+        with self.__connection:
+            # ledgers written before the size column was added
+            columns = [row[1] for row in self.__connection.execute('PRAGMA table_info(jobs)')]
+            if columns and 'size' not in columns:
+                self.__connection.execute('ALTER TABLE jobs ADD COLUMN size INTEGER')
+            self.__connection.executescript(_schema)
+
+    def close(self):
+        self.__connection.close()
+
+    # add the jobs that are not in the ledger yet as planned, return how many were added
+    def plan(self, jobs):
+        now = time.time()
+        with self.__connection:
+            before = self.__connection.total_changes
+            self.__connection.executemany(
+                'INSERT OR IGNORE INTO jobs (experiment, execution, device, n_qubits, num_shots, oracle, state, '
+                'updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', [_row(job) + (PLANNED, now) for job in jobs])
+            added = self.__connection.total_changes - before
+        logger.debug('plan() - %d jobs added', added)
+        return added
+
+    # entries in the given states (all of them if states is None), in the order they were planned
+    def entries(self, states=None):
+        query = 'SELECT ' + _columns + ' FROM jobs'
+        parameters = ()
+        if states is not None:
+            query += ' WHERE state IN (%s)' % ', '.join('?' * len(states))
+            parameters = tuple(states)
+        return [_entry(row) for row in self.__connection.execute(query + ' ORDER BY id', parameters)]
+
+    def entry(self, job):
+        row = self.__connection.execute('SELECT ' + _columns + ' FROM jobs WHERE ' + _where_job, _row(job)).fetchone()
+        return None if row is None else _entry(row)
+
+    # entries of the remote job job_id, in the order of their circuits
+    def remote(self, job_id):
+        return [_entry(row) for row in self.__connection.execute(
+            'SELECT ' + _columns + ' FROM jobs WHERE job_id = ? ORDER BY position', (job_id,))]
+
+    # number of jobs in every state
+    def summary(self):
+        return dict(self.__connection.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state'))
+
+    # record that jobs were submitted as the circuits of the remote job job_id, in this order, built on size qubits
+    def submitted(self, jobs, job_id, size):
+        now = time.time()
+        with self.__connection:
+            self.__connection.executemany(
+                'UPDATE jobs SET state = ?, job_id = ?, position = ?, size = ?, attempts = attempts + 1, '
+                'error = NULL, updated = ? WHERE ' + _where_job,
+                [(SUBMITTED, job_id, position, size, now) + _row(job) for position, job in enumerate(jobs)])
+
+    def completed(self, jobs):
+        self.__set_state(jobs, COMPLETED)
+
+    def failed(self, jobs, error):
+        self.__set_state(jobs, FAILED, str(error))
+
+    def __set_state(self, jobs, state, error=None):
+        now = time.time()
+        with self.__connection:
+            self.__connection.executemany('UPDATE jobs SET state = ?, error = ?, updated = ? WHERE ' + _where_job,
+                                          [(state, error, now) + _row(job) for job in jobs])
+
+
+class SweepRunner(object):
+
+    def __init__(self, ledger, utilities, batch=True, max_attempts=3, poll_interval=30,
+                 envariance_directory='Data_Envariance/', parity_directory='Data_Parity/', store=None):
+        # utilities maps every device to the Utility object built on its coupling map
+        self.__ledger = ledger
+        self.__utilities = utilities
+        self.__batch = batch
+        # failed jobs are submitted again until they have been submitted max_attempts times (forever if None),
+        # across runs, since the ledger keeps the count
+        self.__max_attempts = max_attempts
+        self.__poll_interval = poll_interval
+        self.__directories = {ENVARIANCE: envariance_directory, PARITY: parity_directory}
+        self.__store = store
+        self.__program = None
+        # credit tickets of the remote jobs submitted by this run
+        self.__tickets = dict()
+
+    # authenticated QuantumProgram, created once (or taken from utility.sessions every time, if there is a pool)
+    def program(self):
+        if self.__program is None or utility.sessions is not None:
+            self.__program = utility.retrier.call(utility.connect, 0, description='Sweep')
+        return self.__program
+
+    # register size used by the circuits of a group of jobs submitted together
+    @staticmethod
+    def size(jobs):
+        if jobs[0].device == local_sim:
+            return None
+        return max(utility.device_size(job.device, job.n_qubits) for job in jobs)
+
+    def cached(self, job, size):
+        return self.__utilities[job.device].circuit(job.n_qubits, experiment=job.experiment, oracle=job.oracle,
+                                                    size=size)
+
+    # group jobs that can run as a single remote job, in the order of their first job
+    def groups(self, jobs):
+        groups = OrderedDict()
+        for job in jobs:
+            key = (job.experiment, job.execution, job.device, job.num_shots) if self.__batch else job
+            groups.setdefault(key, []).append(job)
+        return list(groups.values())
+
+    # write the counts of a job to the txt files and the count store
+    def save(self, job, counts, size):
+        connected = self.cached(job, size).connected
+        if job.experiment == ENVARIANCE:
+            utility.store_envariance(counts, job.execution, job.device, job.n_qubits, job.num_shots, connected,
+                                     self.__directories[ENVARIANCE], self.__store)
+        else:
+            utility.store_parity(counts, job.execution, job.device, job.n_qubits, job.oracle, job.num_shots,
+                                 connected, self.__directories[PARITY], self.__store)
+
+    # submit a group of jobs as a single remote job, return its id, or None if utility.result_cache had their counts
+    def submit(self, jobs):
+        size = self.size(jobs)
+        qasms = [self.cached(job, size).qasm for job in jobs]
+        device = jobs[0].device
+        Q_program = self.program()
+        counts = utility.cached_counts(Q_program, qasms, device, jobs[0].num_shots, jobs[0].execution)
+        if counts is not None:
+            for job, job_counts in zip(jobs, counts):
+                self.save(job, job_counts, size)
+            self.__ledger.completed(jobs)
+            return None
+        attempts = utility.retrier.attempts()
+        while True:
+            blocked = utility.retrier.blocked(device)
+            if blocked > 0:
+                sleep(blocked)
+            utility.wait_backend(Q_program, device)
+            ticket = utility.wait_credits(Q_program, str(jobs[0]), device, jobs[0].execution)
+            try:
+                job_id = utility.submit_job(Q_program, [], device, jobs[0].num_shots, 5, qasms)
+            except ConnectionError as e:
+                utility.job_failed(device, ticket)
+                utility.retrier.backoff(retry.CONNECTION, attempts, device, e, str(jobs[0]))
+                Q_program = self.program()
+                continue
+            except utility.JobError as e:
+                utility.job_failed(device, ticket)
+                utility.retrier.backoff(retry.UNAVAILABLE, attempts, device, e, str(jobs[0]))
+                continue
+            utility.retrier.success(device)
+            self.__ledger.submitted(jobs, job_id, size)
+            self.__tickets[job_id] = ticket
+            logger.info('Submitted %d circuits as job %s', len(jobs), job_id)
+            return job_id
+
+    # poll the remote job job_id until the counts of all its circuits, as recorded in the ledger, are stored
+    def collect(self, job_id):
+        entries = self.__ledger.remote(job_id)
+        jobs = [entry.job for entry in entries]
+        Q_program = self.program()
+        attempts = utility.retrier.attempts()
+        while True:
+            try:
+                counts = utility.fetch_job(Q_program, job_id)
+            except ConnectionError as e:
+                utility.retrier.backoff(retry.FETCH, attempts, jobs[0].device, e, 'Job %s' % job_id)
+                continue
+            except utility.JobError as e:
+                utility.job_failed(jobs[0].device, self.__tickets.pop(job_id, None))
+                logger.critical('Job %s failed - %s', job_id, str(e))
+                self.__ledger.failed(jobs, e)
+                return
+            if counts is not None:
+                break
+            sleep(self.__poll_interval)
+        utility.release_credits(self.__tickets.pop(job_id, None))
+        # every circuit of a remote job was built with the register size of the whole group it was submitted with
+        qasms = [None] * len(counts)
+        for entry in entries:
+            qasms[entry.position] = self.cached(entry.job, entry.size).qasm
+        if None not in qasms:
+            utility.cache_counts(Q_program, qasms, jobs[0].device, jobs[0].num_shots, jobs[0].execution, counts,
+                                 job_id)
+        for entry in entries:
+            self.save(entry.job, counts[entry.position], entry.size)
+        self.__ledger.completed(jobs)
+        for job in jobs:
+            logger.info('Done: %s', str(job))
+
+    # run a group of local_sim jobs, which need no remote job
+    def simulate(self, jobs):
+        for job in jobs:
+            self.save(job, stabilizer.run_qasm(self.cached(job, None).qasm, job.num_shots), None)
+        self.__ledger.completed(jobs)
+
+    # collect the remote jobs a previous run left submitted with some job of the sweep among their circuits
+    def resume(self, jobs):
+        remote = OrderedDict()
+        for entry in self.__ledger.entries([SUBMITTED]):
+            if entry.job in jobs:
+                remote[entry.job_id] = None
+        for job_id in remote:
+            logger.info('Resuming job %s', job_id)
+            self.collect(job_id)
+
+    # jobs of the sweep still to be submitted
+    def pending(self, jobs):
+        return [entry.job for entry in self.__ledger.entries([PLANNED, FAILED]) if entry.job in jobs and (
+            entry.state == PLANNED or self.__max_attempts is None or entry.attempts < self.__max_attempts)]
+
+    # run every job of the sweep that has not been completed yet, return the number of jobs in every state
+    def run(self, jobs):
+        jobs = list(jobs)
+        self.__ledger.plan(jobs)
+        jobs = set(jobs)
+        self.resume(jobs)
+        pending = self.pending(jobs)
+        while pending:
+            for group in self.groups(pending):
+                if group[0].device == local_sim:
+                    self.simulate(group)
+                    continue
+                job_id = self.submit(group)
+                if job_id is not None:
+                    self.collect(job_id)
+            pending = self.pending(jobs)
+        summary = self.__ledger.summary()
+        logger.info('Sweep done: %s', str(summary))
+        return summary
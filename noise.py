@@ -0,0 +1,208 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+# Vectorized noisy sampler for the circuits built by Utility
+#
+# Ideal outcomes come from the stabilizer simulator; noise is a two-qubit depolarizing channel after every CNOT
+# and a bit flip on every readout. Circuits are Clifford and measured at the end, so every Pauli error can be
+# propagated to the measures once (Pauli frame): its X component on the measured qubits is a fixed flip pattern.
+# Sampling then only draws, for every CNOT, which shots get which of the 15 Pauli errors, and XORs the patterns
+# into an (executions x shots x measures) bit matrix. Counts of every execution are written through
+# utility.store_envariance() and utility.store_parity(), in the same tables of the real experiments.
+
+import logging
+import time
+
+import numpy as np
+
+import myLogger
+import coupling_maps
+import stabilizer
+import utility
+from circuits import from_qasm
+from count_store import CountStore
+from devices import *
+
+logger = logging.getLogger('noise')
+logger.addHandler(myLogger.MyHandler())
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+# device is the name the noisy counts are stored under
+# readout is the readout-flip probability, cx the depolarizing probability of every CNOT
+# (a dict keyed by qubit, or by (control, target) pair, gives a rate for each of them)
+# the other parameters mirror the parity sweep of parity.py
+
+device = noisy_sim
+
+readout = 0.03
+
+cx = 0.02
+
+executions = 200
+
+queries = [
+    5,
+    10,
+    15,
+    20,
+    25,
+    30,
+    35,
+    40,
+    45,
+    50,
+    75,
+    100,
+    200,
+    500,
+]
+
+oracles = [
+    '00',
+    '10',
+    '11',
+]
+
+qubits = [
+    3,
+    9,
+    16,
+]
+
+seed = 2017
+
+
+class NoiseModel(object):
+
+    def __init__(self, readout=0.0, cx=0.0):
+        self.readout = readout
+        self.cx = cx
+
+    # readout-flip probability of a qubit
+    def readout_rate(self, qubit):
+        if isinstance(self.readout, dict):
+            return self.readout.get(qubit, 0.0)
+        return self.readout
+
+    # depolarizing probability of a CNOT
+    def cx_rate(self, control, target):
+        if isinstance(self.cx, dict):
+            return self.cx.get((control, target), 0.0)
+        return self.cx
+
+
+# flip pattern on the measured bits of every two-qubit Pauli error after every CNOT of a circuit,
+# as a (CNOTs x 16 x measures) array; Pauli p on the control and q on the target is index 4 * p + q,
+# with 0 = I, 1 = X, 2 = Y, 3 = Z
+def flip_patterns(circuit):
+    cnots = [args for gate, args in circuit.ops if gate == 'cx']
+    measures = [args[0] for gate, args in circuit.ops if gate == 'measure']
+    codes = np.arange(16)
+    x_part = np.stack([np.isin(codes // 4, (1, 2)), np.isin(codes % 4, (1, 2))], axis=1)
+    z_part = np.stack([np.isin(codes // 4, (2, 3)), np.isin(codes % 4, (2, 3))], axis=1)
+    # one Pauli frame for every (CNOT, error) pair, all propagated together
+    x = np.zeros((len(cnots), 16, circuit.size), dtype=bool)
+    z = np.zeros((len(cnots), 16, circuit.size), dtype=bool)
+    patterns = np.zeros((len(cnots), 16, len(measures)), dtype=bool)
+    k = 0
+    m = 0
+    for gate, args in circuit.ops:
+        if gate == 'h':
+            x[:, :, args[0]], z[:, :, args[0]] = z[:, :, args[0]].copy(), x[:, :, args[0]].copy()
+        elif gate in ('s', 'sdg'):
+            z[:, :, args[0]] ^= x[:, :, args[0]]
+        elif gate == 'cx':
+            control, target = args
+            x[:, :, target] ^= x[:, :, control]
+            z[:, :, control] ^= z[:, :, target]
+            x[k, :, control] = x_part[:, 0]
+            x[k, :, target] = x_part[:, 1]
+            z[k, :, control] = z_part[:, 0]
+            z[k, :, target] = z_part[:, 1]
+            k += 1
+        elif gate == 'measure':
+            patterns[:, :, m] = x[:, :, args[0]]
+            m += 1
+    return cnots, measures, patterns
+
+
+# sample an (executions x shots x measures) bit matrix of noisy outcomes, columns in the order of the measures
+def sample(circuit, noise, executions, shots, rng):
+    outcome = stabilizer.simulate(circuit)
+    bits = stabilizer.sample_bits(outcome, executions * shots, rng).reshape(executions, shots, -1)
+    cnots, measures, patterns = flip_patterns(circuit)
+    for k, (control, target) in enumerate(cnots):
+        rate = noise.cx_rate(control, target)
+        if rate <= 0:
+            continue
+        errors = np.where(rng.random((executions, shots)) < rate,
+                          rng.integers(1, 16, size=(executions, shots)), 0)
+        bits ^= patterns[k][errors]
+    rates = np.array([noise.readout_rate(qubit) for qubit in measures])
+    bits ^= rng.random(bits.shape) < rates
+    return outcome, bits
+
+
+# noisy counts of every execution of the given cached circuit, keys follow the QISKit convention
+def noisy_counts(cached, noise, executions, shots, rng):
+    circuit = from_qasm(cached.qasm)
+    outcome, bits = sample(circuit, noise, executions, shots, rng)
+    return [stabilizer.counts(outcome, execution_bits) for execution_bits in bits]
+
+
+# write noisy envariance counts of executions 1..executions, as envariance_exec() would
+def envariance_sweep(utility_obj, n_qubits, noise, executions, num_shots, device=noisy_sim,
+                     directory='Data_Envariance/', store=None, rng=None):
+    if rng is None:
+        rng = np.random.default_rng()
+    cached = utility_obj.circuit(n_qubits, experiment='envariance')
+    for execution, counts in enumerate(noisy_counts(cached, noise, executions, num_shots, rng), 1):
+        utility.store_envariance(counts, execution, device, n_qubits, num_shots, cached.connected, directory, store)
+
+
+# write noisy parity counts of executions 1..executions, as parity_exec() would
+def parity_sweep(utility_obj, n_qubits, oracle, noise, executions, num_shots, device=noisy_sim,
+                 directory='Data_Parity/', store=None, rng=None):
+    if rng is None:
+        rng = np.random.default_rng()
+    cached = utility_obj.circuit(n_qubits, experiment='parity', oracle=oracle)
+    for execution, counts in enumerate(noisy_counts(cached, noise, executions, num_shots, rng), 1):
+        utility.store_parity(counts, execution, device, n_qubits, oracle, num_shots, cached.connected, directory,
+                             store)
+
+
+if __name__ == '__main__':
+    logger.info('Started')
+    start = time.perf_counter()
+    model = NoiseModel(readout=readout, cx=cx)
+    generator = np.random.default_rng(seed)
+    store = CountStore()
+    utility_qx5 = utility.Utility(coupling_maps.qx5)
+    for oracle in oracles:
+        for n_qubits in qubits:
+            for n_queries in queries:
+                parity_sweep(utility_qx5, n_qubits, oracle, model, executions, n_queries, store=store,
+                             rng=generator)
+            logger.info('Oracle %s - Qubits %d done', oracle, n_qubits)
+    utility_qx5.close()
+    store.close()
+    logger.info('All done in %.1f s', time.perf_counter() - start)
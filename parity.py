@@ -25,6 +25,16 @@ import myLogger
 from utility import *
 from devices import *
 import coupling_maps
+from count_store import CountStore
+from async_exec import AsyncExecutor, Job, PARITY
+from ledger import JobLedger, SweepRunner
+from result_cache import ResultCache
+from credits import CreditManager
+from backend_monitor import MonitorPool
+from session import SessionPool
+from dispatcher import Dispatcher, Task
+from shots import DISJOINT, PREFIX
+import utility
 
 logger = logging.getLogger('parity')
 logger.addHandler(myLogger.MyHandler())
@@ -36,8 +46,29 @@ logger.propagate = False
 # executions is the number of different experiment you want to run
 # n_shots is the maximum number of n_shots
 # oracles are the strings you want to learn: '10' for '10...10', '11' for '11...11', '00' for '00...00'
+# qubits are the numbers of qubits to use
+# batch, if True, submits all the circuits of one execution with the same number of queries as a single job
+# memory, if True, submits all the circuits of one execution as a single job with enough shots for every number
+# of queries, and cuts the count table of every number of queries out of its shots: slicing is DISJOINT
+# for independent slices (sum(queries) shots), PREFIX for the first n shots (max(queries) shots)
+# backends are the devices every job can run on: with more than one, each job is routed to the one expected to finish
+# it first, given its queue and qubits (see dispatcher.py), running up to in_flight jobs at a time (4 if 0)
+# in_flight, if greater than 0, runs the sweep through the asyncio executor with up to in_flight jobs on the device
+# resumable, if True, records every job in the job ledger (Data_Store/ledger.db), so that running again after a crash
+# resumes the sweep where it stopped, collecting the jobs already submitted instead of submitting them again
+# cache_results, if True, keeps the counts of every job in the result cache (Data_Store/results.db), so that running
+# the same execution again is answered from it instead of spending credits
+# manage_credits, if True, admits jobs against a local model of the credit balance (see credits.py),
+# syncing it with the API only now and then instead of asking the credits before every job
+# monitor_backends, if True, shares the status of the device among all jobs through a background monitor
+# (see backend_monitor.py), resuming within seconds when it comes back online
+# reuse_sessions, if True, authenticates once and reuses the same QuantumProgram for every job (see session.py)
+# layout is the GHZ layout: PATH for the breadth-first path from the most connected qubit, TREE for the
+# depth-minimizing tree
 device = qx5
 
+backends = [device]
+
 executions = 200
 
 queries = [
@@ -63,24 +94,106 @@ oracles = [
     '11',
 ]
 
+qubits = [
+    3,
+    9,
+    16,
+]
+
+batch = False
+
+memory = False
+
+slicing = DISJOINT
+
+in_flight = 0
+
+resumable = False
+
+cache_results = False
+
+manage_credits = False
+
+monitor_backends = False
+
+reuse_sessions = False
+
+layout = PATH
+
 # launch_exp takes the argument device from devices module
 logger.info('Started')
 
-utility_qx5 = Utility(coupling_maps.qx5)
+store = CountStore()
+
+if cache_results:
+    utility.result_cache = ResultCache()
+
+if manage_credits:
+    utility.credit_manager = CreditManager()
+
+if monitor_backends:
+    utility.monitors = MonitorPool(utility.authenticate)
+
+if reuse_sessions:
+    utility.sessions = SessionPool(QuantumProgram, Qconfig.APItoken, Qconfig.config["url"])
+
+utility_qx5 = Utility(coupling_maps.qx5, layout=layout)
+
+if resumable:
+    jobs = [Job(PARITY, execution, device, n_qubits, n_queries, oracle) for execution in range(1, executions + 1, 1)
+            for oracle in oracles for n_queries in queries for n_qubits in qubits]
+    job_ledger = JobLedger()
+    SweepRunner(job_ledger, {device: utility_qx5}, batch=batch, store=store).run(jobs)
+    job_ledger.close()
+elif len(backends) > 1:
+    tasks = [Task(PARITY, execution, backends, n_qubits, n_queries, oracle) for execution in range(1, executions + 1, 1)
+             for oracle in oracles for n_queries in queries for n_qubits in qubits]
+    utilities = {backend: Utility(coupling_maps.by_device[backend], layout=layout) for backend in backends}
+    Dispatcher(utilities, threads=in_flight if in_flight > 0 else 4, store=store).run(tasks)
+    for backend_utility in utilities.values():
+        backend_utility.close()
+elif in_flight > 0:
+    jobs = [Job(PARITY, execution, device, n_qubits, n_queries, oracle) for execution in range(1, executions + 1, 1)
+            for oracle in oracles for n_queries in queries for n_qubits in qubits]
+    AsyncExecutor({device: utility_qx5}, max_in_flight=in_flight, store=store).run(jobs)
+else:
+    for execution in range(1, executions + 1, 1):
+
+        if memory:
+            # one job for every execution, running all qubits, oracles and numbers of queries
+            logger.info('Qubits %s - Oracles %s - Execution %d - Queries %s', str(qubits), str(oracles), execution,
+                        str(queries))
+            parity_memory_exec(execution, device, utility_qx5, qubits, oracles, queries, slicing=slicing, store=store)
+            continue
+
+        if batch:
+            # one job for every number of queries, running all qubits and oracles
+            for n_queries in queries:
+                logger.info('Qubits %s - Oracles %s - Execution %d - Queries %d', str(qubits), str(oracles), execution,
+                            n_queries)
+                parity_batch_exec(execution, device, utility_qx5, qubits=qubits, oracles=oracles, num_shots=n_queries,
+                                  store=store)
+            continue
+
+        for oracle in oracles:
+
+            # Comment the experiments you don't want to run
+            for n_queries in queries:
+                logger.info('Qubits %d - Oracle %s - Execution %d - Queries %d', 3, oracle, execution, n_queries)
+                parity_exec(execution, device, utility_qx5, n_qubits=3, oracle=oracle, num_shots=n_queries, store=store)
+                logger.info('Qubits %d - Oracle %s - Execution %d - Queries %d', 9, oracle, execution, n_queries)
+                parity_exec(execution, device, utility_qx5, n_qubits=9, oracle=oracle, num_shots=n_queries, store=store)
+                logger.info('Qubits %d - Oracle %s - Execution %d - Queries %d', 16, oracle, execution, n_queries)
+                parity_exec(execution, device, utility_qx5, n_qubits=16, oracle=oracle, num_shots=n_queries, store=store)
 
-for execution in range(1, executions + 1, 1):
+utility_qx5.close()
 
-    for oracle in oracles:
+store.close()
 
-        # Comment the experiments you don't want to run
-        for n_queries in queries:
-            logger.info('Qubits %d - Oracle %s - Execution %d - Queries %d', 3, oracle, execution, n_queries)
-            parity_exec(execution, device, utility_qx5, n_qubits=3, oracle=oracle, num_shots=n_queries)
-            logger.info('Qubits %d - Oracle %s - Execution %d - Queries %d', 9, oracle, execution, n_queries)
-            parity_exec(execution, device, utility_qx5, n_qubits=9, oracle=oracle, num_shots=n_queries)
-            logger.info('Qubits %d - Oracle %s - Execution %d - Queries %d', 16, oracle, execution, n_queries)
-            parity_exec(execution, device, utility_qx5, n_qubits=16, oracle=oracle, num_shots=n_queries)
+if cache_results:
+    utility.result_cache.close()
 
-utility_qx5.close()
+if monitor_backends:
+    utility.monitors.stop()
 
 logger.info('All done.')
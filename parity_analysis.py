@@ -0,0 +1,110 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+# Vectorized majority vote for parity learning
+#
+# All the count tables of a sweep are loaded into three flat arrays (outcomes, counts and cell of
+# every entry, a cell being one (oracle, queries, execution) triple), so that per-bit tallies,
+# majority decisions and success rates of the whole sweep are computed with a few NumPy operations.
+
+import logging
+
+import numpy as np
+
+import myLogger
+from count_store import PARITY
+
+logger = logging.getLogger('parity_analysis')
+logger.addHandler(myLogger.MyHandler())
+logger.setLevel(logging.CRITICAL)
+logger.propagate = False
+
+
+# the string the oracle hides, as an array of n_bits bits: '00' for 00..00, '11' for 11..11, '10' for 1010..
+def oracle_target(oracle, n_bits):
+    if oracle == '00':
+        return np.zeros(n_bits, dtype=np.uint8)
+    elif oracle == '11':
+        return np.ones(n_bits, dtype=np.uint8)
+    elif oracle == '10':
+        return (np.arange(n_bits) % 2 == 0).astype(np.uint8)
+    else:
+        raise ValueError('Unknown oracle %s' % oracle)
+
+
+# load the count tables of every (oracle, queries, execution) cell of a sweep from the count store,
+# cells are numbered in C order over (oracles, queries, executions)
+def load_sweep(store, device, oracles, n_qubits, queries, executions):
+    values = []
+    counts = []
+    cells = []
+    cell = 0
+    for oracle in oracles:
+        for n_queries in queries:
+            for execution in range(1, executions + 1, 1):
+                histogram = store.get_histogram(PARITY, device, oracle, n_qubits, n_queries, execution)
+                values.append(histogram.values())
+                counts.append(histogram.counts())
+                cells.append(np.full(len(histogram), cell, dtype=np.int64))
+                cell += 1
+    return np.concatenate(values), np.concatenate(counts).astype(np.int64), np.concatenate(cells)
+
+
+# count zeroes and ones of every learned bit in every cell, using only the outcomes whose result qubit
+# (the first one) is 1; returns two (n_cells x n_qubits-1) arrays
+def tally(values, counts, cells, n_cells, n_qubits):
+    n_bits = n_qubits - 1
+    valid = ((values >> np.uint64(n_bits)) & np.uint64(1)) == 1
+    values = values[valid]
+    counts = counts[valid]
+    cells = cells[valid]
+    # bit n of the learned string is character n+1 of the outcome
+    shifts = np.arange(n_bits - 1, -1, -1, dtype=np.uint64)
+    bits = ((values[:, None] >> shifts) & np.uint64(1)).astype(np.int64)
+    slots = (cells[:, None] * n_bits + np.arange(n_bits)).ravel()
+    ones = np.bincount(slots, weights=(bits * counts[:, None]).ravel(), minlength=n_cells * n_bits)
+    total = np.bincount(cells, weights=counts, minlength=n_cells)
+    ones = ones.reshape(n_cells, n_bits).astype(np.int64)
+    zeroes = total.astype(np.int64)[:, None] - ones
+    return zeroes, ones
+
+
+# majority decision of every bit, ties are broken at random with the given generator
+def majority(zeroes, ones, rng):
+    ties = rng.integers(0, 2, size=zeroes.shape, dtype=np.uint8)
+    return np.where(ones > zeroes, 1, np.where(zeroes > ones, 0, ties)).astype(np.uint8)
+
+
+# success rate of every (oracle, queries) pair of a sweep, averaged over executions
+def success_rates(values, counts, cells, oracles, n_qubits, queries, executions, seed=None):
+    n_cells = len(oracles) * len(queries) * executions
+    zeroes, ones = tally(values, counts, cells, n_cells, n_qubits)
+    return tally_rates(zeroes, ones, oracles, n_qubits, queries, executions, seed=seed)
+
+
+# success rate of every (oracle, queries) pair from the tallies of every cell of a sweep
+def tally_rates(zeroes, ones, oracles, n_qubits, queries, executions, seed=None):
+    decisions = majority(zeroes, ones, np.random.default_rng(seed))
+    decisions = decisions.reshape(len(oracles), len(queries), executions, n_qubits - 1)
+    targets = np.stack([oracle_target(oracle, n_qubits - 1) for oracle in oracles])
+    correct = np.all(decisions == targets[:, None, None, :], axis=3)
+    logger.debug('success_rates() - correct:\n%s', str(correct.sum(axis=2)))
+    return correct.mean(axis=2)
@@ -0,0 +1,176 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+# Content-addressed cache of job results
+#
+# Results are keyed by the SHA-256 of (QASM, backend, shots, calibration epoch) and by the execution they were
+# run for, and kept in an SQLite file together with the job metadata. The policy decides which repeat requests
+# are answered from the cache: SAME_EXECUTION only returns the counts of the same execution (a rerun of a sweep,
+# or a retry after the job already ran), ANY_EXECUTION returns any counts of the same circuit, NEVER only records.
+# The least recently used results are evicted beyond max_entries results or max_bytes of counts and metadata.
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import myLogger
+from count_store import STORE_DIR
+
+logger = logging.getLogger('result_cache')
+logger.addHandler(myLogger.MyHandler())
+logger.setLevel(logging.CRITICAL)
+logger.propagate = False
+
+CACHE_FILE = STORE_DIR + 'results.db'
+
+NEVER = 'never'
+
+SAME_EXECUTION = 'same_execution'
+
+ANY_EXECUTION = 'any_execution'
+
+_schema = '''
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT NOT NULL,
+    execution INTEGER NOT NULL,
+    backend TEXT NOT NULL,
+    shots INTEGER NOT NULL,
+    epoch TEXT NOT NULL,
+    counts TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    used REAL NOT NULL,
+    PRIMARY KEY (key, execution)
+);
+CREATE INDEX IF NOT EXISTS results_used ON results (used);
+'''
+
+
+# content address of a circuit run on a backend
+def result_key(qasm, backend, shots, epoch):
+    digest = hashlib.sha256()
+    for part in (qasm, backend, str(shots), epoch):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class ResultCache(object):
+
+    def __init__(self, filename=CACHE_FILE, policy=SAME_EXECUTION, max_entries=100000, max_bytes=256 * 2 ** 20,
+                 epoch_ttl=3600):
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        self.policy = policy
+        self.__max_entries = max_entries
+        self.__max_bytes = max_bytes
+        self.__epoch_ttl = epoch_ttl
+        self.__epochs = dict()
+        # shared by the threads of the executors, every use holds the lock
+        self.__connection = sqlite3.connect(filename, check_same_thread=False)
+        self.__lock = threading.Lock()
+        with self.__connection:
+            self.__connection.executescript(_schema)
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        with self.__lock:
+            self.__connection.close()
+
+    def __len__(self):
+        with self.__lock:
+            return self.__connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    # calibration epoch of a backend: the date of its last calibration, or today's date (UTC) if the API does not
+    # tell it; simulators have no calibration. Epochs are asked again after epoch_ttl seconds
+    def epoch(self, Q_program, backend):
+        if 'simulator' in backend:
+            return ''
+        now = time.time()
+        if backend in self.__epochs and now - self.__epochs[backend][1] < self.__epoch_ttl:
+            return self.__epochs[backend][0]
+        try:
+            epoch = str(Q_program.get_backend_calibration(backend)['lastUpdateDate'])
+        except (AttributeError, KeyError, TypeError, ValueError, ConnectionError):
+            epoch = time.strftime('%Y-%m-%d', time.gmtime(now))
+        self.__epochs[backend] = (epoch, now)
+        return epoch
+
+    # cached counts of a circuit, None if the policy does not allow it or nothing is cached;
+    # with_metadata returns them together with the metadata of the job that produced them
+    def get(self, key, execution, with_metadata=False):
+        if self.policy == NEVER:
+            return None
+        with self.__lock:
+            if self.policy == SAME_EXECUTION:
+                row = self.__connection.execute('SELECT execution, counts, metadata FROM results '
+                                                'WHERE key = ? AND execution = ?', (key, execution)).fetchone()
+            else:
+                row = self.__connection.execute('SELECT execution, counts, metadata FROM results WHERE key = ? '
+                                                'ORDER BY used DESC LIMIT 1', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            with self.__connection:
+                self.__connection.execute('UPDATE results SET used = ? WHERE key = ? AND execution = ?',
+                                          (time.time(), key, row[0]))
+        logger.debug('get() - hit %s (execution %d)', key, row[0])
+        if with_metadata:
+            return json.loads(row[1]), json.loads(row[2])
+        return json.loads(row[1])
+
+    # metadata of the job that produced cached counts, None if they are not cached
+    def metadata(self, key, execution):
+        with self.__lock:
+            row = self.__connection.execute('SELECT metadata FROM results WHERE key = ? AND execution = ?',
+                                            (key, execution)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    # metadata may hold the per-shot memory of the job as well, so its size counts towards max_bytes
+    def put(self, key, execution, backend, shots, epoch, counts, metadata=None):
+        data = json.dumps(counts, sort_keys=True)
+        metadata = json.dumps(metadata or dict())
+        with self.__lock, self.__connection:
+            self.__connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                      (key, execution, backend, shots, epoch, data, metadata,
+                                       len(data) + len(metadata), time.time()))
+            self.__evict()
+
+    # drop the least recently used results beyond max_entries and max_bytes
+    def __evict(self):
+        entries, size = self.__connection.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results').fetchone()
+        if entries <= self.__max_entries and size <= self.__max_bytes:
+            return
+        evicted = []
+        for key, execution, entry_size in self.__connection.execute(
+                'SELECT key, execution, size FROM results ORDER BY used'):
+            if entries <= self.__max_entries and size <= self.__max_bytes:
+                break
+            evicted.append((key, execution))
+            entries -= 1
+            size -= entry_size
+        self.__connection.executemany('DELETE FROM results WHERE key = ? AND execution = ?', evicted)
+        logger.debug('evict() - %d results evicted', len(evicted))
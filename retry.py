@@ -0,0 +1,175 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+# Retry policies and circuit breakers for the API calls of the executors
+#
+# Every kind of failure has its own RetryPolicy: the n-th consecutive failure waits base * factor^(n-1) seconds,
+# up to max_delay, shortened by a random jitter so that jobs failing together do not retry together, and after
+# max_attempts failures RetryError is raised. Every backend also has a CircuitBreaker: after threshold consecutive
+# failures on it, calls wait cooldown seconds before trying again, and a success closes it. Retrier.delay() returns
+# how long to wait before the next attempt (for executors that sleep on their own, e.g. with asyncio),
+# Retrier.backoff() sleeps it, Retrier.call() retries a single call. A Retrier can be shared by many threads.
+
+import logging
+import random
+import threading
+import time
+from collections import Counter
+
+import myLogger
+
+logger = logging.getLogger('retry')
+logger.addHandler(myLogger.MyHandler())
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+# the API could not be reached
+CONNECTION = 'connection'
+
+# the backend refused a job (offline, not enough credits, ...)
+UNAVAILABLE = 'unavailable'
+
+# the results of a submitted job could not be fetched
+FETCH = 'fetch'
+
+# a submitted job failed and has to be submitted again
+JOB = 'job'
+
+
+class RetryError(Exception):
+    pass
+
+
+class RetryPolicy(object):
+
+    def __init__(self, max_attempts=8, base=1., factor=2., max_delay=900., jitter=0.5):
+        self.max_attempts = max_attempts
+        self.base = base
+        self.factor = factor
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    # seconds to wait after the given number of consecutive failures
+    def delay(self, attempt, rng):
+        delay = min(self.max_delay, self.base * self.factor ** (attempt - 1))
+        return delay * (1 - self.jitter * rng.random())
+
+
+DEFAULT_POLICIES = {
+    CONNECTION: RetryPolicy(max_attempts=12, base=1., max_delay=900.),
+    UNAVAILABLE: RetryPolicy(max_attempts=10, base=5., max_delay=1800.),
+    FETCH: RetryPolicy(max_attempts=20, base=2., max_delay=300.),
+    JOB: RetryPolicy(max_attempts=3, base=10., max_delay=900.),
+}
+
+
+class CircuitBreaker(object):
+
+    def __init__(self, threshold=5, cooldown=300., clock=time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.__clock = clock
+        self.failures = 0
+        self.__opened = None
+
+    # seconds before a call can be tried, 0 if the breaker is closed or its cooldown is over
+    def remaining(self):
+        if self.__opened is None:
+            return 0.
+        return max(0., self.__opened + self.cooldown - self.__clock())
+
+    def success(self):
+        self.failures = 0
+        self.__opened = None
+
+    def failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.__opened = self.__clock()
+
+
+class Retrier(object):
+
+    def __init__(self, policies=None, threshold=5, cooldown=300., seed=None, sleep=time.sleep, clock=time.monotonic):
+        self.policies = dict(DEFAULT_POLICIES)
+        if policies is not None:
+            self.policies.update(policies)
+        self.__threshold = threshold
+        self.__cooldown = cooldown
+        self.__rng = random.Random(seed)
+        self.__sleep = sleep
+        self.__clock = clock
+        self.__breakers = dict()
+        # guards the breakers and the random generator
+        self.__lock = threading.RLock()
+
+    # circuit breaker of a backend, None for calls that are not bound to one
+    def breaker(self, device):
+        with self.__lock:
+            if device not in self.__breakers:
+                self.__breakers[device] = CircuitBreaker(self.__threshold, self.__cooldown, self.__clock)
+            return self.__breakers[device]
+
+    # failure counters of one job, to be passed to delay() and backoff()
+    @staticmethod
+    def attempts():
+        return Counter()
+
+    # record a failure of the given kind, return the seconds to wait before the next attempt;
+    # raise RetryError if the policy allows no more attempts
+    def delay(self, kind, attempts, device, error, description=''):
+        attempts[kind] += 1
+        policy = self.policies[kind]
+        with self.__lock:
+            breaker = self.breaker(device)
+            breaker.failure()
+            if policy.max_attempts is not None and attempts[kind] >= policy.max_attempts:
+                raise RetryError('%s - %s failed %d times: %s' % (description, kind, attempts[kind], str(error)))
+            delay = max(policy.delay(attempts[kind], self.__rng), breaker.remaining())
+        logger.critical('%s - %s error on %s (%s), retrying in %.1f s', description, kind, str(device), str(error),
+                        delay)
+        return delay
+
+    def backoff(self, kind, attempts, device, error, description=''):
+        self.__sleep(self.delay(kind, attempts, device, error, description))
+
+    def success(self, device):
+        with self.__lock:
+            self.breaker(device).success()
+
+    # seconds to wait before calling a backend whose circuit breaker is open
+    def blocked(self, device):
+        with self.__lock:
+            return self.breaker(device).remaining()
+
+    # call function until it succeeds; errors maps every exception class to retry on to its kind of failure
+    def call(self, function, *args, device=None, errors=None, description=''):
+        errors = {ConnectionError: CONNECTION} if errors is None else errors
+        attempts = self.attempts()
+        while True:
+            try:
+                result = function(*args)
+            except tuple(errors) as e:
+                kind = next(kind for error_class, kind in errors.items() if isinstance(e, error_class))
+                self.backoff(kind, attempts, device, e, description)
+                continue
+            self.success(device)
+            return result
@@ -0,0 +1,77 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+# Pool of authenticated API sessions
+#
+# SessionPool authenticates a QuantumProgram once and hands the same object (with its API client and HTTP
+# connections) to every job, instead of creating and authenticating a new one for each of them. Programs are kept
+# for every register size, since registers with the same name and a different size cannot live in one program,
+# and for every thread, since QuantumProgram is not thread safe. A program is authenticated again, in place,
+# when its token is older than token_ttl seconds or after invalidate() (e.g. when a job failed).
+
+import logging
+import threading
+import time
+
+import myLogger
+
+logger = logging.getLogger('session')
+logger.addHandler(myLogger.MyHandler())
+logger.setLevel(logging.CRITICAL)
+logger.propagate = False
+
+
+class SessionPool(object):
+
+    def __init__(self, program_factory, token, url, token_ttl=12 * 3600., clock=time.monotonic):
+        self.__program_factory = program_factory
+        self.__token = token
+        self.__url = url
+        self.__token_ttl = token_ttl
+        self.__clock = clock
+        # (program, time of the last authentication) by (size, thread)
+        self.__programs = dict()
+        self.__lock = threading.Lock()
+        self.logins = 0
+
+    # authenticated QuantumProgram for registers of the given size, raises ConnectionError if the API cannot be reached
+    def get(self, size):
+        key = (size, threading.get_ident())
+        with self.__lock:
+            entry = self.__programs.get(key)
+        if entry is not None and entry[1] is not None and self.__clock() - entry[1] < self.__token_ttl:
+            return entry[0]
+        Q_program = self.__program_factory() if entry is None else entry[0]
+        Q_program.set_api(self.__token, self.__url)
+        with self.__lock:
+            self.__programs[key] = (Q_program, self.__clock())
+            self.logins += 1
+        logger.debug('get() - authenticated program for size %d', size)
+        return Q_program
+
+    # authenticate every program again before its next use
+    def invalidate(self):
+        with self.__lock:
+            self.__programs = {key: (Q_program, None) for key, (Q_program, authenticated) in self.__programs.items()}
+
+    def clear(self):
+        with self.__lock:
+            self.__programs = dict()
@@ -0,0 +1,86 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+# Per-shot memory of a job, split into the count tables of many numbers of queries
+#
+# A single job with enough shots replaces one job for every number of queries: its ordered outcomes are cut into
+# DISJOINT slices (one after the other, as independent as separate jobs, needing sum(queries) shots) or PREFIX
+# slices (the first n shots for every n, needing max(queries) shots). When the backend does not return the memory,
+# outcomes are put in a uniformly random order: shots are independent and identically distributed, so any order
+# of their counts is as likely as the one they were measured in.
+
+import logging
+
+import numpy as np
+
+import myLogger
+from histogram import Histogram
+
+logger = logging.getLogger('shots')
+logger.addHandler(myLogger.MyHandler())
+logger.setLevel(logging.CRITICAL)
+logger.propagate = False
+
+DISJOINT = 'disjoint'
+
+PREFIX = 'prefix'
+
+# largest number of shots of a job
+MAX_SHOTS = 8192
+
+# generator used to order the shots of jobs without memory, replace it with a seeded one for reproducible runs
+rng = np.random.default_rng()
+
+
+# number of shots needed to cut every number of queries out of one job
+def needed_shots(queries, slicing=DISJOINT):
+    return sum(queries) if slicing == DISJOINT else max(queries)
+
+
+# (start, end) shot range of every number of queries
+def slices(queries, slicing=DISJOINT):
+    if slicing == PREFIX:
+        return [(0, n_queries) for n_queries in queries]
+    ends = np.cumsum(queries)
+    return [(int(end) - n_queries, int(end)) for n_queries, end in zip(queries, ends)]
+
+
+# ordered outcomes of a job as integers: its memory if given ('0x..' hex or bitstrings), else its counts shuffled
+def memory_values(counts, memory=None, generator=None):
+    if memory is not None:
+        return np.array([int(shot, 16) if shot.startswith('0x') else int(shot, 2) for shot in memory],
+                        dtype=np.uint64)
+    values = np.repeat(np.array([int(value, 2) for value in counts], dtype=np.uint64),
+                       np.array(list(counts.values()), dtype=np.int64))
+    (rng if generator is None else generator).shuffle(values)
+    return values
+
+
+# Histogram of every number of queries, of outcomes of the given width
+def split_counts(values, queries, width, slicing=DISJOINT):
+    if len(values) < needed_shots(queries, slicing):
+        raise ValueError('%d shots are not enough for queries %s (%s)' % (len(values), str(queries), slicing))
+    tables = []
+    for start, end in slices(queries, slicing):
+        outcomes, hits = np.unique(values[start:end], return_counts=True)
+        tables.append(Histogram(outcomes, hits, width))
+    logger.debug('split_counts() - %d shots into %d tables', len(values), len(tables))
+    return tables
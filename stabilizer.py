@@ -0,0 +1,217 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+# Stabilizer-tableau simulator for the Clifford circuits built by Utility (local_sim)
+#
+# Tableau follows the CHP algorithm by Aaronson and Gottesman (destabilizers in rows 0..n-1,
+# stabilizers in rows n..2n-1), but phases are affine functions of the random measurement outcomes:
+# every random measurement adds a fresh variable, so a single pass over the circuit gives every
+# classical bit as constant + linear combination of the variables, and any number of shots is sampled
+# with one matrix product. Simulation is O(n^2) per gate and measure, sampling O(shots * n * m),
+# m being the number of random measurements.
+
+import logging
+from collections import namedtuple
+
+import numpy as np
+
+import myLogger
+from circuits import from_qasm
+
+logger = logging.getLogger('stabilizer')
+logger.addHandler(myLogger.MyHandler())
+logger.setLevel(logging.CRITICAL)
+logger.propagate = False
+
+# generator used by run_qasm(), replace it with a seeded one for reproducible runs
+rng = np.random.default_rng()
+
+# outcome distribution of a circuit: bit i of the classical register clbits[i] is
+# constant[i] xor (variables . basis[:, i]), the variables being independent fair coins
+Outcome = namedtuple('Outcome', ['clbits', 'constant', 'basis', 'size'])
+
+
+class Tableau(object):
+
+    def __init__(self, n_qubits, n_variables):
+        self.n_qubits = n_qubits
+        self.x = np.zeros((2 * n_qubits, n_qubits), dtype=bool)
+        self.z = np.zeros((2 * n_qubits, n_qubits), dtype=bool)
+        # column 0 of the phases is the constant term, column k the coefficient of variable k
+        self.r = np.zeros((2 * n_qubits, n_variables + 1), dtype=bool)
+        self.x[np.arange(n_qubits), np.arange(n_qubits)] = True
+        self.z[np.arange(n_qubits) + n_qubits, np.arange(n_qubits)] = True
+        self.n_variables = 0
+
+    def h(self, a):
+        self.r[:, 0] ^= self.x[:, a] & self.z[:, a]
+        self.x[:, a], self.z[:, a] = self.z[:, a].copy(), self.x[:, a].copy()
+
+    def s(self, a):
+        self.r[:, 0] ^= self.x[:, a] & self.z[:, a]
+        self.z[:, a] ^= self.x[:, a]
+
+    def sdg(self, a):
+        self.r[:, 0] ^= self.x[:, a] & ~self.z[:, a]
+        self.z[:, a] ^= self.x[:, a]
+
+    def x_gate(self, a):
+        self.r[:, 0] ^= self.z[:, a]
+
+    def y_gate(self, a):
+        self.r[:, 0] ^= self.x[:, a] ^ self.z[:, a]
+
+    def z_gate(self, a):
+        self.r[:, 0] ^= self.x[:, a]
+
+    def cx(self, a, b):
+        self.r[:, 0] ^= self.x[:, a] & self.z[:, b] & ~(self.x[:, b] ^ self.z[:, a])
+        self.x[:, b] ^= self.x[:, a]
+        self.z[:, a] ^= self.z[:, b]
+
+    # exponent of i picked up multiplying the Pauli row source into the rows target, mod 4
+    @staticmethod
+    def phase_exponent(x1, z1, x2, z2):
+        x1 = x1.astype(np.int8)
+        z1 = z1.astype(np.int8)
+        x2 = x2.astype(np.int8)
+        z2 = z2.astype(np.int8)
+        g = np.where(x1 & z1, z2 - x2,
+                     np.where(x1 & (1 - z1), z2 * (2 * x2 - 1),
+                              np.where((1 - x1) & z1, x2 * (1 - 2 * z2), 0)))
+        return g.sum(axis=-1, dtype=np.int64) % 4
+
+    # multiply row source into the given rows (rowsum of CHP)
+    def rowsum(self, rows, source):
+        flips = self.phase_exponent(self.x[source], self.z[source], self.x[rows], self.z[rows]) == 2
+        self.r[rows] ^= self.r[source]
+        self.r[rows, 0] ^= flips
+        self.x[rows] ^= self.x[source]
+        self.z[rows] ^= self.z[source]
+
+    # measure qubit a in the computational basis, return the outcome as an affine function of the variables
+    def measure(self, a):
+        n = self.n_qubits
+        anticommuting = np.flatnonzero(self.x[n:, a]) + n
+        if len(anticommuting) > 0:
+            p = anticommuting[0]
+            rows = np.flatnonzero(self.x[:, a])
+            rows = rows[rows != p]
+            if len(rows) > 0:
+                self.rowsum(rows, p)
+            self.x[p - n] = self.x[p]
+            self.z[p - n] = self.z[p]
+            self.r[p - n] = self.r[p]
+            self.x[p] = False
+            self.z[p] = False
+            self.z[p, a] = True
+            self.n_variables += 1
+            self.r[p] = False
+            self.r[p, self.n_variables] = True
+            return self.r[p].copy()
+        x = np.zeros(n, dtype=bool)
+        z = np.zeros(n, dtype=bool)
+        r = np.zeros(self.r.shape[1], dtype=bool)
+        for i in np.flatnonzero(self.x[:n, a]):
+            source = i + n
+            flip = self.phase_exponent(self.x[source], self.z[source], x, z) == 2
+            r ^= self.r[source]
+            r[0] ^= flip
+            x ^= self.x[source]
+            z ^= self.z[source]
+        return r
+
+
+# run the recorded gates of a circuit on a tableau and return its Outcome
+def simulate(circuit):
+    n_measures = sum(1 for gate, args in circuit.ops if gate == 'measure')
+    tableau = Tableau(circuit.size, n_measures)
+    gates = {'h': tableau.h, 's': tableau.s, 'sdg': tableau.sdg, 'x': tableau.x_gate, 'y': tableau.y_gate,
+             'z': tableau.z_gate, 'cx': tableau.cx}
+    clbits = []
+    outcomes = []
+    for gate, args in circuit.ops:
+        if gate == 'measure':
+            clbits.append(args[1])
+            outcomes.append(tableau.measure(args[0]))
+        elif gate == 'id':
+            continue
+        elif gate in gates:
+            gates[gate](*args)
+        else:
+            raise ValueError('Gate %s is not supported by the stabilizer simulator' % gate)
+    if outcomes:
+        outcomes = np.array(outcomes)[:, :tableau.n_variables + 1]
+    else:
+        outcomes = np.zeros((0, 1), dtype=bool)
+    logger.debug('simulate() - %d qubits, %d measures, %d random outcomes', circuit.size, len(clbits),
+                 tableau.n_variables)
+    return Outcome(clbits, outcomes[:, 0], outcomes[:, 1:].T, circuit.classical_r.size)
+
+
+# (shots x measures) matrix of sampled classical bits, in the order of outcome.clbits
+def sample_bits(outcome, shots, rng):
+    n_variables = outcome.basis.shape[0]
+    bits = np.broadcast_to(outcome.constant, (shots, len(outcome.clbits))).copy()
+    if n_variables > 0:
+        variables = rng.integers(0, 2, size=(shots, n_variables), dtype=np.uint8).astype(np.float32)
+        bits ^= (variables @ outcome.basis.astype(np.float32)).astype(np.int64) % 2 == 1
+    return bits
+
+
+# classical register value of every sampled shot, in the order they were sampled, as an array of integers
+# (of Python integers for registers of more than 64 bits)
+def shot_values(outcome, bits):
+    if outcome.size <= 64:
+        # registers up to 64 bits are packed into integers
+        weights = np.array([1 << clbit for clbit in outcome.clbits], dtype=np.uint64)
+        return (bits.astype(np.uint64) * weights).sum(axis=1, dtype=np.uint64)
+    values = np.zeros(bits.shape[0], dtype=object)
+    for column, clbit in enumerate(outcome.clbits):
+        values += bits[:, column].astype(object) * (1 << clbit)
+    return values
+
+
+# counts of sampled shots, keys follow the QISKit convention (classical bit 0 is the rightmost character)
+def counts(outcome, bits):
+    values, hits = np.unique(shot_values(outcome, bits), return_counts=True)
+    form = '0%db' % outcome.size
+    return {format(int(value), form): int(count) for value, count in zip(values, hits)}
+
+
+# per-shot memory of sampled shots, in the order they were sampled, as the '0x..' hex strings of QISKit
+def shot_memory(outcome, bits):
+    return [hex(int(value)) for value in shot_values(outcome, bits)]
+
+
+# sample counts from a recorded circuit, same interface as fake_ibmqx.statevector_sampler():
+# if memory is True, return the counts and the per-shot memory
+def sampler(circuit, shots, rng, memory=False):
+    outcome = simulate(circuit)
+    bits = sample_bits(outcome, shots, rng)
+    if memory:
+        return counts(outcome, bits), shot_memory(outcome, bits)
+    return counts(outcome, bits)
+
+
+# sample counts (and per-shot memory, if memory is True) from QASM written by circuits.Circuit.qasm()
+def run_qasm(qasm, shots, generator=None, memory=False):
+    return sampler(from_qasm(qasm), shots, rng if generator is None else generator, memory)
@@ -0,0 +1,54 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+# the modules of the repository are imported as top-level modules, as the scripts do
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fake_ibmqx
+import retry
+import utility
+from devices import qx5
+
+
+# backends of fake_server, tests may override it
+@pytest.fixture
+def fake_backends():
+    return [fake_ibmqx.FakeBackend(qx5, 16, latency=0.02)]
+
+
+# utility.py talking to fake_backends with short waits and retry delays, restored after the test
+@pytest.fixture
+def fake_server(monkeypatch, fake_backends):
+    server = fake_ibmqx.FakeServer(backends=fake_backends, credits=1000, seed=1, poll_interval=0.01)
+    monkeypatch.setattr(utility, 'QuantumProgram', server.program)
+    monkeypatch.setattr(utility, 'Qconfig', fake_ibmqx.FakeConfig)
+    monkeypatch.setattr(utility, 'retrier', retry.Retrier(
+        policies={kind: retry.RetryPolicy(max_attempts=20, base=0.01, max_delay=0.05)
+                  for kind in retry.DEFAULT_POLICIES}, cooldown=0.05))
+    for name in ('JOB_WAIT', 'OFFLINE_WAIT', 'CREDITS_WAIT'):
+        monkeypatch.setattr(utility, name, 0.01)
+    return server
@@ -0,0 +1,78 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+import math
+
+import numpy as np
+
+import analysis
+import utility
+from count_store import ENVARIANCE, CountStore
+from devices import qx5
+
+EXECUTIONS = 3
+
+N_QUBITS = 3
+
+N_SHOTS = 1024
+
+
+# fidelity file as fidelity.py wrote it before, one table of the store at a time
+def old_fidelity(store):
+    lines = ['Exec\t\tFidelity', '']
+    for execution in range(1, EXECUTIONS + 1, 1):
+        fidelity = 0
+        zeroes = '0' * N_QUBITS
+        ones = '1' * N_QUBITS
+        for value, counts in store.get_strings(ENVARIANCE, qx5, None, N_QUBITS, N_SHOTS, execution):
+            if value == ones or value == zeroes:
+                fidelity += math.sqrt(counts / (2 * N_SHOTS))
+        lines.append('%2d %1.20f' % (execution, fidelity))
+    return '\n'.join(lines) + '\n'
+
+
+# the runner imports the txt tree into the store and writes the fidelity of the only complete cell
+def test_fidelity_cell(monkeypatch, tmp_path):
+    rng = np.random.default_rng(1)
+    directory = str(tmp_path / 'Data_Envariance') + '/'
+    for execution in range(1, EXECUTIONS + 1):
+        shots = rng.multinomial(N_SHOTS, [0.45, 0.05, 0.05, 0.45])
+        counts = dict(zip(['000', '010', '101', '111'], shots.tolist()))
+        utility.store_envariance(counts, execution, qx5, N_QUBITS, N_SHOTS, [0, 1, 2], directory)
+    # an incomplete cell is skipped
+    utility.store_envariance({'00000': N_SHOTS}, 1, qx5, 5, N_SHOTS, [0, 1, 2, 3, 4], directory)
+    monkeypatch.setattr(analysis, 'devices', [qx5])
+    monkeypatch.setattr(analysis, 'envariance_qubits', [N_QUBITS, 5])
+    monkeypatch.setattr(analysis, 'shots', [N_SHOTS])
+    monkeypatch.setattr(analysis, 'envariance_executions', EXECUTIONS)
+    monkeypatch.setattr(analysis, 'parity_qubits', [])
+    monkeypatch.setattr(analysis, 'envariance_directory', directory)
+    monkeypatch.setattr(analysis, 'parity_directory', str(tmp_path / 'Data_Parity') + '/')
+
+    analysis.run(str(tmp_path / 'store'), max_workers=1)
+
+    name = '%s%s/%s_%d_%d_qubits_envariance_fidelity.txt'
+    with open(name % (directory, qx5, qx5, N_SHOTS, N_QUBITS)) as f:
+        written = f.read()
+    with CountStore(str(tmp_path / 'store')) as store:
+        assert written == old_fidelity(store)
+    assert not (tmp_path / 'Data_Envariance' / qx5 / ('%s_%d_5_qubits_envariance_fidelity.txt' % (qx5, N_SHOTS))
+                ).exists()
@@ -0,0 +1,126 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+from collections import Counter
+
+import pytest
+
+import coupling_maps
+import credits
+import fake_ibmqx
+import utility
+from async_exec import PARITY, AsyncExecutor, Job
+from devices import qx4, qx5
+
+DEVICES = [qx4, qx5]
+
+
+@pytest.fixture
+def fake_backends():
+    return [fake_ibmqx.FakeBackend(qx4, 5, latency=0.05), fake_ibmqx.FakeBackend(qx5, 16, latency=0.05)]
+
+
+# submissions and stored results, in order, and the largest number of jobs in flight on every device
+@pytest.fixture
+def events(fake_server, monkeypatch):
+    events = []
+    in_flight = Counter()
+    peak = Counter()
+    devices = dict()
+    submit_job = utility.submit_job
+    fetch_job = utility.fetch_job
+    store_parity = utility.store_parity
+
+    def submit(Q_program, names, device, *args):
+        job_id = submit_job(Q_program, names, device, *args)
+        devices[job_id] = device
+        in_flight[device] += 1
+        peak[device] = max(peak[device], in_flight[device])
+        events.append(('submit', device))
+        return job_id
+
+    def fetch(Q_program, job_id):
+        counts = fetch_job(Q_program, job_id)
+        if counts is not None:
+            in_flight[devices[job_id]] -= 1
+        return counts
+
+    def store(counts, execution, device, *args):
+        events.append(('store', device))
+        store_parity(counts, execution, device, *args)
+
+    monkeypatch.setattr(utility, 'submit_job', submit)
+    monkeypatch.setattr(utility, 'fetch_job', fetch)
+    monkeypatch.setattr(utility, 'store_parity', store)
+    return events, peak
+
+
+def executor(tmp_path, max_in_flight):
+    utilities = {device: utility.Utility(coupling_maps.by_device[device]) for device in DEVICES}
+    return AsyncExecutor(utilities, max_in_flight=max_in_flight, poll_interval=0.01, retry_interval=0.01,
+                         parity_directory=str(tmp_path) + '/')
+
+
+def jobs(device, executions):
+    return [Job(PARITY, execution, device, 3, 10, '11') for execution in range(1, executions + 1)]
+
+
+# every device keeps max_in_flight jobs running, and results are written as their jobs complete
+def test_in_flight(events, tmp_path):
+    events, peak = events
+    failed = executor(tmp_path, 2).run(jobs(qx4, 6) + jobs(qx5, 6))
+    assert failed == []
+    assert peak == {qx4: 2, qx5: 2}
+    for device in DEVICES:
+        device_events = [event for event, event_device in events if event_device == device]
+        assert device_events.count('store') == 6
+        # the first result is written before the last job is submitted
+        assert device_events.index('store') < len(device_events) - 1 - device_events[::-1].index('submit')
+    for execution in range(1, 7):
+        assert (tmp_path / qx5 / '11' / ('execution%d' % execution)).is_dir()
+
+
+# a job that exhausts its retries is returned as failed, gives its credits back and does not stop the others
+def test_failed_job(events, fake_server, monkeypatch, tmp_path):
+    events, peak = events
+    manager = credits.CreditManager(capacity=1000)
+    tickets = []
+    request = manager.request
+
+    def record(device, priority=0):
+        tickets.append(request(device, priority))
+        return tickets[-1]
+
+    monkeypatch.setattr(manager, 'request', record)
+    monkeypatch.setattr(utility, 'credit_manager', manager)
+    fetch_job = utility.fetch_job
+
+    def fetch(Q_program, job_id):
+        if job_id == 'fake-000001':
+            raise ConnectionError('Injected connection error')
+        return fetch_job(Q_program, job_id)
+
+    monkeypatch.setattr(utility, 'fetch_job', fetch)
+    sweep = jobs(qx5, 4)
+    failed = executor(tmp_path, 2).run(sweep)
+    assert failed == sweep[:1]
+    assert [event for event, device in events].count('store') == 3
+    assert len(tickets) == 4 and all(ticket.released for ticket in tickets)
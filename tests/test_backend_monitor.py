@@ -0,0 +1,60 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+import threading
+
+import backend_monitor
+import utility
+from devices import qx5
+
+
+# the monitor polls with a program of its own, not with the ones of the jobs, and connects again after an error
+def test_own_program(fake_server):
+    programs = []
+
+    def connect():
+        programs.append((utility.authenticate(), threading.get_ident()))
+        return programs[-1][0]
+
+    pool = backend_monitor.MonitorPool(connect, ttl=0.0, poll_interval=0.01)
+    monitor = pool.get(qx5)
+    assert pool.get(qx5) is monitor
+    assert monitor.available()
+    fake_server.fail_next(1)
+    monitor.status()
+    assert monitor.available()
+    assert len(programs) == 2
+    pool.stop()
+
+
+# jobs waiting for an offline backend resume once the polling thread sees it back online
+def test_wait_outage(fake_server, monkeypatch):
+    monkeypatch.setattr(utility, 'monitors', backend_monitor.MonitorPool(utility.authenticate, ttl=0.01,
+                                                                         poll_interval=0.01))
+    fake_server.schedule_outage(qx5, 0.2)
+    threads = [threading.Thread(target=utility.wait_backend, args=(None, qx5)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+        assert not thread.is_alive()
+    assert fake_server.is_available(qx5)
+    utility.monitors.stop()
@@ -0,0 +1,96 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+import itertools
+
+import numpy as np
+import pytest
+
+import circuits
+import coupling_maps
+import stabilizer
+import utility
+
+
+# outcomes a circuit measures: Clifford circuits measured at the end give every outcome of an affine space of
+# classical registers with the same probability, so two circuits sample the same counts if they have the same
+# outcomes
+def outcomes(circuit):
+    outcome = stabilizer.simulate(circuit)
+    n_variables = outcome.basis.shape[0]
+    assert n_variables <= 12
+    variables = np.array(list(itertools.product([0, 1], repeat=n_variables)), dtype=np.int64).reshape(-1, n_variables)
+    bits = outcome.constant ^ ((variables @ outcome.basis.astype(np.int64)) % 2 == 1)
+    return set(stabilizer.shot_values(outcome, bits).tolist())
+
+
+def random_circuit(rng, n_qubits=5, n_gates=60):
+    quantum_r = circuits.Register('qr', n_qubits)
+    classical_r = circuits.Register('cr', n_qubits)
+    circuit = circuits.Circuit('random', quantum_r, classical_r)
+    for _ in range(n_gates):
+        gate = rng.choice(['h', 's', 'sdg', 'x', 'y', 'z', 'iden', 'cx', 'cx', 'pair'])
+        if gate == 'cx' or gate == 'pair':
+            control, target = rng.choice(n_qubits, size=2, replace=False)
+            for _ in range(2 if gate == 'pair' else 1):
+                circuit.cx(quantum_r[int(control)], quantum_r[int(target)])
+        else:
+            getattr(circuit, gate)(quantum_r[int(rng.integers(n_qubits))])
+    for qubit in rng.permutation(n_qubits):
+        circuit.measure(quantum_r[int(qubit)], classical_r[int(n_qubits - 1 - qubit)])
+    return circuit
+
+
+# the optimized gates of random Clifford circuits measure the same outcomes with fewer gates and no deeper
+@pytest.mark.parametrize('seed', range(20))
+def test_random_clifford(seed):
+    circuit = random_circuit(np.random.default_rng(seed))
+    optimized = circuits.Circuit('optimized', circuit.quantum_r, circuit.classical_r)
+    optimized.ops = circuits.optimize(circuit.ops)
+    assert outcomes(optimized) == outcomes(circuit)
+    before, after = circuits.stats(circuit.ops), circuits.stats(optimized.ops)
+    assert after.gates < before.gates and after.depth <= before.depth
+    # optimizing again changes nothing
+    assert circuits.optimize(optimized.ops) == optimized.ops
+
+
+# the circuits of the experiments measure the same outcomes with and without the optimizer, with fewer gates
+@pytest.mark.parametrize('experiment, oracle', [('envariance', None), ('parity', '00'), ('parity', '10'),
+                                                ('parity', '11')])
+def test_experiments(experiment, oracle):
+    optimized = utility.Utility(coupling_maps.qx5)
+    plain = utility.Utility(coupling_maps.qx5, optimize=False)
+    before = 0
+    after = 0
+    for n_qubits in (3, 9, 16):
+        cached = optimized.circuit(n_qubits, experiment=experiment, oracle=oracle)
+        cached_plain = plain.circuit(n_qubits, experiment=experiment, oracle=oracle)
+        assert cached.connected == cached_plain.connected
+        circuit = circuits.from_qasm(cached.qasm)
+        circuit_plain = circuits.from_qasm(cached_plain.qasm)
+        assert outcomes(circuit) == outcomes(circuit_plain)
+        counts = stabilizer.run_qasm(cached.qasm, 1000, np.random.default_rng(1))
+        assert {int(key, 2) for key in counts} <= outcomes(circuit_plain)
+        stats, stats_plain = circuits.stats(circuit.ops), circuits.stats(circuit_plain.ops)
+        assert stats.gates <= stats_plain.gates and stats.depth <= stats_plain.depth
+        before += stats_plain.gates
+        after += stats.gates
+    assert after < before
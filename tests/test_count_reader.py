@@ -0,0 +1,96 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+import os
+import re
+
+import numpy as np
+import pytest
+
+import count_reader
+import utility
+
+_parity_file = re.compile(
+    r'^(?P<device>.+)_(?P<shots>\d+)queries_(?P<oracle>\d+)_(?P<n_qubits>\d+)_qubits_parity\.txt$')
+
+
+# a parity data tree of random count tables, with a file that is not a count table
+@pytest.fixture
+def tree(tmp_path):
+    rng = np.random.default_rng(1)
+    directory = str(tmp_path / 'Data_Parity') + '/'
+    for device in ('dev', 'other'):
+        for execution in (1, 2, 10):
+            for n_qubits in (3, 5):
+                values = rng.choice(2 ** n_qubits, size=min(6, 2 ** n_qubits), replace=False)
+                counts = {format(int(value), '0%db' % n_qubits): int(rng.integers(1, 100)) for value in values}
+                utility.store_parity(counts, execution, device, n_qubits, '11', 50, list(range(n_qubits)), directory)
+    os.makedirs(directory + 'dev/11/notes', exist_ok=True)
+    with open(directory + 'dev/11/notes/readme.txt', 'w') as f:
+        f.write('not a count table\n')
+    return directory
+
+
+# the table as the scripts read it before: all the lines after the header, split on the tab
+def old_read_counts(filename):
+    with open(filename, 'r') as read_f:
+        lines = read_f.read().splitlines()
+    counts = []
+    for line in range(2, len(lines), 1):
+        result = lines[line].split('\t')
+        counts.append((int(result[0], 2), int(result[1])))
+    return counts
+
+
+# the count tables of a data tree as the count store import found them before, by execution directory
+def old_scan(directory):
+    tables = []
+    for device in sorted(os.listdir(directory)):
+        for root, dirs, files in os.walk(os.path.join(directory, device)):
+            match = re.match(r'^execution(?P<execution>\d+)$', os.path.basename(root))
+            if match is None:
+                continue
+            for name in sorted(files):
+                if _parity_file.match(name) is not None:
+                    tables.append((int(match.group('execution')), os.path.join(root, name)))
+    return tables
+
+
+def test_read_counts(tree):
+    tables = list(count_reader.scan_tree(tree, _parity_file))
+    assert sorted((table.execution, table.path) for table in tables) == sorted(old_scan(tree))
+    for table in tables:
+        expected = old_read_counts(table.path)
+        values, counts = count_reader.read_counts(table.path)
+        assert list(zip(values, counts)) == expected
+        assert list(count_reader.iter_counts(table.path)) == expected
+        with open(table.path, 'rb') as f:
+            assert count_reader.parse_counts(f.read()) == (values, counts)
+
+
+# many tables are read at once, every entry remembering the file it comes from
+def test_load_counts(tree):
+    paths = [table.path for table in count_reader.scan_tree(tree, _parity_file)]
+    values, counts, files = count_reader.load_counts(paths)
+    assert values.dtype == np.uint64 and counts.dtype == np.uint32
+    expected = [(value, count, index) for index, path in enumerate(paths) for value, count in old_read_counts(path)]
+    assert list(zip(values.tolist(), counts.tolist(), files.tolist())) == expected
+    assert count_reader.parse_counts(b'VALUES\t\tCOUNTS\n\n') == ([], [])
@@ -0,0 +1,155 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+import threading
+
+import pytest
+
+import credits
+from devices import qx5
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    # fails instead of waiting forever on a job that is never admitted
+    def sleep(self, seconds):
+        self.now += seconds
+        assert self.now < 1e6, 'job never admitted'
+
+
+class API(object):
+
+    def __init__(self, remaining, failures=0):
+        self.remaining = remaining
+        self.failures = failures
+        self.calls = 0
+
+    def get_my_credits(self):
+        self.calls += 1
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError('Injected connection error')
+        return {'remaining': self.remaining}
+
+
+class Program(object):
+
+    def __init__(self, api):
+        self.api = api
+
+    def get_api(self):
+        return self.api
+
+
+def manager(clock, **kwargs):
+    return credits.CreditManager(capacity=15, replenish_interval=150., clock=clock, sleep=clock.sleep, **kwargs)
+
+
+# admitted jobs take their cost out of the modelled balance, refunded jobs give it back, simulators are free
+def test_bucket():
+    clock = Clock()
+    credit_manager = manager(clock)
+    program = Program(API(6))
+    first = credit_manager.acquire(program, qx5)
+    second = credit_manager.acquire(program, qx5)
+    assert credit_manager.balance() == 0
+    assert credit_manager.try_admit(credit_manager.request('ibmqx_qasm_simulator'))
+    credit_manager.release(first)
+    assert credit_manager.balance() == 3
+    credit_manager.release(first)
+    assert credit_manager.balance() == 3
+    credit_manager.release(second)
+    # 0.1 credits per second: 10 seconds refill one credit
+    clock.now += 10
+    assert credit_manager.balance() == pytest.approx(7)
+    assert program.api.calls == 1
+
+
+# a job waits until the bucket refills, and the queue is served in order of priority
+def test_wait_and_priority():
+    clock = Clock()
+    credit_manager = manager(clock, min_sync_interval=1000.)
+    program = Program(API(3))
+    credit_manager.sync(program)
+    late = credit_manager.request(qx5, priority=2)
+    early = credit_manager.request(qx5, priority=1)
+    assert not credit_manager.try_admit(late)
+    assert credit_manager.try_admit(early)
+    ticket = credit_manager.acquire(program, qx5, priority=0)
+    assert ticket.admitted and clock.now == pytest.approx(30)
+    assert not credit_manager.try_admit(late)
+    clock.now += 30
+    assert credit_manager.try_admit(late)
+
+
+# a failed sync cancels the ticket of the job: later jobs are still admitted
+def test_failed_sync_cancels_ticket():
+    clock = Clock()
+    credit_manager = manager(clock)
+    program = Program(API(15, failures=1))
+    with pytest.raises(ConnectionError):
+        credit_manager.acquire(program, qx5)
+    ticket = credit_manager.acquire(program, qx5)
+    assert ticket.admitted
+    assert credit_manager.balance() == 12
+
+
+# a waiting job that is released is cancelled and cannot be admitted afterwards
+def test_release_waiting_ticket():
+    clock = Clock()
+    credit_manager = manager(clock)
+    credit_manager.sync(Program(API(0)))
+    first = credit_manager.request(qx5)
+    second = credit_manager.request(qx5)
+    credit_manager.release(first, submitted=False)
+    clock.now += 30
+    assert credit_manager.try_admit(second)
+    with pytest.raises(ValueError):
+        credit_manager.try_admit(first)
+
+
+# jobs acquired from several threads never overdraw the balance
+def test_threads():
+    credit_manager = credits.CreditManager(capacity=30, replenish_interval=1e9, sleep=lambda seconds: None)
+    program = Program(API(30))
+    credit_manager.sync(program)
+    admitted = []
+
+    def acquire():
+        ticket = credit_manager.request(qx5)
+        if credit_manager.try_admit(ticket):
+            admitted.append(ticket)
+        else:
+            credit_manager.cancel(ticket)
+
+    threads = [threading.Thread(target=acquire) for _ in range(40)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(admitted) <= 10
+    assert credit_manager.balance() == pytest.approx(30 - 3 * len(admitted), abs=1e-3)
@@ -0,0 +1,70 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+import pytest
+
+import coupling_maps
+import fake_ibmqx
+import utility
+from async_exec import PARITY
+from devices import qx2, qx4, qx5
+from dispatcher import Dispatcher, Task
+
+DEVICES = [qx2, qx4, qx5]
+
+
+@pytest.fixture
+def fake_backends():
+    return [fake_ibmqx.FakeBackend(qx2, 5, latency=0.05), fake_ibmqx.FakeBackend(qx4, 5, latency=0.05),
+            fake_ibmqx.FakeBackend(qx5, 16, latency=0.05)]
+
+
+@pytest.fixture
+def dispatcher(fake_server, tmp_path):
+    utilities = {device: utility.Utility(coupling_maps.by_device[device]) for device in DEVICES}
+    return Dispatcher(utilities, job_time=0.1, threads=6, parity_directory=str(tmp_path) + '/')
+
+
+# only devices with enough qubits are candidates
+def test_candidates(dispatcher):
+    assert dispatcher.candidates(Task(PARITY, 1, DEVICES, 9, 10, '11')) == [qx5]
+    with pytest.raises(ValueError):
+        dispatcher.candidates(Task(PARITY, 1, [qx2, qx4], 9, 10, '11'))
+
+
+# small tasks are spread across the devices, large ones run where they fit, and counts are stored where they ran
+def test_routes(dispatcher, fake_server, tmp_path):
+    tasks = [Task(PARITY, execution, DEVICES, n_qubits, 10, '11') for execution in range(1, 7) for n_qubits in (3, 9)]
+    routes = dispatcher.run(tasks)
+    assert all(device == qx5 for device, task in zip(routes, tasks) if task.n_qubits == 9)
+    assert len(set(routes)) > 1
+    assert sum(dispatcher.routes.values()) == len(tasks) == fake_server.calls['run_job']
+    # routing authenticates once per worker thread, run_circuits() once per task
+    assert fake_server.calls['set_api'] <= len(tasks) + 6
+    for device, task in zip(routes, tasks):
+        assert (tmp_path / device / '11' / ('execution%d' % task.execution)).is_dir()
+
+
+# an offline device gets no task while another candidate is online
+def test_outage(dispatcher, fake_server):
+    fake_server.schedule_outage(qx5, 100)
+    dispatcher.run([Task(PARITY, execution, [qx5, qx2, qx4], 3, 10, '00') for execution in range(1, 5)])
+    assert qx5 not in dispatcher.routes
@@ -0,0 +1,105 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+import numpy as np
+import pytest
+
+import histogram
+from count_store import ENVARIANCE, CountStore
+from histogram import Histogram
+
+COUNTS = {'0110': 3, '0000': 5, '1111': 5, '0001': 1}
+
+
+# bitstrings and packed outcomes convert both ways, bit 0 being the rightmost character
+def test_strings():
+    values = histogram.from_strings(['0001', '1000', '1111'])
+    assert values.tolist() == [1, 8, 15]
+    assert histogram.to_strings(values, 4) == ['0001', '1000', '1111']
+    assert histogram.to_strings(histogram.from_strings(['1' * 64]), 64) == ['1' * 64]
+
+
+# a dict becomes a histogram with the same counts, whether it is stored sparse or dense
+@pytest.mark.parametrize('counts, dense', [({'00': 5, '11': 5, '10': 3, '01': 1}, True),
+                                           (COUNTS, False),
+                                           ({key.zfill(30): count for key, count in COUNTS.items()}, False)])
+def test_from_counts(counts, dense):
+    table = Histogram.from_counts(counts)
+    n_bits = table.n_bits
+    assert table.dense == dense
+    assert table.to_dict() == counts
+    assert table.total() == 14 and len(table) == 4
+    assert all(table[key] == count and table[int(key, 2)] == count for key, count in counts.items())
+    assert table['1' * n_bits] == counts.get('1' * n_bits, 0) and table[1 << n_bits] == 0
+    assert Histogram.from_counts(table.items(), n_bits) == table
+
+
+def test_limits():
+    with pytest.raises(ValueError):
+        Histogram([], [], 65)
+    with pytest.raises(ValueError):
+        Histogram([16], [1], 4)
+    with pytest.raises(ValueError):
+        Histogram.from_counts([(1, 2)])
+
+
+# outcomes repeated within or across histograms have their counts added up
+def test_merge():
+    table = Histogram([3, 1, 3], [1, 2, 3], 40)
+    assert table.items() == [(1, 2), (3, 4)]
+    merged = table.merge(Histogram([1, 7], [1, 1], 40))
+    assert merged.items() == [(1, 3), (3, 4), (7, 1)]
+    with pytest.raises(ValueError):
+        table.merge(Histogram([1], [1], 39))
+
+
+# top() sorts by decreasing count, then increasing outcome
+def test_top():
+    values, counts = Histogram.from_counts(COUNTS).top()
+    assert histogram.to_strings(values, 4) == ['0000', '1111', '0110', '0001']
+    assert counts.tolist() == [5, 5, 3, 1]
+    assert Histogram.from_counts(COUNTS).top(1)[0].tolist() == [0]
+
+
+# remap() takes the listed bits from the leftmost character, marginalize() keeps the given bits
+def test_remap():
+    table = Histogram.from_counts({'0110': 3, '0011': 2})
+    assert table.remap([0, 1, 2, 3]).to_dict() == {'0110': 3, '1100': 2}
+    assert table.remap([3, 0]).to_dict() == {'00': 3, '01': 2}
+    assert table.marginalize([1, 2]).to_dict() == {'11': 3, '01': 2}
+    assert Histogram([2 ** 64 - 1, 5], [1, 2], 64).remap([63, 0, 2, 9]).to_dict() == {'0110': 2, '1111': 1}
+    with pytest.raises(ValueError):
+        table.remap([4])
+
+
+# histograms and string tables put in the count store come back with the same counts
+def test_count_store(tmp_path):
+    wide = {format(value, '064b'): count for value, count in [(1, 2), (1 << 63, 5), (2 ** 64 - 1, 1)]}
+    with CountStore(str(tmp_path)) as store:
+        store.put(ENVARIANCE, 'dev', None, 4, 100, 1, Histogram.from_counts(COUNTS))
+        store.put(ENVARIANCE, 'dev', None, 4, 100, 2, COUNTS)
+        store.put(ENVARIANCE, 'dev', None, 64, 100, 1, Histogram.from_counts(wide))
+    with CountStore(str(tmp_path)) as store:
+        assert store.get_histogram(ENVARIANCE, 'dev', None, 4, 100, 1) == Histogram.from_counts(COUNTS)
+        assert dict(store.get_strings(ENVARIANCE, 'dev', None, 4, 100, 2)) == COUNTS
+        assert store.get_histogram(ENVARIANCE, 'dev', None, 64, 100, 1).to_dict() == wide
+        values, hits = store.get(ENVARIANCE, 'dev', None, 64, 100, 1)
+        assert np.frombuffer(values, dtype=np.uint64).tolist() == [1, 1 << 63, 2 ** 64 - 1]
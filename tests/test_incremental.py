@@ -0,0 +1,56 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+import os
+import shutil
+
+import count_store
+import incremental
+from count_store import ENVARIANCE, CountStore
+
+
+def index_lines(directory):
+    return sum(sum(1 for _ in open(os.path.join(directory, name))) for name in os.listdir(directory)
+               if name.endswith('.index'))
+
+
+# a store filled by import_envariance() gets no duplicate records on the first update, but changed files are put
+def test_update_skips_imported_tables(tmp_path):
+    data = str(tmp_path / 'Data_Envariance') + '/'
+    shutil.copytree('Data_Envariance', data)
+    store_dir = str(tmp_path / 'store')
+    with CountStore(store_dir) as store:
+        imported = count_store.import_envariance(store, data)
+        records = index_lines(store_dir)
+        aggregator = incremental.Aggregator(str(tmp_path / 'state.json'))
+        changed = aggregator.update(ENVARIANCE, data, store)
+        assert len(changed) == imported
+        assert index_lines(store_dir) == records
+        # a table rewritten after the import is put again
+        table = os.path.join(data, 'ibmqx4', 'execution10', 'ibmqx4_8192_2_qubits_envariance.txt')
+        with open(table, 'r') as table_f:
+            lines = table_f.read().splitlines()
+        value, count = lines[-1].split('\t')
+        lines[-1] = value + '\t' + str(int(count) + 1)
+        with open(table, 'w') as table_f:
+            table_f.write('\n'.join(lines) + '\n')
+        assert len(aggregator.update(ENVARIANCE, data, store)) == 1
+        assert index_lines(store_dir) == records + 1
@@ -0,0 +1,43 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+import pytest
+
+import coupling_maps
+import utility
+from devices import qx3, qx5
+
+EXPERIMENTS = [('envariance', None), ('parity', '11'), ('parity', '10'), ('parity', '00')]
+
+
+# the TREE layout is never deeper and never has more gates than the PATH one, optimized or not
+@pytest.mark.parametrize('device', [qx3, qx5])
+@pytest.mark.parametrize('optimize', [True, False])
+def test_tree_never_worse_than_path(device, optimize):
+    path = utility.Utility(coupling_maps.by_device[device], layout=utility.PATH, optimize=optimize)
+    tree = utility.Utility(coupling_maps.by_device[device], layout=utility.TREE, optimize=optimize)
+    for n_qubits in range(2, 17):
+        for experiment, oracle in EXPERIMENTS:
+            path_stats = path.circuit(n_qubits, experiment, oracle).stats[1]
+            tree_stats = tree.circuit(n_qubits, experiment, oracle).stats[1]
+            assert tree_stats.depth <= path_stats.depth, (n_qubits, experiment, oracle)
+            assert tree_stats.gates <= path_stats.gates, (n_qubits, experiment, oracle)
+
@@ -0,0 +1,113 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+import coupling_maps
+import utility
+from async_exec import PARITY, Job
+from devices import qx5
+from ledger import COMPLETED, FAILED, SUBMITTED, JobLedger, SweepRunner
+
+ORACLES = ['00', '10', '11']
+
+
+def sweep(oracles):
+    return [Job(PARITY, 1, qx5, 3, 100, oracle) for oracle in oracles]
+
+
+def runner(ledger, directory, **kwargs):
+    return SweepRunner(ledger, {qx5: utility.Utility(coupling_maps.qx5)}, poll_interval=0.01,
+                       parity_directory=directory, **kwargs)
+
+
+def parity_file(directory, job):
+    return '%s%s/%s/execution%d/%s_%dqueries_%s_%d_qubits_parity.txt' % (
+        directory, job.device, job.oracle, job.execution, job.device, job.num_shots, job.oracle, job.n_qubits)
+
+
+def read(filename):
+    with open(filename) as f:
+        return f.read()
+
+
+# the file every job of a remote job should have, written from the counts the server returned for its circuit
+def expected_files(fake_server, sweep_runner, job_id, jobs, size, directory):
+    result = fake_server.get_job(job_id)
+    counts = {qasm['qasm']: qasm['result']['data']['counts'] for qasm in result['qasms']}
+    for job in jobs:
+        circuit = sweep_runner.cached(job, size)
+        utility.store_parity(counts[circuit.qasm], job.execution, job.device, job.n_qubits, job.oracle,
+                             job.num_shots, circuit.connected, directory)
+
+
+# a run that crashed right after submitting is resumed by collecting its job, without submitting it again
+def test_resume_after_crash(fake_server, tmp_path):
+    directory = str(tmp_path) + '/'
+    ledger = JobLedger(str(tmp_path / 'ledger.db'))
+    jobs = sweep(ORACLES)
+    ledger.plan(jobs)
+    job_id = runner(ledger, directory).submit(jobs)
+    assert {entry.state for entry in ledger.entries()} == {SUBMITTED}
+    assert fake_server.calls['run_job'] == 1
+
+    summary = runner(ledger, directory).run(jobs)
+    assert summary == {COMPLETED: len(jobs)}
+    assert fake_server.calls['run_job'] == 1
+    assert all(entry.job_id == job_id for entry in ledger.entries())
+    ledger.close()
+
+
+# resuming with a subset of the jobs of a remote job gives every circuit its own counts
+def test_resume_subset(fake_server, tmp_path):
+    directory = str(tmp_path) + '/'
+    ledger = JobLedger(str(tmp_path / 'ledger.db'))
+    jobs = sweep(ORACLES)
+    ledger.plan(jobs)
+    first = runner(ledger, directory)
+    job_id = first.submit(jobs)
+    size = ledger.entry(jobs[0]).size
+
+    second = runner(ledger, directory)
+    summary = second.run(sweep(['11']))
+    assert summary == {COMPLETED: len(jobs)}
+    assert fake_server.calls['run_job'] == 1
+
+    expected = str(tmp_path / 'expected') + '/'
+    expected_files(fake_server, second, job_id, jobs, size, expected)
+    for job in jobs:
+        assert read(parity_file(directory, job)) == read(parity_file(expected, job))
+    ledger.close()
+
+
+# a job that always fails is submitted max_attempts times, also across runs
+def test_bounded_retries(fake_server, tmp_path):
+    directory = str(tmp_path) + '/'
+    ledger = JobLedger(str(tmp_path / 'ledger.db'))
+    jobs = sweep(['11'])
+    fake_server.fail_jobs(10)
+    summary = runner(ledger, directory, max_attempts=2).run(jobs)
+    assert summary == {FAILED: 1}
+    assert fake_server.calls['run_job'] == 2
+    entry = ledger.entry(jobs[0])
+    assert entry.attempts == 2 and 'ERROR_RUNNING_JOB' in entry.error
+
+    assert runner(ledger, directory, max_attempts=2).run(jobs) == {FAILED: 1}
+    assert fake_server.calls['run_job'] == 2
+    ledger.close()
@@ -0,0 +1,93 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+import os
+
+import numpy as np
+import pytest
+
+import coupling_maps
+import noise
+import stabilizer
+import utility
+from circuits import from_qasm
+from devices import local_sim, noisy_sim
+
+
+@pytest.fixture(scope='module')
+def utility_qx5():
+    return utility.Utility(coupling_maps.qx5)
+
+
+# relative path and content of every file under directory
+def tree(directory):
+    files = dict()
+    for root, dirs, names in os.walk(directory):
+        for name in names:
+            with open(os.path.join(root, name)) as f:
+                files[os.path.relpath(os.path.join(root, name), directory)] = f.read()
+    return files
+
+
+# without noise the sampler draws the same shots as the stabilizer simulator
+@pytest.mark.parametrize('experiment, oracle', [('envariance', None), ('parity', '11')])
+def test_no_noise(utility_qx5, experiment, oracle):
+    cached = utility_qx5.circuit(9, experiment=experiment, oracle=oracle)
+    counts = noise.noisy_counts(cached, noise.NoiseModel(), 1, 1000, np.random.default_rng(1))
+    assert counts == [stabilizer.run_qasm(cached.qasm, 1000, np.random.default_rng(1))]
+
+
+# readout noise flips every measured bit with its own rate, and nothing else
+def test_readout(utility_qx5):
+    circuit = from_qasm(utility_qx5.circuit(9, experiment='parity', oracle='11').qasm)
+    outcome, ideal = noise.sample(circuit, noise.NoiseModel(), 4, 5000, np.random.default_rng(1))
+    rates = {noise.flip_patterns(circuit)[1][0]: 0.2}
+    for model, expected in [(noise.NoiseModel(readout=0.05), 0.05), (noise.NoiseModel(readout=rates, cx=0.), None)]:
+        outcome, bits = noise.sample(circuit, model, 4, 5000, np.random.default_rng(1))
+        flips = (bits != ideal).mean(axis=(0, 1))
+        if expected is None:
+            assert flips[0] == pytest.approx(0.2, abs=0.01)
+            assert not flips[1:].any()
+        else:
+            assert flips == pytest.approx(np.full(len(flips), expected), abs=0.01)
+
+
+# without noise the sweeps write the files parity_exec() and envariance_exec() write on the local simulator
+def test_sweep_layout(utility_qx5, monkeypatch, tmp_path):
+    monkeypatch.setattr(stabilizer, 'rng', np.random.default_rng(1))
+    utility.envariance_exec(1, local_sim, utility_qx5, 5, 100, str(tmp_path / 'exec_envariance') + '/')
+    monkeypatch.setattr(stabilizer, 'rng', np.random.default_rng(1))
+    utility.parity_exec(1, local_sim, utility_qx5, 5, '10', 100, str(tmp_path / 'exec_parity') + '/')
+    noise.envariance_sweep(utility_qx5, 5, noise.NoiseModel(), 1, 100, local_sim,
+                           str(tmp_path / 'sweep_envariance') + '/', rng=np.random.default_rng(1))
+    noise.parity_sweep(utility_qx5, 5, '10', noise.NoiseModel(), 1, 100, local_sim,
+                       str(tmp_path / 'sweep_parity') + '/', rng=np.random.default_rng(1))
+    for experiment in ('envariance', 'parity'):
+        expected = tree(tmp_path / ('exec_' + experiment))
+        assert len(expected) == 1
+        assert tree(tmp_path / ('sweep_' + experiment)) == expected
+
+    # every execution of a noisy sweep gets its own file in the same layout, under the noisy device
+    noise.parity_sweep(utility_qx5, 5, '10', noise.NoiseModel(readout=0.1), 3, 100,
+                       directory=str(tmp_path / 'noisy') + '/', rng=np.random.default_rng(1))
+    name, = tree(tmp_path / 'exec_parity')
+    assert sorted(tree(tmp_path / 'noisy')) == sorted(
+        name.replace(local_sim, noisy_sim).replace('execution1', 'execution%d' % execution) for execution in (1, 2, 3))
@@ -0,0 +1,94 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+import numpy as np
+import pytest
+
+from count_store import PARITY, CountStore
+from parity_analysis import load_sweep, oracle_target, success_rates, tally
+
+ORACLES = ['00', '10', '11']
+
+QUERIES = [5, 21]
+
+EXECUTIONS = 4
+
+N_QUBITS = 5
+
+
+# a store with noisy count tables of every cell, each learned bit being right with probability 0.8, and a few
+# shots with the result qubit unset
+@pytest.fixture
+def store(tmp_path):
+    rng = np.random.default_rng(3)
+    with CountStore(str(tmp_path / 'store')) as store:
+        for oracle in ORACLES:
+            target = ''.join(str(bit) for bit in oracle_target(oracle, N_QUBITS - 1))
+            for n_queries in QUERIES:
+                for execution in range(1, EXECUTIONS + 1):
+                    counts = dict()
+                    # an odd number of shots with the result qubit set, so that there are no ties
+                    for shot in range(n_queries + int(rng.integers(0, 3))):
+                        result = '1' if shot < n_queries else '0'
+                        bits = ''.join(bit if rng.random() < 0.8 else str(1 - int(bit)) for bit in target)
+                        counts[result + bits] = counts.get(result + bits, 0) + 1
+                    store.put(PARITY, 'dev', oracle, N_QUBITS, n_queries, execution, counts)
+        yield store
+
+
+# tallies and success rates as bit_wise_error.py computed them, one table at a time
+def old_rates(store):
+    tallies = []
+    rates = np.zeros((len(ORACLES), len(QUERIES)))
+    for o, oracle in enumerate(ORACLES):
+        a = ''.join(str(bit) for bit in oracle_target(oracle, N_QUBITS - 1))
+        for q, n_queries in enumerate(QUERIES):
+            correct = 0
+            for execution in range(1, EXECUTIONS + 1):
+                x = ''
+                zeroes = [0 for i in range(N_QUBITS - 1)]
+                ones = [0 for i in range(N_QUBITS - 1)]
+                for k, counts in store.get_strings(PARITY, 'dev', oracle, N_QUBITS, n_queries, execution):
+                    if k[0] != '0':
+                        for n in range(N_QUBITS - 1):
+                            if k[n + 1] == '0':
+                                zeroes[n] += counts
+                            else:
+                                ones[n] += counts
+                for n in range(len(zeroes)):
+                    assert zeroes[n] != ones[n], 'ties are broken at random'
+                    x += '0' if zeroes[n] > ones[n] else '1'
+                if x == a:
+                    correct += 1
+                tallies.append((zeroes, ones))
+            rates[o, q] = correct / EXECUTIONS
+    return tallies, rates
+
+
+def test_matches_old_loop(store):
+    tallies, rates = old_rates(store)
+    values, counts, cells = load_sweep(store, 'dev', ORACLES, N_QUBITS, QUERIES, EXECUTIONS)
+    zeroes, ones = tally(values, counts, cells, len(tallies), N_QUBITS)
+    assert zeroes.tolist() == [zeroes for zeroes, ones in tallies]
+    assert ones.tolist() == [ones for zeroes, ones in tallies]
+    assert success_rates(values, counts, cells, ORACLES, N_QUBITS, QUERIES, EXECUTIONS, seed=1).tolist() == \
+        rates.tolist()
+    assert 0 < rates.min() and rates.max() == 1
@@ -0,0 +1,48 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+import coupling_maps
+import result_cache
+import utility
+from devices import qx5
+
+
+# a cache hit returns the per-shot memory of the job together with its counts, without running a job
+def test_cached_memory(fake_server, monkeypatch, tmp_path):
+    monkeypatch.setattr(utility, 'result_cache', result_cache.ResultCache(str(tmp_path / 'results.db')))
+    qasm = utility.Utility(coupling_maps.qx5).circuit(3, oracle='11', size=16).qasm
+    Q_program = utility.connect(16)
+    memory = ['0x1', '0x3', '0x1', '0x3']
+    utility.cache_counts(Q_program, [qasm], qx5, 4, 1, [{'01': 2, '11': 2}], 'fake-job', [memory])
+    data = utility.run_circuits(qx5, 16, [qasm], 4, 1, 'Cached')
+    assert data == [{'counts': {'01': 2, '11': 2}, 'memory': memory}]
+    assert fake_server.calls['run_job'] == 0
+    assert utility.cached_counts(Q_program, [qasm], qx5, 4, 1) == [{'01': 2, '11': 2}]
+
+
+# jobs without memory are cached and answered with their counts only
+def test_cached_counts_without_memory(fake_server, monkeypatch, tmp_path):
+    monkeypatch.setattr(utility, 'result_cache', result_cache.ResultCache(str(tmp_path / 'results.db')))
+    qasm = utility.Utility(coupling_maps.qx5).circuit(3, oracle='11', size=16).qasm
+    data = utility.run_circuits(qx5, 16, [qasm], 16, 1, 'First')
+    assert fake_server.calls['run_job'] == 1
+    assert utility.run_circuits(qx5, 16, [qasm], 16, 1, 'Second') == data
+    assert fake_server.calls['run_job'] == 1
@@ -0,0 +1,151 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+import random
+import threading
+
+import pytest
+
+import coupling_maps
+import retry
+import utility
+from devices import qx5
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+# delays grow exponentially up to max_delay, jitter only shortens them, and max_attempts failures raise RetryError
+def test_policy():
+    policy = retry.RetryPolicy(max_attempts=4, base=1., factor=2., max_delay=3., jitter=0.5)
+    rng = random.Random(1)
+    for attempt, longest in [(1, 1.), (2, 2.), (3, 3.), (6, 3.)]:
+        assert longest / 2 <= policy.delay(attempt, rng) <= longest
+    clock = Clock()
+    retrier = retry.Retrier(policies={retry.JOB: policy}, threshold=100, sleep=clock.sleep, clock=clock, seed=1)
+    attempts = retrier.attempts()
+    for _ in range(3):
+        retrier.backoff(retry.JOB, attempts, qx5, 'failed')
+    with pytest.raises(retry.RetryError):
+        retrier.backoff(retry.JOB, attempts, qx5, 'failed')
+    assert len(clock.sleeps) == 3
+
+
+# after threshold failures the breaker of a backend stays open for cooldown seconds, a success closes it
+def test_circuit_breaker():
+    clock = Clock()
+    policy = retry.RetryPolicy(max_attempts=None, base=0.1, max_delay=0.1, jitter=0.)
+    retrier = retry.Retrier(policies={retry.CONNECTION: policy}, threshold=3, cooldown=60., sleep=clock.sleep,
+                            clock=clock)
+    attempts = retrier.attempts()
+    assert retrier.delay(retry.CONNECTION, attempts, qx5, 'down') == pytest.approx(0.1)
+    assert retrier.delay(retry.CONNECTION, attempts, qx5, 'down') == pytest.approx(0.1)
+    assert retrier.delay(retry.CONNECTION, attempts, qx5, 'down') == pytest.approx(60.)
+    assert retrier.blocked('ibmqx3') == 0
+    clock.now += 20
+    assert retrier.blocked(qx5) == pytest.approx(40.)
+    retrier.success(qx5)
+    assert retrier.blocked(qx5) == 0
+
+
+# threads sharing a retrier count every failure on the same breaker
+def test_threads():
+    clock = Clock()
+    policy = retry.RetryPolicy(max_attempts=None, base=0.1, max_delay=0.1)
+    retrier = retry.Retrier(policies={retry.FETCH: policy}, threshold=10 ** 6, sleep=clock.sleep, clock=clock)
+
+    def fail():
+        for _ in range(200):
+            retrier.delay(retry.FETCH, retrier.attempts(), qx5, 'down')
+
+    threads = [threading.Thread(target=fail) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert retrier.breaker(qx5).failures == 1600
+
+
+# call() retries the given errors only
+def test_call():
+    clock = Clock()
+    retrier = retry.Retrier(sleep=clock.sleep, clock=clock)
+    results = iter([ConnectionError('down'), ConnectionError('down'), 'done'])
+
+    def flaky():
+        result = next(results)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    assert retrier.call(flaky) == 'done'
+    assert len(clock.sleeps) == 2
+    with pytest.raises(KeyError):
+        retrier.call(lambda: {}['missing'])
+
+
+# connection errors and failed jobs are retried by run_circuits(), a failed job being submitted again
+def test_run_circuits_retries(fake_server):
+    qasm = utility.Utility(coupling_maps.qx5).circuit(3, size=16).qasm
+    fake_server.fail_next(2)
+    data = utility.run_circuits(qx5, 16, [qasm], 16, 1, 'Retried')
+    assert sum(data[0]['counts'].values()) == 16
+    assert fake_server.calls['run_job'] == 1
+
+
+# a bug while fetching the results is raised instead of submitting the job again
+def test_run_circuits_raises_bugs(fake_server, monkeypatch):
+    qasm = utility.Utility(coupling_maps.qx5).circuit(3, size=16).qasm
+
+    def broken(Q_program, job_id):
+        raise KeyError('qasms')
+
+    monkeypatch.setattr(utility, 'fetch_job_data', broken)
+    with pytest.raises(KeyError):
+        utility.run_circuits(qx5, 16, [qasm], 16, 1, 'Broken')
+    assert fake_server.calls['run_job'] == 1
+
+
+# a job failing on the backend is submitted again
+def test_run_circuits_resubmits_failed_jobs(fake_server, monkeypatch):
+    qasm = utility.Utility(coupling_maps.qx5).circuit(3, size=16).qasm
+    fetch_job_data = utility.fetch_job_data
+    failures = [utility.JobError('Job ended with status ERROR')]
+
+    def failing(Q_program, job_id):
+        if failures:
+            raise failures.pop()
+        return fetch_job_data(Q_program, job_id)
+
+    monkeypatch.setattr(utility, 'fetch_job_data', failing)
+    utility.run_circuits(qx5, 16, [qasm], 16, 1, 'Resubmitted')
+    assert fake_server.calls['run_job'] == 2
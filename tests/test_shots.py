@@ -0,0 +1,97 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+from collections import Counter
+
+import numpy as np
+import pytest
+
+import coupling_maps
+import shots
+import utility
+from devices import local_sim, qx5
+from histogram import Histogram
+
+
+def test_slices():
+    assert shots.needed_shots([1, 2, 3]) == 6
+    assert shots.needed_shots([1, 2, 3], shots.PREFIX) == 3
+    assert shots.slices([1, 2, 3]) == [(0, 1), (1, 3), (3, 6)]
+    assert shots.slices([1, 2, 3], shots.PREFIX) == [(0, 1), (0, 2), (0, 3)]
+
+
+# the memory keeps the order of the shots, hex or bitstrings, and every number of queries gets its own slice
+def test_memory():
+    values = shots.memory_values({'01': 2, '11': 1}, ['0x1', '0x3', '0x1'])
+    assert values.tolist() == [1, 3, 1]
+    assert shots.memory_values({'01': 2, '11': 1}, ['01', '11', '01']).tolist() == [1, 3, 1]
+    disjoint = shots.split_counts(values, [1, 2], 2)
+    assert [table.to_dict() for table in disjoint] == [{'01': 1}, {'01': 1, '11': 1}]
+    prefix = shots.split_counts(values, [1, 3], 2, shots.PREFIX)
+    assert [table.to_dict() for table in prefix] == [{'01': 1}, {'01': 2, '11': 1}]
+    with pytest.raises(ValueError):
+        shots.split_counts(values, [2, 2], 2)
+
+
+# without memory the counts are shuffled: the slices add up to the counts of the job
+def test_shuffled_counts():
+    counts = {'000': 500, '101': 300, '111': 200}
+    values = shots.memory_values(counts, generator=np.random.default_rng(1))
+    assert sorted(values.tolist()) == sorted([0] * 500 + [5] * 300 + [7] * 200)
+    tables = shots.split_counts(values, [100, 400, 500], 3)
+    assert tables[0].merge(*tables[1:]).to_dict() == counts
+
+
+def read(filename):
+    with open(filename) as f:
+        return f.read()
+
+
+# the tables of parity_memory_exec() are cut out of the per-shot memory of the fake backend and of the local
+# simulator, in the order of the shots
+@pytest.mark.parametrize('device', [qx5, local_sim])
+def test_memory_exec(fake_server, monkeypatch, tmp_path, device):
+    results = []
+    store_parity_queries = utility.store_parity_queries
+
+    def record(data, *args):
+        results.append(data)
+        store_parity_queries(data, *args)
+
+    monkeypatch.setattr(utility, 'store_parity_queries', record)
+    directory = str(tmp_path / 'memory') + '/'
+    queries = [20, 30, 50]
+    utility_qx5 = utility.Utility(coupling_maps.qx5)
+    utility.parity_memory_exec(1, device, utility_qx5, [3], ['11'], queries, shots.DISJOINT, directory)
+
+    data, = results
+    assert len(data['memory']) == sum(queries)
+    assert Counter(data['memory']) == Counter(hex(int(key, 2)) for key, count in data['counts'].items()
+                                              for shot in range(count))
+    width = len(next(iter(data['counts'])))
+    form = '0%db' % width
+    expected = str(tmp_path / 'expected') + '/'
+    connected = utility_qx5.circuit(3, experiment='parity', oracle='11').connected
+    for (start, end), n_queries in zip(shots.slices(queries), queries):
+        counts = Counter(format(int(shot, 16), form) for shot in data['memory'][start:end])
+        utility.store_parity(Histogram.from_counts(counts, width), 1, device, 3, '11', n_queries, connected, expected)
+        name = '%s/11/execution1/%s_%dqueries_11_3_qubits_parity.txt' % (device, device, n_queries)
+        assert read(directory + name) == read(expected + name)
@@ -0,0 +1,90 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+import numpy as np
+import pytest
+
+import circuits
+import coupling_maps
+import stabilizer
+import utility
+from fake_ibmqx import statevector_sampler
+
+SHOTS = 8192
+
+
+# total variation distance of two count tables of the same number of shots
+def distance(first, second):
+    return sum(abs(first.get(key, 0) - second.get(key, 0)) for key in set(first) | set(second)) / (2 * SHOTS)
+
+
+def compare(circuit, seed):
+    stabilizer_counts = stabilizer.sampler(circuit, SHOTS, np.random.default_rng(seed))
+    statevector_counts = statevector_sampler(circuit, SHOTS, np.random.default_rng(seed))
+    assert set(stabilizer_counts) == set(statevector_counts)
+    assert distance(stabilizer_counts, statevector_counts) < 0.08
+
+
+# random Clifford circuits, measured at the end, sample the distribution of their state vector
+@pytest.mark.parametrize('seed', range(10))
+def test_random_clifford(seed):
+    rng = np.random.default_rng(seed)
+    quantum_r = circuits.Register('qr', 5)
+    classical_r = circuits.Register('cr', 5)
+    circuit = circuits.Circuit('random', quantum_r, classical_r)
+    for _ in range(40):
+        gate = rng.choice(['h', 's', 'sdg', 'x', 'y', 'z', 'iden', 'cx', 'cx'])
+        if gate == 'cx':
+            control, target = rng.choice(5, size=2, replace=False)
+            circuit.cx(quantum_r[int(control)], quantum_r[int(target)])
+        else:
+            getattr(circuit, gate)(quantum_r[int(rng.integers(5))])
+    for qubit in rng.permutation(5):
+        circuit.measure(quantum_r[int(qubit)], classical_r[int(4 - qubit)])
+    compare(circuit, seed)
+
+
+# the circuits of the experiments sample the same counts as on the state vector
+@pytest.mark.parametrize('experiment, oracle', [('envariance', None), ('parity', '11'), ('parity', '10'),
+                                                ('parity', '00')])
+def test_experiments(experiment, oracle):
+    utility_qx4 = utility.Utility(coupling_maps.qx4)
+    for n_qubits in range(2, 6):
+        cached = utility_qx4.circuit(n_qubits, experiment=experiment, oracle=oracle)
+        compare(circuits.from_qasm(cached.qasm), n_qubits)
+
+
+# envariance circuits of hundreds of qubits give two outcomes, reproducibly with a seeded generator
+def test_hundreds_of_qubits():
+    chain = {qubit: [qubit + 1] for qubit in range(299)}
+    chain[299] = []
+    cached = utility.Utility(chain).circuit(300, experiment='envariance')
+    counts = stabilizer.run_qasm(cached.qasm, 1000, np.random.default_rng(1))
+    assert sum(counts.values()) == 1000 and len(counts) == 2
+    assert all(len(key) == 300 for key in counts)
+    assert counts == stabilizer.run_qasm(cached.qasm, 1000, np.random.default_rng(1))
+
+
+def test_unsupported_gate():
+    circuit = circuits.from_qasm(utility.Utility(coupling_maps.qx4).circuit(2).qasm)
+    circuit.ops.insert(0, ('t', (0,)))
+    with pytest.raises(ValueError):
+        stabilizer.simulate(circuit)
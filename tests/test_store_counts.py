@@ -0,0 +1,95 @@
+# Copyright 2017 Quantum Information Science, University of Parma, Italy. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =============================================================================
+
+__author__ = "Davide Ferrari"
+__copyright__ = "Copyright 2017, Quantum Information Science, University of Parma, Italy"
+__license__ = "Apache"
+__version__ = "2.0"
+__email__ = "davide.ferrari8@studenti.unipr.it"
+
+import os
+
+import utility
+from count_store import ENVARIANCE, PARITY, CountStore, import_parity
+from devices import local_sim
+from histogram import Histogram
+
+
+def read_counts(filename):
+    with open(filename, 'r') as in_f:
+        lines = in_f.read().splitlines()
+    assert lines[:2] == ['VALUES\t\tCOUNTS', '']
+    return [(value, int(count)) for value, count in (line.split('\t') for line in lines[2:])]
+
+
+# envariance results list the second half of connected and then the first one, by decreasing count, equal counts
+# keeping their order in the result; the count store gets the same table
+def test_store_envariance(tmp_path):
+    counts = {'00110': 2, '00011': 7, '00101': 2, '00000': 1}
+    connected = [0, 2, 1]
+    directory = str(tmp_path) + '/'
+    with CountStore(str(tmp_path / 'store')) as store:
+        utility.store_envariance(counts, 1, 'dev', 3, 12, connected, directory, store)
+        table = store.get_histogram(ENVARIANCE, 'dev', None, 3, 12, 1)
+    written = read_counts(directory + 'dev/execution1/dev_12_3_qubits_envariance.txt')
+    assert written == [('011', 7), ('110', 2), ('101', 2), ('000', 1)]
+    assert table.to_dict() == dict(written)
+
+
+# a Histogram of the register is written as the dict of its outcomes, equal counts by increasing outcome
+def test_store_parity_histogram(tmp_path):
+    counts = {'0011': 2, '0110': 5, '0101': 2}
+    connected = [1, 0, 2]
+    directory = str(tmp_path) + '/'
+    utility.store_parity(Histogram.from_counts(counts), 1, 'dev', 3, '11', 9, connected, directory + 'h/')
+    utility.store_parity(counts, 1, 'dev', 3, '11', 9, connected, directory + 'd/')
+    path = 'dev/11/execution1/dev_9queries_11_3_qubits_parity.txt'
+    from_histogram = read_counts(directory + 'h/' + path)
+    assert from_histogram[0] == ('101', 5)
+    assert sorted(from_histogram) == sorted(read_counts(directory + 'd/' + path))
+    assert [value for value, count in from_histogram[1:]] == ['011', '110']
+
+
+# circuits wider than a packed outcome run on the local simulator and are written to the txt files
+def test_wide_local_sim(tmp_path):
+    chain = {qubit: [qubit + 1] for qubit in range(99)}
+    chain[99] = []
+    utility_chain = utility.Utility(chain)
+    directory = str(tmp_path) + '/'
+    utility.envariance_exec(1, local_sim, utility_chain, 100, num_shots=64, directory=directory)
+    written = read_counts(directory + local_sim + '/execution1/' + local_sim + '_64_100_qubits_envariance.txt')
+    assert sum(count for value, count in written) == 64
+    assert all(len(value) == 100 for value, count in written)
+    utility.parity_exec(1, local_sim, utility_chain, 100, oracle='11', num_shots=64, directory=directory)
+    assert os.path.isdir(directory + local_sim + '/11/execution1')
+
+
+# importing a data tree twice, even from a reopened store, appends nothing the second time
+def test_import_twice(tmp_path):
+    directory = str(tmp_path / 'Data_Parity') + '/'
+    for execution in (1, 2):
+        utility.store_parity({'0111': 3, '0101': 1}, execution, 'dev', 3, '11', 4, [0, 1, 2], directory)
+    with CountStore(str(tmp_path / 'store')) as store:
+        assert import_parity(store, directory) == 2
+        assert import_parity(store, directory) == 0
+    size = os.path.getsize(str(tmp_path / 'store' / 'dev.counts'))
+    utility.store_parity({'0111': 4}, 3, 'dev', 3, '11', 4, [0, 1, 2], directory)
+    with CountStore(str(tmp_path / 'store')) as store:
+        assert import_parity(store, directory) == 1
+        assert len(store) == 3
+        assert store.get_histogram(PARITY, 'dev', '11', 3, 4, 1).to_dict() == {'111': 3, '101': 1}
+    with open(str(tmp_path / 'store' / 'dev.index')) as index_f:
+        assert len(index_f.readlines()) == 3
+    assert os.path.getsize(str(tmp_path / 'store' / 'dev.counts')) > size
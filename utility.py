@@ -20,29 +20,168 @@ __version__ = "2.0"
 __email__ = "davide.ferrari8@studenti.unipr.it"
 
 import os
-from time import sleep
+from time import sleep, time
 from devices import *
 import logging
 import myLogger
 import operator
+import count_store
+import circuits
+import stabilizer
+import shots
+from histogram import Histogram, to_strings
+import retry
+from result_cache import result_key
+import hashlib
+import json
+import numpy as np
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
 
 import sys
 
 sys.path.append(  # solve the relative dependencies if you clone QISKit from the Git repo and use like a global.
     "../qiskit-sdk-py")
 
-from qiskit import QuantumProgram
-import Qconfig
+# QuantumProgram and Qconfig are replaced by fake_ibmqx.install() to run offline
+try:
+    from qiskit import QuantumProgram
+except ImportError:
+    QuantumProgram = None
+try:
+    import Qconfig
+except ImportError:
+    Qconfig = None
 
 logger = logging.getLogger('utility')
 logger.addHandler(myLogger.MyHandler())
 logger.setLevel(logging.CRITICAL)
 logger.propagate = False
 
+# seconds to wait while a backend is offline and while credits replenish
+OFFLINE_WAIT = 1800
+
+CREDITS_WAIT = 900
+
+# seconds between two polls of a submitted job
+JOB_WAIT = 30
+
+# set to a result_cache.ResultCache to answer repeat jobs from the counts of previous runs
+result_cache = None
+
+# set to a credits.CreditManager to admit jobs against a local model of the credits,
+# instead of asking them to the API before every job
+credit_manager = None
+
+# set to a backend_monitor.MonitorPool to share the status of every backend among the executors
+# and resume as soon as it comes back online, instead of polling it from every job
+monitors = None
+
+# set to a session.SessionPool to authenticate once and reuse the same QuantumProgram for every job
+sessions = None
+
+# retry policies and circuit breakers of the executors, replace it with a retry.Retrier with other policies
+retrier = retry.Retrier()
+
+
+# GHZ layouts: 'path' grows the CNOT tree breadth-first from the most connected qubit (create_path()),
+# 'tree' picks root and tree for every number of qubits to minimize CNOT layers and inverse-CNOTs (create_tree())
+PATH = 'path'
+
+TREE = 'tree'
+
+# candidate roots tried by create_tree(), the highest ranked ones on larger maps
+MAX_ROOTS = 64
+
+# prebuilt circuit: recorded gates, QASM source and qubit ordering returned by envariance() or parity(),
+# stats are the circuits.Stats of the gates before and after circuits.optimize()
+CachedCircuit = namedtuple('CachedCircuit', ['ops', 'qasm', 'connected', 'stats'])
+
+
+# signature of a coupling map, layout and optimization, used to tell whether a cached circuit was built on them
+def map_signature(coupling_map, layout=PATH, optimize=True):
+    plain = sorted((int(node), sorted(int(target) for target in coupling_map[node])) for node in coupling_map)
+    return hashlib.sha1(json.dumps([layout, optimize, plain]).encode()).hexdigest()
+
+
+# nodes reachable from every node of graph through paths of one or more edges, as bitsets over
+# the positions of nodes; strongly connected components are found with an iterative Tarjan visit,
+# which yields them sinks first, so that every component can OR the closures of its successors
+def reachability(graph, nodes=None):
+    if nodes is None:
+        nodes = list(graph)
+    index = {node: i for i, node in enumerate(nodes)}
+    successors = [[index[next] for next in graph[node]] for node in nodes]
+    n = len(nodes)
+    order = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    component = [-1] * n
+    members = []
+    tarjan_stack = []
+    counter = 0
+    for root in range(n):
+        if order[root] != -1:
+            continue
+        order[root] = low[root] = counter
+        counter += 1
+        tarjan_stack.append(root)
+        on_stack[root] = True
+        stack = [(root, iter(successors[root]))]
+        while stack:
+            node, targets = stack[-1]
+            for target in targets:
+                if order[target] == -1:
+                    order[target] = low[target] = counter
+                    counter += 1
+                    tarjan_stack.append(target)
+                    on_stack[target] = True
+                    stack.append((target, iter(successors[target])))
+                    break
+                elif on_stack[target]:
+                    low[node] = min(low[node], order[target])
+            else:
+                stack.pop()
+                if stack:
+                    parent = stack[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == order[node]:
+                    c = len(members)
+                    group = []
+                    while True:
+                        member = tarjan_stack.pop()
+                        on_stack[member] = False
+                        component[member] = c
+                        group.append(member)
+                        if member == node:
+                            break
+                    members.append(group)
+    # components are numbered sinks first, so every edge leaving a component points to a lower number
+    bits = []
+    closures = []
+    for c, group in enumerate(members):
+        own = 0
+        for member in group:
+            own |= 1 << member
+        closure = 0
+        cyclic = len(group) > 1
+        for member in group:
+            for target in successors[member]:
+                d = component[target]
+                if d == c:
+                    cyclic = True
+                else:
+                    closure |= bits[d] | closures[d]
+        if cyclic:
+            closure |= own
+        bits.append(own)
+        closures.append(closure)
+    return {node: closures[component[i]] for i, node in enumerate(nodes)}
+
 
 class Utility(object):
 
-    def __init__(self, coupling_map):
+    def __init__(self, coupling_map, cache_size=128, cache_file=None, layout=PATH, optimize=True):
         self.__coupling_map = dict()
         self.__inverse_coupling_map = dict()
         self.__plain_map = dict()
@@ -51,8 +190,26 @@ class Utility(object):
         self.__ranks = dict()
         self.__connected = dict()
         self.__most_connected = []
+        self.__layout = layout
+        self.__optimize = optimize
+        self.__trees = dict()
+        self.__signature = None
+        self.__cache = OrderedDict()
+        self.__cache_size = cache_size
+        self.__cache_file = cache_file
+        self.set_coupling_map(coupling_map)
+        if cache_file is not None and os.path.isfile(cache_file):
+            self.load_cache(cache_file)
+
+    # (re)build ranks and path on the given coupling map, cached circuits built on another map are dropped
+    def set_coupling_map(self, coupling_map):
         if coupling_map:
             self.__coupling_map = coupling_map.copy()
+            self.__inverse_coupling_map = dict()
+            self.__plain_map = dict()
+            self.__path = dict()
+            self.__ranks = dict()
+            self.__trees = dict()
             logger.log(logging.DEBUG, 'init() - coupling_map:\n%s', str(self.__coupling_map))
             self.invert_graph(coupling_map, self.__inverse_coupling_map)
             logger.log(logging.DEBUG, 'init() - inverse coupling map:\n%s', str(self.__inverse_coupling_map))
@@ -62,33 +219,116 @@ class Utility(object):
             self.start_explore(self.__coupling_map, self.__ranks)
             self.__most_connected = self.find_max(self.__ranks)
             self.create_path(self.__most_connected[0], plain_map=self.__plain_map)
+            signature = map_signature(coupling_map, self.__layout, self.__optimize)
+            if signature != self.__signature:
+                self.__cache.clear()
+            self.__signature = signature
         else:
             logger.critical('init() - Null argument: coupling_map')
             exit(1)
 
     def close(self):
+        if self.__cache_file is not None:
+            self.save_cache(self.__cache_file)
         self.__ranks.clear()
         self.__inverse_coupling_map.clear()
         self.__coupling_map.clear()
         self.__path.clear()
         self.__most_connected.clear()
-
-    def explore(self, source, visiting, visited, ranks):
-        for next in self.__coupling_map[visiting]:
-            if next not in visited[source]:
-                visited[source].append(next)
-                if next not in ranks:
-                    ranks.update({next: 0})
-                ranks[next] = ranks[next] + 1
-                self.explore(source, next, visited, ranks)
-
-    # TODO Try using some sort of centrality algorithm
-
+        self.__trees.clear()
+        self.__cache.clear()
+
+    # return the prebuilt circuit for the given experiment ('envariance' or 'parity'), building it if needed
+    # and passing it through circuits.optimize() unless disabled in the constructor;
+    # size is the size of the registers, the number of qubits of the coupling map by default
+    def circuit(self, n_qubits, experiment='parity', oracle='11', size=None):
+        if size is None:
+            size = len(self.__coupling_map)
+        if experiment == 'envariance':
+            oracle = None
+        key = (size, n_qubits, experiment, oracle)
+        if key in self.__cache:
+            self.__cache.move_to_end(key)
+            return self.__cache[key]
+        quantum_r = circuits.Register('qr', size)
+        classical_r = circuits.Register('cr', size)
+        circuit = circuits.Circuit(experiment, quantum_r, classical_r)
+        if experiment == 'envariance':
+            connected = self.envariance(circuit, quantum_r, classical_r, n_qubits)
+        else:
+            connected = self.parity(circuit, quantum_r, classical_r, n_qubits, oracle=oracle)
+        before = circuits.stats(circuit.ops)
+        if self.__optimize:
+            circuit.ops = circuits.optimize(circuit.ops)
+        after = circuits.stats(circuit.ops)
+        logger.info('circuit() - %s: %d gates, depth %d -> %d gates, depth %d', str(key), before.gates, before.depth,
+                    after.gates, after.depth)
+        cached = CachedCircuit(circuit.ops, circuit.qasm(), list(connected), (before, after))
+        self.__cache[key] = cached
+        if len(self.__cache) > self.__cache_size:
+            self.__cache.popitem(last=False)
+        logger.debug('circuit() - built %s', str(key))
+        return cached
+
+    # write cached circuits to a json file, together with the signature of the coupling map they were built on
+    def save_cache(self, filename):
+        entries = []
+        if os.path.isfile(filename):
+            with open(filename, 'r') as cache_f:
+                entries = [entry for entry in json.load(cache_f) if entry['signature'] != self.__signature]
+        for (size, n_qubits, experiment, oracle), cached in self.__cache.items():
+            entries.append({'signature': self.__signature, 'size': size, 'n_qubits': n_qubits,
+                            'experiment': experiment, 'oracle': oracle, 'ops': cached.ops, 'qasm': cached.qasm,
+                            'connected': cached.connected, 'stats': cached.stats})
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        with open(filename + '.tmp', 'w') as cache_f:
+            json.dump(entries, cache_f)
+        os.replace(filename + '.tmp', filename)
+
+    # read cached circuits from a json file, ignoring the ones built on another coupling map
+    def load_cache(self, filename):
+        with open(filename, 'r') as cache_f:
+            entries = json.load(cache_f)
+        for entry in entries:
+            if entry['signature'] != self.__signature:
+                continue
+            ops = [(gate, tuple(args)) for gate, args in entry['ops']]
+            key = (entry['size'], entry['n_qubits'], entry['experiment'], entry['oracle'])
+            stats = tuple(circuits.Stats(*entry_stats) for entry_stats in entry['stats'])
+            self.__cache[key] = CachedCircuit(ops, entry['qasm'], entry['connected'], stats)
+            if len(self.__cache) > self.__cache_size:
+                self.__cache.popitem(last=False)
+
+    # rank every node with the number of nodes that can reach it through directed paths, as an iterative
+    # transitive closure over integer bitsets; nodes are inserted in ranks in the order a depth-first visit
+    # from every source (in the order of graph) first reaches them, so that ties are broken as before
     def start_explore(self, graph, ranks):
-        visited = dict()
-        for source in graph:
-            visited.update({source: []})
-            self.explore(source, source, visited, ranks)
+        nodes = list(graph)
+        reach = reachability(graph, nodes)
+        inverse_graph = dict()
+        self.invert_graph(graph, inverse_graph)
+        reached_by = reachability(inverse_graph, nodes)
+        index = {node: i for i, node in enumerate(nodes)}
+        ordered = 0
+        for source in nodes:
+            if reach[source] & ~ordered == 0:
+                continue
+            # depth-first visit of source, skipping the subtrees that cannot reach new nodes
+            visited = 0
+            stack = [iter(graph[source])]
+            while stack:
+                for next in stack[-1]:
+                    bit = 1 << index[next]
+                    if visited & bit or (ordered & bit and reach[next] & ~ordered == 0):
+                        continue
+                    visited |= bit
+                    if not ordered & bit:
+                        ordered |= bit
+                        ranks.update({next: bin(reached_by[next]).count('1')})
+                    stack.append(iter(graph[next]))
+                    break
+                else:
+                    stack.pop()
 
     # create an inverted coupling-map for further use
     @staticmethod
@@ -118,6 +358,7 @@ class Utility(object):
     def create_path(self, start, plain_map):
         self.__path.update({start: -1})
         to_connect = [start]
+        queued = {start}
         max = len(self.__coupling_map)
         logger.debug('create_path() - max:\n%s', str(max))
         count = max - 1
@@ -134,12 +375,104 @@ class Utility(object):
                 if node not in self.__path:
                     self.__path.update({node: to_connect[visiting]})
                     count -= 1
-                    logger.debug('create_path() - path:\n%s', str(self.__path))
-                    if node not in to_connect:
+                    logger.debug('create_path() - path:\n%s', self.__path)
+                    if node not in queued:
+                        queued.add(node)
                         to_connect.append(node)
             visiting += 1
         logger.debug('create_path() - path:\n%s', str(self.__path))
 
+    # GHZ tree on n_qubits qubits as a path-like dict (node: parent, root first with -1) in the order nodes
+    # join the tree; trees are grown in layers, where every node already in the tree adds at most one neighbour,
+    # from the highest ranked roots; every candidate is scored on the circuit create() builds on it with x and
+    # oracle, after circuits.optimize() unless disabled in the constructor, and the shallowest one, then the one
+    # with fewer gates, is kept among those no deeper and with no more gates than the tree of create_path(),
+    # which is a candidate too, so the result is never worse
+    def create_tree(self, n_qubits, plain_map, x=True, oracle='11'):
+        key = (n_qubits, x, oracle)
+        if key in self.__trees:
+            return self.__trees[key]
+        path = dict(list(self.__path.items())[:n_qubits])
+        candidates = {tuple(path.items()): path}
+        roots = sorted(plain_map, key=lambda node: -self.__ranks.get(node, 0))[:MAX_ROOTS]
+        for root in roots:
+            for direct_only in (True, False):
+                tree = self.grow_tree(root, n_qubits, plain_map, direct_only)
+                if len(tree) == n_qubits:
+                    candidates.setdefault(tuple(tree.items()), tree)
+        costs = {candidate: self.layout_stats(tree, n_qubits, x, oracle) for candidate, tree in candidates.items()}
+        limit = costs[tuple(path.items())]
+        best = min((candidate for candidate, cost in costs.items()
+                    if cost.depth <= limit.depth and cost.gates <= limit.gates),
+                   key=lambda candidate: (costs[candidate].depth, costs[candidate].gates,
+                                          self.tree_cost(candidates[candidate])))
+        logger.debug('create_tree() - %s: %s - tree:\n%s', str(key), str(costs[best]), str(candidates[best]))
+        self.__trees[key] = candidates[best]
+        return candidates[best]
+
+    # circuits.Stats of the circuit create() builds on tree, after circuits.optimize() unless disabled
+    def layout_stats(self, tree, n_qubits, x=True, oracle='11'):
+        size = len(self.__coupling_map)
+        quantum_r = circuits.Register('qr', size)
+        classical_r = circuits.Register('cr', size)
+        circuit = circuits.Circuit('layout', quantum_r, classical_r)
+        self.place(circuit, quantum_r, classical_r, tree, n_qubits, x=x, oracle=oracle)
+        self.__connected.clear()
+        return circuits.stats(circuits.optimize(circuit.ops) if self.__optimize else circuit.ops)
+
+    # depth of the CNOT stage place_cx() builds on tree, with as soon as possible scheduling,
+    # and number of inverse-CNOTs
+    def tree_cost(self, tree):
+        levels = dict()
+        inverse = 0
+        for child, parent in tree.items():
+            if parent == -1:
+                continue
+            level = max(levels.get(child, 0), levels.get(parent, 0))
+            if parent in self.__coupling_map[child]:
+                level += 1
+            else:
+                level += 3
+                inverse += 1
+            levels[child] = levels[parent] = level
+        return max(levels.values(), default=0), inverse
+
+    # grow a tree from root one layer at a time; with direct_only inverse-CNOTs are used only in layers where
+    # no direct CNOT can add a node, nodes with fewer choices pick first
+    def grow_tree(self, root, n_qubits, plain_map, direct_only=True):
+        tree = {root: -1}
+        # nodes of the tree that may still have neighbours out of it
+        frontier = [root]
+        while len(tree) < n_qubits:
+            layer = []
+            frontier = [node for node in frontier if any(next not in tree for next in plain_map[node])]
+            for allow_inverse in ((False, True) if direct_only else (True,)):
+                options = dict()
+                for parent in frontier:
+                    options[parent] = [node for node in plain_map[parent] if node not in tree
+                                       and (allow_inverse or parent in self.__coupling_map[node])]
+                claimed = set()
+                for parent in sorted(frontier, key=lambda node: len(options[node])):
+                    if len(tree) + len(layer) >= n_qubits:
+                        break
+                    choices = [node for node in options[parent] if node not in claimed]
+                    if not choices:
+                        continue
+                    # direct CNOTs first, then the node with more neighbours still to reach
+                    child = min(choices, key=lambda node: (parent not in self.__coupling_map[node],
+                                                           -sum(1 for next in plain_map[node]
+                                                                if next not in tree and next not in claimed)))
+                    claimed.add(child)
+                    layer.append((child, parent))
+                if layer:
+                    break
+            if not layer:
+                break
+            for child, parent in layer:
+                tree.update({child: parent})
+                frontier.append(child)
+        return tree
+
     def cx(self, circuit, control_qubit, target_qubit, control, target):
         if target in self.__coupling_map[control]:
             logger.log(logging.VERBOSE, 'cx() - cnot: (%s, %s)', str(control), str(target))
@@ -225,16 +558,25 @@ class Utility(object):
             logger.critical('create() - Can use only up to %s qubits', str(max_qubits))
             exit(2)
 
-        count = self.__n_qubits
-        for qubit in self.__path:
+        path = self.__path
+        if self.__layout == TREE:
+            path = self.create_tree(self.__n_qubits, self.__plain_map, x=x, oracle=oracle)
+        self.place(circuit, quantum_r, classical_r, path, self.__n_qubits, x=x, oracle=oracle)
+
+    # place the gates of the circuit on the first n_qubits nodes of path
+    def place(self, circuit, quantum_r, classical_r, path, n_qubits, x=True, oracle='11'):
+        start = next(iter(path))
+
+        count = n_qubits
+        for qubit in path:
             if count <= 0:
                 break
-            self.__connected.update({qubit: self.__path[qubit]})
+            self.__connected.update({qubit: path[qubit]})
             count -= 1
         logger.debug('create() - connected:\n%s', str(self.__connected))
-        self.place_h(circuit, self.__most_connected[0], quantum_r, x=x)
+        self.place_h(circuit, start, quantum_r, x=x)
         self.place_cx(circuit, quantum_r, oracle=oracle)
-        self.place_h(circuit, self.__most_connected[0], quantum_r, initial=False)
+        self.place_h(circuit, start, quantum_r, initial=False)
         if x is True:
             self.place_x(circuit, quantum_r)
         self.measure(circuit, quantum_r, classical_r)
@@ -257,14 +599,9 @@ class Utility(object):
         return connected
 
 
-# launch envariance experiment on the given device
-def envariance_exec(execution, device, utility, n_qubits, num_shots=1024, directory='Data_Envariance/'):
-    os.makedirs(os.path.dirname(directory), exist_ok=True)
-
+# size of the registers to use on the given device
+def device_size(device, n_qubits):
     size = 0
-
-    results = dict()
-
     if device == qx2 or device == qx4:
         if n_qubits <= 5:
             size = 5
@@ -287,30 +624,38 @@ def envariance_exec(execution, device, utility, n_qubits, num_shots=1024, direct
     else:
         logger.critical('launch_exp() - Unknown device.')
         exit(3)
+    return size
 
-    Q_program = QuantumProgram()
-
-    try:
-        Q_program.set_api(Qconfig.APItoken, Qconfig.config["url"])  # set the APIToken and API url
-    except ConnectionError:
-        sleep(900)
-        logger.critical('API Exception occurred, retrying\nQubits %d - Execution %d - Shots %d', n_qubits, execution,
-                        num_shots)
-        envariance_exec(execution, device, utility, n_qubits=n_qubits, num_shots=num_shots, directory=directory)
-        return
 
-    quantum_r = Q_program.create_quantum_register("qr", size)
+# largest number of qubits of an experiment on the given device (see device_size()), None if not limited
+def device_capacity(device):
+    if device == qx2 or device == qx4:
+        return 5
+    elif device == qx3 or device == qx5 or device == online_sim:
+        return 16
+    return None
 
-    classical_r = Q_program.create_classical_register("cr", size)
 
-    circuit = Q_program.create_circuit("envariance", [quantum_r], [classical_r])
+# authenticated QuantumProgram for registers of the given size, a new one unless there is a session pool
+def connect(size):
+    if sessions is not None:
+        return sessions.get(size)
+    return authenticate()
 
-    connected = utility.envariance(circuit=circuit, quantum_r=quantum_r, classical_r=classical_r, n_qubits=n_qubits)
 
-    QASM_source = Q_program.get_qasm("envariance")
+# new authenticated QuantumProgram, e.g. for a backend_monitor.MonitorPool
+def authenticate():
+    Q_program = QuantumProgram()
+    Q_program.set_api(Qconfig.APItoken, Qconfig.config["url"])  # set the APIToken and API url
+    return Q_program
 
-    logger.debug('launch_exp() - QASM:\n%s', str(QASM_source))
 
+# wait until the given device is online
+def wait_backend(Q_program, device):
+    if monitors is not None:
+        monitors.get(device).wait()
+        return
+    attempts = retrier.attempts()
     while True:
         try:
             backend_status = Q_program.get_backend_status(device)
@@ -318,201 +663,440 @@ def envariance_exec(execution, device, utility, n_qubits, num_shots=1024, direct
                     or ('busy' in backend_status and backend_status['busy'] is True):
                 logger.critical('%s currently offline, waiting...', device)
                 while Q_program.get_backend_status(device)['available'] is False:
-                    sleep(1800)
+                    sleep(OFFLINE_WAIT)
                 logger.critical('%s is back online, resuming execution', device)
-        except ConnectionError:
-            logger.critical('Error getting backend status, retrying...')
-            sleep(900)
+        except ConnectionError as e:
+            retrier.backoff(retry.CONNECTION, attempts, device, e, 'Backend status')
             continue
-        except ValueError:
-            logger.critical('Backend is not available, waiting...')
-            sleep(900)
+        except ValueError as e:
+            retrier.backoff(retry.UNAVAILABLE, attempts, device, e, 'Backend status')
             continue
         break
 
+
+# wait until at least 3 credits are available, description tells which experiment is waiting;
+# with a credit_manager, wait until the job is admitted on device and return its ticket
+def wait_credits(Q_program, description, device=None, priority=0):
+    if credit_manager is not None:
+        return credit_manager.acquire(Q_program, device, priority, description)
     if Q_program.get_api().get_my_credits()['remaining'] < 3:
-        logger.critical('Qubits %d - Execution %d - Shots %d ---- Waiting for credits to replenish...',
-                        n_qubits, execution, num_shots)
+        logger.critical('%s ---- Waiting for credits to replenish...', description)
         while Q_program.get_api().get_my_credits()['remaining'] < 3:
-            sleep(900)
+            sleep(CREDITS_WAIT)
         logger.critical('Credits replenished, resuming execution')
 
-    try:
-        result = Q_program.execute(["envariance"], backend=device, wait=2, timeout=1000, shots=num_shots, max_credits=5)
-    except Exception:
-        sleep(900)
-        logger.critical('Exception occurred, retrying\nQubits %d - Execution %d - Shots %d', n_qubits, execution,
-                        num_shots)
-        envariance_exec(execution, device, utility, n_qubits=n_qubits, num_shots=num_shots, directory=directory)
-        return
 
-    try:
-        counts = result.get_counts("envariance")
-    except Exception:
-        logger.critical('Exception occurred, retrying\nQubits %d - Execution %d - Shots %d', n_qubits, execution,
-                        num_shots)
-        envariance_exec(execution, device, utility, n_qubits=n_qubits, num_shots=num_shots, directory=directory)
+# give back to the credit_manager the credits of a job admitted by wait_credits() once it is done, or
+# if it failed (the balance is then synced again, since the job may or may not have spent them)
+def release_credits(ticket, submitted=True):
+    if credit_manager is None or ticket is None:
+        return
+    credit_manager.release(ticket, submitted)
+    if not submitted:
+        credit_manager.invalidate()
+
+
+# a job on device failed or could not be submitted: give its credits back and make the next job
+# ask the status of device again, since the cached one may be stale, and authenticate again
+def job_failed(device, ticket):
+    release_credits(ticket, submitted=False)
+    if monitors is not None:
+        monitors.invalidate(device)
+    if sessions is not None:
+        sessions.invalidate()
+
+
+class JobError(Exception):
+    pass
+
+
+# counts of the given circuits from result_cache, None unless every one of them is cached for execution
+def cached_counts(Q_program, qasms, device, num_shots, execution):
+    data = cached_data(Q_program, qasms, device, num_shots, execution)
+    return None if data is None else [circuit_data['counts'] for circuit_data in data]
+
+
+# result data of the given circuits from result_cache (counts, and memory if the job returned it, as
+# fetch_job_data()), None unless every one of them is cached for execution
+def cached_data(Q_program, qasms, device, num_shots, execution):
+    if result_cache is None:
+        return None
+    epoch = result_cache.epoch(Q_program, device)
+    entries = [result_cache.get(result_key(qasm, device, num_shots, epoch), execution, with_metadata=True)
+               for qasm in qasms]
+    if any(entry is None for entry in entries):
+        return None
+    logger.info('Execution %d - Shots %d on %s answered from the result cache', execution, num_shots, device)
+    data = []
+    for counts, metadata in entries:
+        data.append({'counts': counts})
+        if metadata.get('memory') is not None:
+            data[-1]['memory'] = metadata['memory']
+    return data
+
+
+# record the counts of the given circuits in result_cache, together with their memory if given
+def cache_counts(Q_program, qasms, device, num_shots, execution, counts, job_id=None, memories=None):
+    if result_cache is None:
         return
+    epoch = result_cache.epoch(Q_program, device)
+    if memories is None:
+        memories = [None] * len(qasms)
+    for position, (qasm, circuit_counts, memory) in enumerate(zip(qasms, counts, memories)):
+        metadata = {'job_id': job_id, 'position': position, 'time': time()}
+        if memory is not None:
+            metadata['memory'] = memory
+        result_cache.put(result_key(qasm, device, num_shots, epoch), execution, device, num_shots, epoch,
+                         circuit_counts, metadata)
+
+
+# submit the given circuits of Q_program as a single job without waiting for it, return the job id;
+# QASM sources are taken from qasms when given (e.g. from Utility.circuit()) instead of Q_program;
+# if memory is True the job asks the backend to keep the outcome of every shot, when the API client supports it
+def submit_job(Q_program, names, device, num_shots, max_credits=5, qasms=None, memory=False):
+    if qasms is None:
+        qasms = [Q_program.get_qasm(name) for name in names]
+    qasms = [{'qasm': qasm} for qasm in qasms]
+    api = Q_program.get_api()
+    job = None
+    if memory:
+        try:
+            job = api.run_job(qasms, device, num_shots, max_credits, memory=True)
+        except TypeError:
+            logger.warning('submit_job() - the API client cannot keep the per-shot memory of jobs')
+    if job is None:
+        job = api.run_job(qasms, device, num_shots, max_credits)
+    if 'error' in job or 'id' not in job:
+        raise JobError('Cannot submit job: %s' % str(job.get('error', job)))
+    logger.debug('submit_job() - %s submitted on %s', job['id'], device)
+    return job['id']
+
+
+# return the result data of every circuit of a job (counts, and memory if the backend keeps the outcome of every
+# shot), or None if the job is not done yet
+def fetch_job_data(Q_program, job_id):
+    job = Q_program.get_api().get_job(job_id)
+    if 'error' in job:
+        raise JobError('Cannot get job %s: %s' % (job_id, str(job['error'])))
+    status = job.get('status')
+    if status == 'COMPLETED':
+        return [qasm['result']['data'] for qasm in job['qasms']]
+    elif status in ('RUNNING', 'QUEUED', 'VALIDATING'):
+        return None
+    raise JobError('Job %s ended with status %s' % (job_id, str(status)))
+
+
+# return the counts of every circuit of a job, or None if the job is not done yet
+def fetch_job(Q_program, job_id):
+    data = fetch_job_data(Q_program, job_id)
+    return None if data is None else [circuit_data['counts'] for circuit_data in data]
+
+
+# qubits of a result in logical order, from the leftmost character: envariance results list the second half of
+# connected and then the first one, parity results the first qubit and then the two halves interleaved;
+# compiled once for every circuit
+@lru_cache(maxsize=None)
+def logical_order(experiment, n_qubits, connected):
+    stop = n_qubits // 2
+    if experiment == 'envariance':
+        return tuple(connected[n + stop] for n in range(n_qubits - stop)) + tuple(connected[n] for n in range(stop))
+    order = [connected[0]]
+    for n in range(stop):
+        order.append(connected[n + 1])
+        if (n + stop + 1) != n_qubits:
+            order.append(connected[n + stop + 1])
+    return tuple(order)
+
+
+# columns of the counts keys of the given width holding the qubits of logical_order()
+@lru_cache(maxsize=None)
+def remap_columns(experiment, n_qubits, connected, width):
+    # qubit i is the i-th character from the right of a key
+    columns = np.array([width - 1 - qubit for qubit in logical_order(experiment, n_qubits, connected)],
+                       dtype=np.intp)
+    columns.flags.writeable = False
+    return columns
+
+
+# keys rebuilt from the given columns, gathering them at once from the matrix of the characters of all the keys
+def remap_keys(keys, columns):
+    chars = np.frombuffer(''.join(keys).encode('ascii'), dtype=np.uint8).reshape(len(keys), -1)
+    values = np.ascontiguousarray(chars[:, columns]).view('S%d' % len(columns)).ravel()
+    return values.astype('U%d' % len(columns)).tolist()
+
+
+# counts (a dict, or a Histogram of at most 64 bits) sorted by decreasing count, with keys in logical qubit order;
+# equal counts keep their order in the dict, or by increasing outcome for a Histogram. Dict keys are remapped as
+# bitstrings, so any number of qubits can be, histograms with Histogram.remap(), gathering the same qubits
+def remap_counts(counts, experiment, n_qubits, connected):
+    if isinstance(counts, Histogram):
+        values, hits = counts.remap(logical_order(experiment, n_qubits, tuple(connected))).top()
+        return list(zip(to_strings(values, n_qubits), hits.tolist()))
+    sorted_c = sorted(counts.items(), key=operator.itemgetter(1), reverse=True)
+    if not sorted_c:
+        return []
+    columns = remap_columns(experiment, n_qubits, tuple(connected), len(sorted_c[0][0]))
+    return list(zip(remap_keys([key for key, count in sorted_c], columns), [count for key, count in sorted_c]))
+
+
+# write counts already in logical qubit order to a txt file
+def write_counts(filename, remapped):
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, 'w') as out_f:
+        out_f.write('VALUES\t\tCOUNTS\n\n')
+        out_f.writelines(value + '\t' + str(count) + '\n' for value, count in remapped)
+
 
+# write envariance counts (a dict or a Histogram of the measured register) in logical qubit order to a txt file
+# and to the count store
+def store_envariance(counts, execution, device, n_qubits, num_shots, connected, directory, store=None):
     logger.debug('launch_exp() - counts:\n%s', str(counts))
 
-    sorted_c = sorted(counts.items(), key=operator.itemgetter(1), reverse=True)
+    remapped = remap_counts(counts, 'envariance', n_qubits, connected)
 
     filename = directory + device + '/' + 'execution' + str(
         execution) + '/' + device + '_' + str(num_shots) + '_' + str(
         n_qubits) + '_qubits_envariance.txt'
-    os.makedirs(os.path.dirname(filename), exist_ok=True)
-    out_f = open(filename, 'w')
+    write_counts(filename, remapped)
 
-    # store counts in txt file and xlsx file
-    out_f.write('VALUES\t\tCOUNTS\n\n')
+    # store counts in the binary count store
+    if store is not None:
+        store.put(count_store.ENVARIANCE, device, None, n_qubits, num_shots, execution,
+                  Histogram.from_counts(remapped, n_qubits))
 
-    stop = n_qubits // 2
-    for i in sorted_c:
-        reverse = i[0][::-1]
-        sorted_v = []
-        for n in range(n_qubits - stop):
-            sorted_v.append(reverse[connected[n + stop]])
-        for n in range(stop):
-            sorted_v.append(reverse[connected[n]])
-        value = ''.join(str(v) for v in sorted_v)
-        results.update({value: i[1]})
-        out_f.write(value + '\t' + str(i[1]) + '\n')
 
-    out_f.close()
+# write parity counts (a dict or a Histogram of the measured register) in logical qubit order to a txt file
+# and to the count store
+def store_parity(counts, execution, device, n_qubits, oracle, num_shots, connected, directory, store=None):
+    logger.debug('launch_exp() - counts:\n%s', str(counts))
+    logger.debug('launch_exp() - oredred_q:\n%s', str(connected))
 
+    remapped = remap_counts(counts, 'parity', n_qubits, connected)
 
-# launch parity experiment on the given device
-def parity_exec(execution, device, utility, n_qubits, oracle='11', num_shots=1024, directory='Data_Parity/'):
+    filename = directory + device + '/' + oracle + '/' + 'execution' + str(
+        execution) + '/' + device + '_' + str(
+        num_shots) + 'queries_' + oracle + '_' + str(
+        n_qubits) + '_qubits_parity.txt'
+    write_counts(filename, remapped)
+
+    # store counts in the binary count store
+    if store is not None:
+        store.put(count_store.PARITY, device, oracle, n_qubits, num_shots, execution,
+                  Histogram.from_counts(remapped, n_qubits))
+
+
+# run the given circuits as a single job on device, return the result data of every circuit (see fetch_job_data());
+# failures are retried by retrier, each from the stage that failed: connecting, submitting the job (while the
+# backend refuses it) or fetching its results (the job is submitted again only if it failed); other exceptions
+# are not API failures and are raised; memory is passed to submit_job()
+def run_circuits(device, size, qasms, num_shots, execution, description, max_credits=5, memory=False):
+    Q_program = retrier.call(connect, size, description=description)
+
+    data = cached_data(Q_program, qasms, device, num_shots, execution)
+    if data is not None:
+        return data
+
+    attempts = retrier.attempts()
+    job_id = None
+    ticket = None
+    while True:
+        try:
+            if job_id is None:
+                blocked = retrier.blocked(device)
+                if blocked > 0:
+                    sleep(blocked)
+                wait_backend(Q_program, device)
+                ticket = wait_credits(Q_program, description, device, execution)
+                job_id = submit_job(Q_program, [], device, num_shots, max_credits, qasms, memory)
+            sleep(JOB_WAIT)
+            data = fetch_job_data(Q_program, job_id)
+        except ConnectionError as e:
+            if job_id is None:
+                job_failed(device, ticket)
+                ticket = None
+                retrier.backoff(retry.CONNECTION, attempts, device, e, description)
+                Q_program = retrier.call(connect, size, description=description)
+            else:
+                retrier.backoff(retry.FETCH, attempts, device, e, description)
+            continue
+        except (JobError, ValueError, retry.RetryError) as e:
+            # refused or failed job, or backend status unavailable
+            job_failed(device, ticket)
+            ticket = None
+            if job_id is None:
+                retrier.backoff(retry.UNAVAILABLE, attempts, device, e, description)
+            else:
+                retrier.backoff(retry.JOB, attempts, device, e, description)
+                job_id = None
+            continue
+        except BaseException:
+            # anything else is a bug, not worth the credits of another job: give the credits back and stop
+            release_credits(ticket, submitted=False)
+            raise
+        if data is not None:
+            break
+
+    retrier.success(device)
+    release_credits(ticket)
+    cache_counts(Q_program, qasms, device, num_shots, execution, [circuit_data['counts'] for circuit_data in data],
+                 job_id, [circuit_data.get('memory') for circuit_data in data])
+    return data
+
+
+# launch envariance experiment on the given device
+def envariance_exec(execution, device, utility, n_qubits, num_shots=1024, directory='Data_Envariance/', store=None):
     os.makedirs(os.path.dirname(directory), exist_ok=True)
 
-    size = 0
+    if device == local_sim:
+        cached = utility.circuit(n_qubits, experiment='envariance')
+        logger.debug('launch_exp() - QASM:\n%s', str(cached.qasm))
+        counts = stabilizer.run_qasm(cached.qasm, num_shots)
+        store_envariance(counts, execution, device, n_qubits, num_shots, cached.connected, directory, store)
+        return
 
-    results = dict()
+    size = device_size(device, n_qubits)
 
-    if device == qx2 or device == qx4:
-        if n_qubits <= 5:
-            size = 5
-            # device = 'ibmqx_qasm_simulator'
-        else:
-            logger.critical('launch_exp() - Too much qubits for %s !', device)
-            exit(1)
-    elif device == qx3 or device == qx5:
-        if n_qubits <= 16:
-            size = 16
-            # device = 'ibmqx_qasm_simulator'
-        else:
-            logger.critical('launch_exp() - Too much qubits for %s !', device)
-            exit(2)
-    elif device == online_sim:
-        if n_qubits <= 5:
-            size = 5
-        elif n_qubits <= 16:
-            size = 16
-    else:
-        logger.critical('launch_exp() - Unknown device.')
-        exit(3)
+    cached = utility.circuit(n_qubits, experiment='envariance', size=size)
 
-    Q_program = QuantumProgram()
+    logger.debug('launch_exp() - QASM:\n%s', str(cached.qasm))
+
+    data = run_circuits(device, size, [cached.qasm], num_shots, execution,
+                        'Qubits %d - Execution %d - Shots %d' % (n_qubits, execution, num_shots))
+
+    store_envariance(data[0]['counts'], execution, device, n_qubits, num_shots, cached.connected, directory, store)
+
+
+# launch parity experiment on the given device
+def parity_exec(execution, device, utility, n_qubits, oracle='11', num_shots=1024, directory='Data_Parity/',
+                store=None):
+    os.makedirs(os.path.dirname(directory), exist_ok=True)
 
-    try:
-        Q_program.set_api(Qconfig.APItoken, Qconfig.config["url"])  # set the APIToken and API url
-    except ConnectionError:
-        sleep(900)
-        logger.critical('API Exception occurred, retrying\nQubits %d - Oracle %s - Execution %d - Queries %d', n_qubits,
-                    oracle,
-                    execution, num_shots)
-        parity_exec(execution, device, utility, n_qubits=n_qubits, oracle=oracle, num_shots=num_shots, directory=directory)
+    if device == local_sim:
+        cached = utility.circuit(n_qubits, experiment='parity', oracle=oracle)
+        logger.debug('launch_exp() - QASM:\n%s', str(cached.qasm))
+        counts = stabilizer.run_qasm(cached.qasm, num_shots)
+        store_parity(counts, execution, device, n_qubits, oracle, num_shots, cached.connected, directory, store)
         return
 
-    quantum_r = Q_program.create_quantum_register("qr", size)
+    size = device_size(device, n_qubits)
 
-    classical_r = Q_program.create_classical_register("cr", size)
+    cached = utility.circuit(n_qubits, experiment='parity', oracle=oracle, size=size)
 
-    circuit = Q_program.create_circuit('parity', [quantum_r], [classical_r])
+    logger.debug('launch_exp() - QASM:\n%s', str(cached.qasm))
 
-    connected = utility.parity(circuit=circuit, quantum_r=quantum_r, classical_r=classical_r, n_qubits=n_qubits,
-                               oracle=oracle)
+    data = run_circuits(device, size, [cached.qasm], num_shots, execution,
+                        'Qubits %d - Oracle %s - Execution %d - Queries %d' % (n_qubits, oracle, execution, num_shots))
 
-    QASM_source = Q_program.get_qasm('parity')
+    store_parity(data[0]['counts'], execution, device, n_qubits, oracle, num_shots, cached.connected, directory,
+                 store)
 
-    logger.debug('launch_exp() - QASM:\n%s', str(QASM_source))
 
-    while True:
-        try:
-            backend_status = Q_program.get_backend_status(device)
-            if ('available' in backend_status and backend_status['available'] is False) \
-                    or ('busy' in backend_status and backend_status['busy'] is True):
-                logger.critical('%s currently offline, waiting...', device)
-                while Q_program.get_backend_status(device)['available'] is False:
-                    sleep(1800)
-                logger.critical('%s is back online, resuming execution', device)
-        except ConnectionError:
-            logger.critical('Error getting backend status, retrying...')
-            sleep(900)
-            continue
-        except ValueError:
-            logger.critical('Backend is not available, waiting...')
-            sleep(900)
-            continue
-        break
+# launch the envariance experiments of one execution, for every number of qubits in qubits,
+# as a single multi-circuit job on the given device
+def envariance_batch_exec(execution, device, utility, qubits, num_shots=1024, directory='Data_Envariance/',
+                          store=None):
+    os.makedirs(os.path.dirname(directory), exist_ok=True)
 
-    if Q_program.get_api().get_my_credits()['remaining'] < 3:
-        logger.critical('Qubits %d - Oracle %s - Execution %d - Queries %d ---- Waiting for credits to replenish...',
-                    n_qubits, oracle,
-                    execution, num_shots)
-        while Q_program.get_api().get_my_credits()['remaining'] < 3:
-            sleep(900)
-        logger.critical('Credits replenished, resuming execution')
+    if device == local_sim:
+        for n_qubits in qubits:
+            envariance_exec(execution, device, utility, n_qubits, num_shots=num_shots, directory=directory,
+                            store=store)
+        return
 
-    try:
-        result = Q_program.execute(['parity'], backend=device, wait=2, timeout=1000, shots=num_shots, max_credits=5)
-    except Exception:
-        sleep(900)
-        logger.critical('Exception occurred, retrying\nQubits %d - Oracle %s - Execution %d - Queries %d', n_qubits, oracle,
-                    execution, num_shots)
-        parity_exec(execution, device, utility, n_qubits=n_qubits, oracle=oracle, num_shots=num_shots, directory=directory)
+    size = max(device_size(device, n_qubits) for n_qubits in qubits)
+
+    batch = []
+    for n_qubits in qubits:
+        cached = utility.circuit(n_qubits, experiment='envariance', size=size)
+        batch.append((n_qubits, cached))
+        logger.debug('launch_exp() - QASM:\n%s', str(cached.qasm))
+
+    data = run_circuits(device, size, [cached.qasm for n_qubits, cached in batch], num_shots, execution,
+                        'Qubits %s - Execution %d - Shots %d' % (str(qubits), execution, num_shots))
+
+    for (n_qubits, cached), circuit_data in zip(batch, data):
+        store_envariance(circuit_data['counts'], execution, device, n_qubits, num_shots, cached.connected, directory,
+                         store)
+
+
+# launch the parity experiments of one execution, for every number of qubits in qubits and every oracle in oracles,
+# as a single multi-circuit job on the given device
+def parity_batch_exec(execution, device, utility, qubits, oracles, num_shots=1024, directory='Data_Parity/',
+                      store=None):
+    os.makedirs(os.path.dirname(directory), exist_ok=True)
+
+    if device == local_sim:
+        for oracle in oracles:
+            for n_qubits in qubits:
+                parity_exec(execution, device, utility, n_qubits, oracle=oracle, num_shots=num_shots,
+                            directory=directory, store=store)
         return
 
-    try:
-        counts = result.get_counts('parity')
-    except Exception:
-        logger.critical('Exception occurred, retrying\nQubits %d - Oracle %s - Execution %d - Queries %d', n_qubits, oracle,
-                    execution, num_shots)
-        parity_exec(execution, device, utility, n_qubits=n_qubits, oracle=oracle, num_shots=num_shots, directory=directory)
+    size = max(device_size(device, n_qubits) for n_qubits in qubits)
+
+    batch = []
+    for oracle in oracles:
+        for n_qubits in qubits:
+            cached = utility.circuit(n_qubits, experiment='parity', oracle=oracle, size=size)
+            batch.append((oracle, n_qubits, cached))
+            logger.debug('launch_exp() - QASM:\n%s', str(cached.qasm))
+
+    data = run_circuits(device, size, [cached.qasm for oracle, n_qubits, cached in batch], num_shots, execution,
+                        'Qubits %s - Oracles %s - Execution %d - Queries %d' % (str(qubits), str(oracles), execution,
+                                                                                 num_shots))
+
+    for (oracle, n_qubits, cached), circuit_data in zip(batch, data):
+        store_parity(circuit_data['counts'], execution, device, n_qubits, oracle, num_shots, cached.connected,
+                     directory, store)
+
+
+# write the parity count table of every number of queries, cut out of the shots of a single job
+def store_parity_queries(data, execution, device, n_qubits, oracle, queries, slicing, connected, directory,
+                         store=None):
+    if data.get('memory') is None:
+        logger.warning('Execution %d - %s: no per-shot memory, queries of %d qubits cut out of shuffled counts',
+                       execution, device, n_qubits)
+    values = shots.memory_values(data['counts'], data.get('memory'))
+    width = len(next(iter(data['counts'])))
+    for n_queries, counts in zip(queries, shots.split_counts(values, queries, width, slicing)):
+        store_parity(counts, execution, device, n_qubits, oracle, n_queries, connected, directory, store)
+
+
+# launch the parity experiments of one execution, for every number of qubits in qubits and every oracle in oracles,
+# as a single job with enough shots for every number of queries, whose count tables are then cut out of the
+# outcomes of the single shots (see shots.py)
+def parity_memory_exec(execution, device, utility, qubits, oracles, queries, slicing=shots.DISJOINT,
+                       directory='Data_Parity/', store=None):
+    os.makedirs(os.path.dirname(directory), exist_ok=True)
+
+    num_shots = shots.needed_shots(queries, slicing)
+    if num_shots > shots.MAX_SHOTS:
+        raise ValueError('%d shots needed for queries %s, at most %d can be run' % (num_shots, str(queries),
+                                                                                   shots.MAX_SHOTS))
+
+    if device == local_sim:
+        for oracle in oracles:
+            for n_qubits in qubits:
+                cached = utility.circuit(n_qubits, experiment='parity', oracle=oracle)
+                counts, memory = stabilizer.run_qasm(cached.qasm, num_shots, memory=True)
+                data = {'counts': counts, 'memory': memory}
+                store_parity_queries(data, execution, device, n_qubits, oracle, queries, slicing, cached.connected,
+                                     directory, store)
         return
 
-    logger.debug('launch_exp() - counts:\n%s', str(counts))
+    size = max(device_size(device, n_qubits) for n_qubits in qubits)
 
-    sorted_c = sorted(counts.items(), key=operator.itemgetter(1), reverse=True)
+    batch = []
+    for oracle in oracles:
+        for n_qubits in qubits:
+            cached = utility.circuit(n_qubits, experiment='parity', oracle=oracle, size=size)
+            batch.append((oracle, n_qubits, cached))
+            logger.debug('launch_exp() - QASM:\n%s', str(cached.qasm))
 
-    filename = directory + device + '/' + oracle + '/' + 'execution' + str(
-        execution) + '/' + device + '_' + str(
-        num_shots) + 'queries_' + oracle + '_' + str(
-        n_qubits) + '_qubits_parity.txt'
-    os.makedirs(os.path.dirname(filename), exist_ok=True)
-    out_f = open(filename, 'w')
+    data = run_circuits(device, size, [cached.qasm for oracle, n_qubits, cached in batch], num_shots, execution,
+                        'Qubits %s - Oracles %s - Execution %d - Queries %s' % (str(qubits), str(oracles), execution,
+                                                                                 str(queries)), memory=True)
 
-    # store counts in txt file and xlsx file
-    out_f.write('VALUES\t\tCOUNTS\n\n')
-    logger.debug('launch_exp() - oredred_q:\n%s', str(connected))
-    stop = n_qubits // 2
-    for i in sorted_c:
-        reverse = i[0][::-1]
-        logger.log(logging.VERBOSE, 'launch_exp() - reverse in for 1st loop: %s', str(reverse))
-        sorted_v = [reverse[connected[0]]]
-        logger.log(logging.VERBOSE, 'launch_exp() - connected[0] in 1st for loop: %s', str(connected[0]))
-        logger.log(logging.VERBOSE, 'launch_exp() - sorted_v in 1st for loop: %s', str(sorted_v))
-        for n in range(stop):
-            sorted_v.append(reverse[connected[n + 1]])
-            logger.log(logging.VERBOSE, 'launch_exp() - connected[n+1], sorted_v[n+1] in 2nd for loop: %s,%s',
-                       str(connected[n + 1]), str(sorted_v[n + 1]))
-            if (n + stop + 1) != n_qubits:
-                sorted_v.append(reverse[connected[n + stop + 1]])
-                logger.log(logging.VERBOSE, 'launch_exp() - connected[n+stop+1], sorted_v[n+2] in 2nd for loop: %s%s',
-                           str(connected[n + stop + 1]), str(sorted_v[n + 2]))
-        value = ''.join(str(v) for v in sorted_v)
-        results.update({value: i[1]})
-        out_f.write(value + '\t' + str(i[1]) + '\n')
-
-    out_f.close()
+    for (oracle, n_qubits, cached), circuit_data in zip(batch, data):
+        store_parity_queries(circuit_data, execution, device, n_qubits, oracle, queries, slicing, cached.connected,
+                             directory, store)